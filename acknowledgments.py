@@ -0,0 +1,102 @@
+"""
+Pre-synthesized Acknowledgment Clips for OMANI-Therapist-Voice
+Short Omani backchannel phrases played while the full reply is being generated
+"""
+
+import base64
+import hashlib
+import logging
+import os
+import random
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+ACKNOWLEDGMENT_PHRASES = [
+    "أسمعك",
+    "خذ راحتك",
+    "فاهم عليك",
+    "أنا معاك",
+    "زين، كمل",
+    "لحظة بس، خلني أفكر معاك",
+]
+
+class AcknowledgmentLibrary:
+    """Synthesizes and base64-encodes backchannel clips once, then serves them from memory"""
+
+    def __init__(self, synthesize: Callable[[str], Optional[bytes]], cache_dir: str = 'ack_clips',
+                 phrases: list = None, max_sessions: int = 1000):
+        self.synthesize = synthesize
+        self.cache_dir = cache_dir
+        self.phrases = phrases or ACKNOWLEDGMENT_PHRASES
+        self.clips = {}
+        self.usage = {phrase: 0 for phrase in self.phrases}
+        # Last clip per session, least recently used first and capped at max_sessions
+        self.last_played = OrderedDict()
+        self.max_sessions = max_sessions
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+
+    def _cache_path(self, phrase: str) -> str:
+        name = hashlib.sha1(phrase.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{name}.mp3")
+
+    def _load_or_synthesize(self, phrase: str) -> Optional[bytes]:
+        path = self._cache_path(phrase)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return f.read()
+
+        audio = self.synthesize(phrase)
+        if audio:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(audio)
+        return audio
+
+    def warm(self):
+        """Prepare every clip; disk-cached clips cost no provider calls"""
+        for phrase in self.phrases:
+            try:
+                audio = self._load_or_synthesize(phrase)
+            except Exception as e:
+                logger.error("Acknowledgment clip synthesis failed for '%s': %s", phrase, e,
+                             extra={'event': 'ack.synthesis_failed'})
+                continue
+            if audio:
+                with self.lock:
+                    self.clips[phrase] = base64.b64encode(audio).decode()
+        self.ready.set()
+        logger.info("Acknowledgment clips ready: %d/%d", len(self.clips), len(self.phrases),
+                    extra={'event': 'ack.ready'})
+
+    def start_background_warmup(self) -> threading.Thread:
+        thread = threading.Thread(target=self.warm, name='ack-clip-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def choose(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Pick a ready clip, avoiding the one this session heard last; None if none are ready yet"""
+        with self.lock:
+            candidates = [phrase for phrase in self.clips if phrase != self.last_played.get(session_id)]
+            if not candidates:
+                candidates = list(self.clips)
+            if not candidates:
+                return None
+            phrase = random.choice(candidates)
+            self.last_played[session_id] = phrase
+            self.last_played.move_to_end(session_id)
+            while len(self.last_played) > self.max_sessions:
+                self.last_played.popitem(last=False)
+            self.usage[phrase] += 1
+            return {'phrase': phrase, 'audio_b64': self.clips[phrase]}
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'ready': self.ready.is_set(),
+                'clips_loaded': len(self.clips),
+                'usage': dict(self.usage)
+            }
@@ -0,0 +1,177 @@
+"""
+Admission Control for OMANI-Therapist-Voice Provider Calls
+Token-bucket rate limiting per session and globally, with a bounded FIFO wait queue
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Any, Callable
+
+class TokenBucket:
+    """Classic token bucket; not thread-safe on its own (callers hold the controller lock)"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now: float) -> bool:
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def force_take(self, now: float):
+        """Take a token even if none is available, borrowing against future refills"""
+        self._refill(now)
+        self.tokens = max(self.tokens - 1, -self.capacity)
+
+    def time_until_available(self, now: float) -> float:
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def is_full(self, now: float) -> bool:
+        """True once idle long enough to refill; such a bucket is indistinguishable from a new one"""
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+class AdmissionController:
+    """Admits provider calls against a global and a per-session token bucket"""
+
+    def __init__(self, name: str, global_rate: float = 2.0, global_burst: float = 5.0,
+                 session_rate: float = 0.5, session_burst: float = 2.0,
+                 max_queue: int = 50, max_wait: float = 30.0, max_sessions: int = 1000):
+        self.name = name
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.session_rate = session_rate
+        self.session_burst = session_burst
+        # Least recently used first; idle buckets are dropped and the count is capped at max_sessions
+        self.session_buckets = OrderedDict()
+        self.max_sessions = max_sessions
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.condition = threading.Condition()
+        self.queue = deque()
+        self.counters = {'admitted': 0, 'bypassed': 0, 'rejected_session_rate': 0,
+                         'rejected_queue_full': 0, 'rejected_timeout': 0, 'total_wait': 0.0}
+
+    def _session_bucket(self, session_id: str) -> TokenBucket:
+        bucket = self.session_buckets.get(session_id)
+        if bucket is not None:
+            self.session_buckets.move_to_end(session_id)
+            return bucket
+        self._evict_idle_buckets(time.monotonic())
+        bucket = self.session_buckets[session_id] = TokenBucket(self.session_rate, self.session_burst)
+        return bucket
+
+    def _evict_idle_buckets(self, now: float):
+        """Drop refilled buckets from the LRU end, then the oldest ones beyond max_sessions"""
+        while self.session_buckets:
+            session_id, bucket = next(iter(self.session_buckets.items()))
+            if not bucket.is_full(now) and len(self.session_buckets) < self.max_sessions:
+                break
+            del self.session_buckets[session_id]
+
+    def _estimated_wait(self, position: int, now: float) -> float:
+        """Time until the token for the given queue position (1-based) is refilled"""
+        return self.global_bucket.time_until_available(now) + (position - 1) / self.global_bucket.rate
+
+    def _result(self, admitted: bool, reason: str, waited: float, position: int = 0,
+                estimated_wait: float = 0.0) -> Dict[str, Any]:
+        return {
+            'admitted': admitted,
+            'reason': reason,
+            'waited': waited,
+            'queue_position': position,
+            'estimated_wait': estimated_wait
+        }
+
+    def admit(self, session_id: str, crisis: bool = False,
+              on_wait: Callable[[int, float], None] = None) -> Dict[str, Any]:
+        """Block until the call may proceed, or reject it with an explicit reason"""
+        start = time.monotonic()
+
+        with self.condition:
+            # Crisis turns never wait; they borrow tokens so other traffic absorbs the cost
+            if crisis:
+                self.global_bucket.force_take(start)
+                self._session_bucket(session_id).force_take(start)
+                self.counters['bypassed'] += 1
+                return self._result(True, 'crisis_bypass', 0.0)
+
+            # Per-session limit is enforced before queueing so one chatty session can't block the head
+            session_bucket = self._session_bucket(session_id)
+            while not session_bucket.try_take(time.monotonic()):
+                now = time.monotonic()
+                estimate = session_bucket.time_until_available(now)
+                if now - start + estimate > self.max_wait:
+                    self.counters['rejected_session_rate'] += 1
+                    return self._result(False, 'session_rate', now - start, 0, estimate)
+                self._notify_waiting(on_wait, 0, estimate)
+                self.condition.wait(timeout=estimate)
+
+            if len(self.queue) >= self.max_queue:
+                # The call never happens, so the session keeps the token it just took
+                session_bucket.tokens += 1
+                self.counters['rejected_queue_full'] += 1
+                return self._result(False, 'queue_full', time.monotonic() - start, len(self.queue) + 1,
+                                    self._estimated_wait(len(self.queue) + 1, time.monotonic()))
+
+            ticket = object()
+            self.queue.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self.queue[0] is ticket and self.global_bucket.try_take(now):
+                        waited = now - start
+                        self.counters['admitted'] += 1
+                        self.counters['total_wait'] += waited
+                        return self._result(True, 'admitted', waited)
+
+                    position = self.queue.index(ticket) + 1
+                    estimate = self._estimated_wait(position, now)
+                    if now - start + estimate > self.max_wait:
+                        session_bucket.tokens += 1
+                        self.counters['rejected_timeout'] += 1
+                        return self._result(False, 'wait_exceeded', now - start, position, estimate)
+
+                    self._notify_waiting(on_wait, position, estimate)
+                    self.condition.wait(timeout=min(max(estimate, 0.05), 0.5))
+            finally:
+                self.queue.remove(ticket)
+                self.condition.notify_all()
+
+    def _notify_waiting(self, on_wait: Callable[[int, float], None], position: int, estimate: float):
+        """Report queue position outside the lock so slow UI updates don't stall other callers"""
+        if not on_wait:
+            return
+        self.condition.release()
+        try:
+            on_wait(position, estimate)
+        finally:
+            self.condition.acquire()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.condition:
+            admitted = self.counters['admitted']
+            return dict(
+                self.counters,
+                name=self.name,
+                queue_length=len(self.queue),
+                tracked_sessions=len(self.session_buckets),
+                average_wait=self.counters['total_wait'] / admitted if admitted else 0.0
+            )
+
+def create_admission_controllers(config: Dict[str, Any] = None) -> Dict[str, AdmissionController]:
+    """One controller per provider; config maps provider name to AdmissionController kwargs"""
+    config = config or {}
+    return {
+        provider: AdmissionController(provider, **config.get(provider, {}))
+        for provider in ('gemini', 'tts')
+    }
@@ -6,13 +6,41 @@ from st_audiorec import st_audiorec
 import io
 import logging
 import base64
+import uuid
+import hashlib
+import time
+from collections import OrderedDict
+import therapist_core
+from session_store import create_session_store, LazyHistory, DEFAULT_RETENTION_SECONDS, sign_session_id, verify_session_token
+from admission_control import create_admission_controllers
+from acknowledgments import AcknowledgmentLibrary
+from cultural_guardrail import CulturalGuardrail
+from session_traces import TraceRecorder, wav_duration
+from model_router import ModelRouter, ADMITTED_ROUTES
+from chunked_transcription import ChunkedTranscriber
+from stage_scheduler import create_stage_schedulers, classify_priority
+from turn_deadline import TurnDeadline, ReplyAudioCache, fits_tts
+from structured_logging import configure_logging
 
 # --- Configuration and Setup ---
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging (no spinner: this runs before st.set_page_config, which must be the first element)
+@st.cache_resource(show_spinner=False)
+def get_log_handler():
+    """Queue-backed JSON logging, set up once per process; redaction and I/O run off the request thread."""
+    sample_rates = st.secrets.get("LOG_SAMPLE_RATES")
+    return configure_logging(
+        level=getattr(logging, st.secrets.get("LOG_LEVEL", "INFO")),
+        path=st.secrets.get("LOG_PATH"),
+        sample_rates=dict(sample_rates) if sample_rates else None
+    )
+
+get_log_handler()
 logger = logging.getLogger(__name__)
 
+# Number of recent recordings whose results are kept per session
+PROCESSED_TURN_CACHE_SIZE = 8
+
 # Set page configuration
 st.set_page_config(
     page_title="المساعد النفسي العماني",
@@ -23,7 +51,10 @@ st.set_page_config(
 # Function to automatically play audio
 def autoplay_audio(audio_bytes: bytes):
     """Encodes audio bytes to base64 and uses HTML to autoplay it."""
-    b64 = base64.b64encode(audio_bytes).decode()
+    autoplay_encoded_audio(base64.b64encode(audio_bytes).decode())
+
+def autoplay_encoded_audio(b64: str):
+    """Autoplays audio that is already base64-encoded."""
     md = f"""
         <audio autoplay="true" style="display:none;">
         <source src="data:audio/mp3;base64,{b64}" type="audio/mp3">
@@ -35,136 +66,267 @@ def autoplay_audio(audio_bytes: bytes):
 try:
     GEMINI_API_KEY = st.secrets["GEMINI_API_KEY"]
     genai.configure(api_key=GEMINI_API_KEY)
-    gemini_model = genai.GenerativeModel('gemini-1.5-flash')
+    gemini_model = genai.GenerativeModel(st.secrets.get("GEMINI_FAST_MODEL", 'gemini-1.5-flash'))
+    gemini_full_model = genai.GenerativeModel(st.secrets.get("GEMINI_FULL_MODEL", 'gemini-1.5-pro'))
     logger.info("Gemini API configured successfully.")
 except (KeyError, Exception) as e:
     st.error("🛑 **خطأ فادح:** مفتاح واجهة برمجة تطبيقات Gemini غير مهيأ.")
-    logger.error(f"Gemini API key error: {e}")
+    logger.error("Gemini API key error: %s", e, extra={'event': 'config.gemini_key_error'})
     st.stop()
 
+@st.cache_resource
+def get_session_store():
+    """One write-behind session store per process, shared by every session it serves."""
+    return create_session_store(
+        backend=st.secrets.get("SESSION_STORE_BACKEND", "sqlite"),
+        path=st.secrets.get("SESSION_STORE_PATH"),
+        retention_seconds=float(st.secrets.get("SESSION_RETENTION_SECONDS", DEFAULT_RETENTION_SECONDS)),
+    )
+
+@st.cache_resource
+def get_admission_controllers():
+    """Process-wide admission control for Gemini and TTS calls."""
+    config = st.secrets.get("ADMISSION_CONTROL", {})
+    return create_admission_controllers({provider: dict(limits) for provider, limits in config.items()})
+
+@st.cache_resource
+def get_stage_schedulers():
+    """Process-wide worker slots for STT, generation and TTS; crisis turns are served first."""
+    config = st.secrets.get("STAGE_SCHEDULER", {})
+    return create_stage_schedulers({stage: dict(options) for stage, options in config.items()})
+
+def admit_provider_call(provider: str, crisis: bool = False) -> bool:
+    """Waits for an admission slot while showing queue position; False means the call was shed."""
+    status = st.empty()
+
+    def show_position(position: int, estimated_wait: float):
+        if position:
+            status.info(f"⏳ في قائمة الانتظار... دورك رقم {position}، الوقت المتوقع {estimated_wait:.0f} ثانية")
+        else:
+            status.info(f"⏳ لحظات من فضلك... الوقت المتوقع {estimated_wait:.0f} ثانية")
+
+    ticket = get_admission_controllers()[provider].admit(
+        st.session_state.session_id, crisis=crisis, on_wait=show_position
+    )
+    status.empty()
+    if not ticket['admitted']:
+        logger.warning("%s call shed: %s", provider, ticket['reason'],
+                       extra={'event': 'admission.shed', 'provider': provider})
+        retry_after = max(ticket['estimated_wait'], 5)
+        st.warning(f"⏳ النظام مشغول حالياً بسبب كثرة الطلبات. حاول مرة أخرى بعد حوالي {retry_after:.0f} ثانية.")
+    return ticket['admitted']
+
+@st.cache_resource
+def get_acknowledgment_library():
+    """Backchannel clips, synthesized once per process in the background (disk-cached)."""
+    # Raw synthesis: clips are disk-cached by the library and must not crowd replies out of the reply audio cache
+    library = AcknowledgmentLibrary(synthesize_speech)
+    library.start_background_warmup()
+    return library
+
+@st.cache_resource
+def get_cultural_guardrail():
+    """Streaming cultural check shared by all sessions so abort rates aggregate per process."""
+    return CulturalGuardrail(max_attempts=st.secrets.get("GUARDRAIL_MAX_ATTEMPTS", 2))
+
+@st.cache_resource
+def get_model_router():
+    """Per-process router: templated/cached replies, Flash for normal turns, Pro for complex ones."""
+    return ModelRouter(
+        {'fast': gemini_model, 'full': gemini_full_model},
+        cache_size=st.secrets.get("REPLY_CACHE_SIZE", 256)
+    )
+
+@st.cache_resource
+def get_trace_recorder():
+    """Opt-in anonymized per-turn timing traces (TRACE_RECORDING = true in secrets)."""
+    if not st.secrets.get("TRACE_RECORDING", False):
+        return None
+    salt = st.secrets.get("TRACE_SALT")
+    return TraceRecorder(
+        path=st.secrets.get("TRACE_PATH", "session_traces.jsonl"),
+        salt=salt.encode('utf-8') if salt else None
+    )
+
+@st.cache_resource
+def get_reply_audio_cache():
+    """Synthesized replies kept per process; template and fallback replies repeat and can skip TTS."""
+    return ReplyAudioCache(max_entries=st.secrets.get("REPLY_AUDIO_CACHE_SIZE", 64))
+
 # --- Core Helper Functions ---
 
-def transcribe_audio(wav_audio_data):
-    """Converts WAV audio bytes to text using Google's speech recognition."""
+def recognize_chunk(wav_audio_data):
+    """Converts one WAV chunk to text using Google's speech recognition (safe to call from pool threads)."""
     recognizer = sr.Recognizer()
     try:
         audio_file = io.BytesIO(wav_audio_data)
         with sr.AudioFile(audio_file) as source:
             audio_data = recognizer.record(source)
         
-        text = recognizer.recognize_google(audio_data, language="ar-OM")
-        logger.info(f"Transcribed: '{text}'")
-        return text
+        return recognizer.recognize_google(audio_data, language="ar-OM")
     except sr.UnknownValueError:
-        logger.warning("Could not understand audio")
         return None
     except sr.RequestError as e:
-        logger.error(f"Speech recognition error: {e}")
+        logger.error("Speech recognition error: %s", e, extra={'event': 'stt.error'})
         return None
 
-def get_gemini_response(user_input: str, conversation_history: list):
-    """Generates therapeutic response using Gemini model with enhanced therapist behavior."""
-    
-    # Crisis detection with immediate intervention
-    crisis_keywords = ["انتحار", "أموت", "أنهي حياتي", "ما فيني أعيش", "تعبت من الحياة", "ما عاد فيني"]
-    if any(keyword in user_input for keyword in crisis_keywords):
-        logger.warning("Crisis detected")
-        return """
-        أسمع أنك تمر بوقت صعب جداً، وأريدك تعرف إني هنا معاك. سلامتك أهم شيء في الدنيا.
-        
-        أرجوك تواصل فوراً مع:
-        📞 خط الطوارئ: 999
-        📞 خط الدعم النفسي: +968-2205-5555
-        📞 خط الأمل: +968-2205-6666
-        
-        حياتك ثمينة وايد، وفي ناس كثير يقدرون يساعدونك الحين. ما تتردد تطلب المساعدة.
-        """, "crisis"
+@st.cache_resource
+def get_chunked_transcriber():
+    """Process-wide STT pool; long recordings are split at pauses and transcribed in parallel."""
+    return ChunkedTranscriber(recognize_chunk, max_workers=st.secrets.get("STT_MAX_WORKERS", 4))
 
-    # Enhanced therapeutic system prompt
-    system_prompt = """
-    أنت معالج نفسي محترف ومتخصص في اللهجة العمانية والثقافة الخليجية. أنت تتحدث مع شخص يحتاج للدعم النفسي.
+def transcribe_audio(wav_audio_data):
+    """Converts WAV audio bytes to text, chunking long recordings."""
+    result = get_chunked_transcriber().transcribe(wav_audio_data)
+    if not result['text']:
+        logger.warning("Could not understand audio", extra={'event': 'stt.unintelligible'})
+        return None
+    # The transcript travels as a field so the redaction stage drops it before anything is written
+    logger.info("Transcribed %d chunk(s) in %.2fs", result['chunks'], result['elapsed'],
+                extra={'event': 'stt.transcribed', 'transcript': result['text']})
+    return result['text']
 
-    كمعالج محترف، يجب أن تكون:
-    
-    🎯 **المهارات العلاجية:**
-    - استخدم تقنيات الاستماع النشط والتعاطف
-    - اطرح أسئلة مفتوحة لفهم المشاعر بعمق
-    - استخدم تقنيات العلاج المعرفي السلوكي المناسبة ثقافياً
-    - قدم استراتيجيات عملية للتأقلم والتحسن
-    - اعكس المشاعر وأعد صياغتها لإظهار الفهم
-    
-    🏛️ **الحساسية الثقافية:**
-    - استخدم تعبيرات عمانية أصيلة (شلونك، ما عليك، بإذن الله، يلا نشوف)
-    - احترم القيم الإسلامية والعائلية العمانية
-    - ادمج الممارسات الروحية عند المناسبة (الدعاء، التوكل على الله)
-    - تفهم ديناميكيات الأسرة الخليجية والضغوط الاجتماعية
-    
-    💬 **أسلوب التواصل:**
-    - كن دافئاً ومتعاطفاً ومطمئناً
-    - استخدم نبرة هادئة وداعمة
-    - اجعل الردود قصيرة ومركزة (2-4 جمل)
-    - اطرح سؤال واحد في نهاية كل رد لتشجيع المحادثة
-    
-    ❌ **تجنب تماماً:**
-    - التشخيصات الطبية أو وصف الأدوية
-    - إعطاء نصائح مباشرة دون فهم السياق
-    - التقليل من مشاعر الشخص أو الحكم عليها
-    - الردود الطويلة أو المعقدة
-    - استبدال العلاج النفسي المهني
-    
-    🎭 **أمثلة على الردود العلاجية:**
-    - "أفهم إنك تحس بـ... هذا صعب عليك. شنو أكثر شي يخليك تحس كذا؟"
-    - "شلونك اليوم؟ أحس إن فيك شي يضايقك... تبي تحكيلي عنه؟"
-    - "ما عليك، كلنا نمر بأوقات صعبة. أنت مو لحالك في هذا الشي."
-    - "بإذن الله راح نشتغل سوا عشان تحس أحسن. شنو رأيك نجرب...؟"
-    
-    تذكر: أنت معالج محترف يساعد شخص يثق فيك. كن حاضراً معه بكل تعاطف ومهنية.
+def gemini_admission():
+    """Admission callback for one turn: asks the Gemini controller at most once and remembers the answer."""
+    decision = {}
+
+    def admit(route: str) -> bool:
+        if 'admitted' not in decision:
+            decision['admitted'] = admit_provider_call("gemini", crisis=route == 'crisis')
+        return decision['admitted']
+    return admit
+
+def get_gemini_response(user_input: str, conversation_history: list, deadline: TurnDeadline = None,
+                        admit=None):
+    """Generates therapeutic response on the model chosen by the router, streamed through the guardrail.
+
+    Returns (text, response_type, route); route is 'shed' when admission control refused the Gemini call.
     """
-    
-    # Build comprehensive prompt with conversation context
-    full_prompt = f"{system_prompt}\n\n"
-    
-    # Add recent conversation history for context
-    if conversation_history:
-        full_prompt += "سياق المحادثة السابقة:\n"
-        for entry in conversation_history[-3:]:  # Last 3 exchanges
-            full_prompt += f"المستخدم: {entry['user']}\nالمعالج: {entry['assistant']}\n"
-        full_prompt += "\n"
-    
-    # Add current user input
-    full_prompt += f"المستخدم الآن يقول: {user_input}\n\n"
-    full_prompt += "رد عليه كمعالج نفسي محترف باللهجة العمانية، مع طرح سؤال مناسب لمواصلة العلاج:\nالمعالج:"
+    text, response_type, route = get_model_router().generate(
+        user_input, conversation_history, get_cultural_guardrail(), deadline, admit=admit
+    )
+    logger.info("Turn routed to %s", route, extra={'event': 'generation.routed', 'route': route})
+    return text, response_type, route
 
-    try:
-        # Generate response with therapeutic parameters
-        response = gemini_model.generate_content(
-            full_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.7,  # Balanced creativity and consistency
-                top_p=0.8,
-                top_k=40,
-                max_output_tokens=200,  # Keep responses concise
-            )
-        )
-        logger.info("Therapeutic response generated successfully")
-        return response.text, "normal"
-    except Exception as e:
-        logger.error(f"Gemini error: {e}")
-        return "عذراً، حدث خطأ تقني. بس أنا هنا معاك، حاول مرة أخرى وحكيلي شنو في بالك.", "error"
+def synthesize_speech(text: str) -> bytes:
+    """Converts text to speech using gTTS; raises on provider errors."""
+    tts = gTTS(text=text, lang='ar', slow=False)
+    audio_fp = io.BytesIO()
+    tts.write_to_fp(audio_fp)
+    audio_fp.seek(0)
+    return audio_fp.read()
 
 def text_to_speech(text: str):
-    """Converts text to speech using gTTS."""
+    """Synthesizes a reply and keeps it in the reply audio cache."""
     try:
-        tts = gTTS(text=text, lang='ar', slow=False)
-        audio_fp = io.BytesIO()
-        tts.write_to_fp(audio_fp)
-        audio_fp.seek(0)
-        logger.info("TTS conversion successful")
-        return audio_fp.read()
+        audio = synthesize_speech(text)
+        logger.info("TTS conversion successful", extra={'event': 'tts.synthesized'})
+        get_reply_audio_cache().put(text, audio)
+        return audio
     except Exception as e:
-        logger.error(f"TTS error: {e}")
+        logger.error("TTS error: %s", e, extra={'event': 'tts.error'})
         return None
 
+def render_turn(turn: dict, autoplay: bool, show_user: bool = True):
+    """Displays a processed turn; stored turns are shown again without replaying audio."""
+    if not turn['user_text']:
+        st.warning("⚠️ لم أتمكن من فهم الصوت. حاول مرة أخرى بصوت أوضح.")
+        return
+
+    # Display user message
+    if show_user:
+        st.write(f"**👤 أنت:** {turn['user_text']}")
+    if not turn['ai_text']:
+        return
+
+    # Display AI message
+    if turn['response_type'] == "crisis":
+        st.error(f"**🚨 المعالج:** {turn['ai_text']}")
+    else:
+        st.success(f"**🧠 المعالج:** {turn['ai_text']}")
+
+    if autoplay and turn['ai_audio']:
+        autoplay_audio(turn['ai_audio'])
+        st.info("🔊 جاري تشغيل الرد...")
+
+def process_turn(wav_audio_data: bytes) -> dict:
+    """Runs STT, generation and TTS for one recording; turn['shed'] is set if admission control dropped it."""
+    # One budget for the whole turn; later stages degrade when earlier ones ran long
+    deadline = TurnDeadline(st.secrets.get("TURN_BUDGET_SECONDS", 20.0))
+    latencies = {}
+    queue_waits = {}
+    schedulers = get_stage_schedulers()
+    session_id = st.session_state.session_id
+
+    # Step 1: Transcribe audio (a session already in crisis keeps its priority)
+    stage_start = time.perf_counter()
+    with schedulers['stt'].slot(session_id, classify_priority(None, st.session_state.history)) as grant:
+        queue_waits['stt'] = grant['waited']
+        user_text = transcribe_audio(wav_audio_data)
+    latencies['stt'] = time.perf_counter() - stage_start
+    turn = {'user_text': user_text, 'ai_text': None, 'response_type': None, 'ai_audio': None,
+            'shed': False, 'latencies': latencies, 'queue_waits': queue_waits, 'priority': None,
+            'deadline': deadline, 'ack_clip': None}
+    if not user_text:
+        return turn
+
+    # Display user message
+    st.write(f"**👤 أنت:** {user_text}")
+
+    # Play a short acknowledgment right away while generation and TTS run
+    is_crisis = therapist_core.is_crisis_text(user_text)
+    if not is_crisis:
+        ack = get_acknowledgment_library().choose(st.session_state.session_id)
+        if ack:
+            autoplay_encoded_audio(ack['audio_b64'])
+            turn['ack_clip'] = ack['phrase']
+            logger.info("Acknowledgment clip played: %s", ack['phrase'], extra={'event': 'ack.played'})
+
+    turn['priority'] = 'crisis' if is_crisis else classify_priority(user_text, st.session_state.history)
+
+    # Step 2: Get AI response. Template and cached turns never reach Gemini, so only the routes that do are
+    # admitted, before taking a generation worker; crisis replies are immediate and never queue
+    admit = gemini_admission()
+    planned_route = get_model_router().plan_route(user_text, st.session_state.history)
+    if planned_route in ADMITTED_ROUTES and not admit(planned_route):
+        turn['shed'] = True
+        return turn
+    stage_start = time.perf_counter()
+    with schedulers['generation'].slot(session_id, turn['priority']) as grant:
+        queue_waits['generation'] = grant['waited']
+        # A cached reply evicted since planning is admitted here instead
+        turn['ai_text'], turn['response_type'], route = get_gemini_response(
+            user_text, st.session_state.history, deadline, admit
+        )
+    latencies['generation'] = time.perf_counter() - stage_start
+    if route == 'shed':
+        turn['shed'] = True
+        return turn
+
+    # Step 3: Convert to speech
+    if turn['ai_text'] and admit_provider_call("tts", crisis=turn['response_type'] == "crisis"):
+        # The inline crisis check in get_gemini_response also promotes the reply's TTS
+        tts_priority = 'crisis' if turn['response_type'] == "crisis" else turn['priority']
+        if tts_priority != 'crisis' and not fits_tts(deadline, turn['ai_text']):
+            # Crisis replies are always spoken; others reuse earlier audio or are shown as text only
+            turn['ai_audio'] = get_reply_audio_cache().get(turn['ai_text'])
+            deadline.degrade('tts', 'cached_audio' if turn['ai_audio'] else 'text_only')
+        else:
+            stage_start = time.perf_counter()
+            with schedulers['tts'].slot(session_id, tts_priority) as grant:
+                queue_waits['tts'] = grant['waited']
+                turn['ai_audio'] = text_to_speech(turn['ai_text'])
+            latencies['tts'] = time.perf_counter() - stage_start
+
+    if turn['ai_text']:
+        # Add to conversation history
+        st.session_state.history.append({
+            "user": user_text,
+            "assistant": turn['ai_text'],
+            "type": turn['response_type']
+        })
+    return turn
+
 # --- Main UI Layout ---
 
 # Header
@@ -172,10 +334,22 @@ st.title("🧠 المساعد النفسي العماني")
 st.write("مساحة آمنة للتحدث... اضغط على المايكروفون وتحدث")
 
 # Initialize session state
+# A token signed with SESSION_SECRET lives in the URL so any replica can pick the conversation up;
+# a bare or forged id is never trusted, and without the secret a reload always starts a fresh session
+if 'session_id' not in st.session_state:
+    session_secret = st.secrets.get("SESSION_SECRET")
+    st.session_state.session_id = verify_session_token(st.query_params.get("sid"), session_secret) or uuid.uuid4().hex
+    if session_secret:
+        st.query_params["sid"] = sign_session_id(st.session_state.session_id, session_secret)
+    elif "sid" in st.query_params:
+        del st.query_params["sid"]
 if 'history' not in st.session_state:
-    st.session_state.history = []
-if 'processing' not in st.session_state:
-    st.session_state.processing = False
+    st.session_state.history = LazyHistory(get_session_store(), st.session_state.session_id)
+if 'processed_turns' not in st.session_state:
+    st.session_state.processed_turns = OrderedDict()  # audio digest -> processed turn
+
+# Start preparing acknowledgment clips before the first turn needs them
+get_acknowledgment_library()
 
 # --- Recording Section ---
 st.subheader("🎤 اضغط للتسجيل")
@@ -184,45 +358,38 @@ st.subheader("🎤 اضغط للتسجيل")
 wav_audio_data = st_audiorec()
 
 # --- Processing Logic ---
-if wav_audio_data and not st.session_state.processing:
-    st.session_state.processing = True
-    
-    # Show processing message
-    with st.spinner("🎧 جاري الاستماع والتفكير..."):
-        
-        # Step 1: Transcribe audio
-        user_text = transcribe_audio(wav_audio_data)
-        
-        if user_text:
-            # Display user message
-            st.write(f"**👤 أنت:** {user_text}")
-            
-            # Step 2: Get AI response
-            ai_text, response_type = get_gemini_response(user_text, st.session_state.history)
-            
-            if ai_text:
-                # Display AI message
-                if response_type == "crisis":
-                    st.error(f"**🚨 المعالج:** {ai_text}")
-                else:
-                    st.success(f"**🧠 المعالج:** {ai_text}")
-                
-                # Step 3: Convert to speech and play automatically
-                ai_audio = text_to_speech(ai_text)
-                if ai_audio:
-                    autoplay_audio(ai_audio)
-                    st.info("🔊 جاري تشغيل الرد...")
-                
-                # Add to conversation history
-                st.session_state.history.append({
-                    "user": user_text, 
-                    "assistant": ai_text,
-                    "type": response_type
-                })
-        else:
-            st.warning("⚠️ لم أتمكن من فهم الصوت. حاول مرة أخرى بصوت أوضح.")
-    
-    st.session_state.processing = False
+# st_audiorec returns the same recording on every rerun, so turns are keyed by its content hash
+if wav_audio_data:
+    audio_digest = hashlib.sha256(wav_audio_data).hexdigest()
+    processed = st.session_state.processed_turns
+
+    if audio_digest in processed:
+        processed.move_to_end(audio_digest)
+        if not processed[audio_digest].get('dismissed'):
+            render_turn(processed[audio_digest], autoplay=False)
+    else:
+        # Show processing message
+        turn_started_at = time.time()
+        turn_index = len(st.session_state.history)
+        with st.spinner("🎧 جاري الاستماع والتفكير..."):
+            turn = process_turn(wav_audio_data)
+
+        recorder = get_trace_recorder()
+        if recorder:
+            recorder.record(
+                st.session_state.session_id, turn_index, turn_started_at, wav_duration(wav_audio_data),
+                turn['user_text'], turn['ai_text'], turn['response_type'], turn['latencies'], shed=turn['shed'],
+                priority=turn['priority'], queue_waits=turn['queue_waits'],
+                degradations=turn['deadline'].actions(), deadline_met=not turn['deadline'].expired(),
+                ack_clip=turn['ack_clip']
+            )
+
+        if not turn['shed']:
+            # The user message was already shown while generation ran
+            render_turn(turn, autoplay=True, show_user=False)
+            processed[audio_digest] = turn
+            while len(processed) > PROCESSED_TURN_CACHE_SIZE:
+                processed.popitem(last=False)
 
 # --- Optional Conversation History ---
 if st.session_state.history:
@@ -247,7 +414,10 @@ with st.sidebar:
     
     # Clear conversation button
     if st.button("🗑️ مسح المحادثة"):
-        st.session_state.history = []
+        st.session_state.history.clear()
+        # The recorder still holds the last clip; keep its digest so it isn't processed again
+        for turn in st.session_state.processed_turns.values():
+            turn['dismissed'] = True
         st.rerun()
     
     st.divider()
@@ -0,0 +1,184 @@
+"""
+Microbenchmark Regression Suite for OMANI-Therapist-Voice
+Times the hot pure-Python paths and compares runs against a saved baseline
+"""
+
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Any, Callable
+
+from test_cases_omani import get_omani_test_cases
+from crisis_detector import OmaniCrisisDetector
+from cultural_validator import OmaniCulturalValidator
+from performance_tester import OmaniTherapistTester
+from therapist_core import build_therapist_prompt
+from model_router import classify_turn
+
+# Approximate word counts for each input-length corpus
+CORPUS_LENGTHS = {
+    'short': 5,
+    'medium': 25,
+    'long': 100,
+    'xlong': 400
+}
+
+DEFAULT_BASELINE_PATH = 'benchmark_baseline.json'
+
+def build_corpus(target_words: int, size: int = 16) -> List[str]:
+    """Deterministically stitch test case utterances into inputs of roughly target_words words"""
+    words = [word for case in get_omani_test_cases() for word in case['input_text'].split()]
+    corpus = []
+    for i in range(size):
+        start = (i * 7) % len(words)
+        picked = [words[(start + j) % len(words)] for j in range(target_words)]
+        corpus.append(" ".join(picked))
+    return corpus
+
+def get_benchmarks() -> Dict[str, Callable[[str], Any]]:
+    """Benchmarked callables, each taking one input string"""
+    detector = OmaniCrisisDetector()
+    validator = OmaniCulturalValidator()
+    tester = OmaniTherapistTester()
+    history = [
+        {'user': case['input_text'], 'assistant': case['input_text']}
+        for case in get_omani_test_cases()[:3]
+    ]
+
+    return {
+        'detect_crisis': detector.detect_crisis,
+        'validate_response': validator.validate_response,
+        'evaluate_cultural_appropriateness': tester.evaluate_cultural_appropriateness,
+        'build_therapist_prompt': lambda text: build_therapist_prompt(text, history),
+        'classify_turn': lambda text: classify_turn(text, history)
+    }
+
+def time_benchmark(func: Callable[[str], Any], corpus: List[str], warmup: int,
+                   iterations: int, repeats: int) -> Dict[str, float]:
+    """Time func over the corpus; returns per-call microseconds"""
+    inputs = [corpus[i % len(corpus)] for i in range(iterations)]
+
+    for i in range(warmup):
+        func(corpus[i % len(corpus)])
+
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for text in inputs:
+            func(text)
+        samples.append((time.perf_counter() - start) / iterations * 1e6)
+
+    return {
+        'median_us': statistics.median(samples),
+        'min_us': min(samples),
+        'max_us': max(samples),
+        'repeats': repeats,
+        'iterations': iterations
+    }
+
+def run_benchmarks(warmup: int = 200, iterations: int = 2000, repeats: int = 7,
+                   name_filter: str = None) -> Dict[str, Any]:
+    """Run every benchmark against every corpus"""
+    corpora = {name: build_corpus(words) for name, words in CORPUS_LENGTHS.items()}
+    results = {}
+
+    for bench_name, func in get_benchmarks().items():
+        for corpus_name, corpus in corpora.items():
+            key = f"{bench_name}/{corpus_name}"
+            if name_filter and name_filter not in key:
+                continue
+            results[key] = time_benchmark(func, corpus, warmup, iterations, repeats)
+            print(f"   {key:<50} {results[key]['median_us']:>10.2f} us/call")
+
+    return {
+        'meta': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'timestamp': datetime.now().isoformat(),
+            'warmup': warmup,
+            'iterations': iterations,
+            'repeats': repeats
+        },
+        'results': results
+    }
+
+def compare_to_baseline(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.15,
+                        overrides: Dict[str, float] = None) -> Dict[str, Any]:
+    """Compare best-of-repeats timings; a benchmark regresses when it slows by more than its threshold"""
+    overrides = overrides or {}
+    comparisons = []
+
+    for key, result in current['results'].items():
+        base = baseline['results'].get(key)
+        if not base:
+            continue
+        limit = next((value for name, value in overrides.items() if name in key), threshold)
+        ratio = result['min_us'] / base['min_us'] if base['min_us'] else 1.0
+        comparisons.append({
+            'benchmark': key,
+            'baseline_us': base['min_us'],
+            'current_us': result['min_us'],
+            'change': ratio - 1.0,
+            'threshold': limit,
+            'regressed': ratio - 1.0 > limit
+        })
+
+    return {
+        'comparisons': comparisons,
+        'regressions': [c for c in comparisons if c['regressed']],
+        'missing_from_baseline': [key for key in current['results'] if key not in baseline['results']]
+    }
+
+def _parse_overrides(values: List[str]) -> Dict[str, float]:
+    overrides = {}
+    for value in values or []:
+        name, limit = value.split('=', 1)
+        overrides[name] = float(limit)
+    return overrides
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the hot pure-Python paths")
+    parser.add_argument('--warmup', type=int, default=200)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--repeats', type=int, default=7)
+    parser.add_argument('--filter', help="Only run benchmarks whose name contains this text")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="Write this run as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.15, help="Allowed slowdown, e.g. 0.15 for 15%%")
+    parser.add_argument('--threshold-for', action='append', metavar='NAME=FRACTION',
+                        help="Per-benchmark threshold override (substring match)")
+    args = parser.parse_args()
+
+    print("Running OMANI-Therapist-Voice microbenchmarks")
+    print("=" * 70)
+    current = run_benchmarks(args.warmup, args.iterations, args.repeats, args.filter)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"\nBaseline saved to: {args.baseline}")
+        sys.exit(0)
+
+    try:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline first")
+        sys.exit(0)
+
+    comparison = compare_to_baseline(current, baseline, args.threshold, _parse_overrides(args.threshold_for))
+
+    print("\nComparison with baseline:")
+    for c in comparison['comparisons']:
+        status = "REGRESSION" if c['regressed'] else "ok"
+        print(f"   {c['benchmark']:<50} {c['change']:>+8.1%}  (limit {c['threshold']:.0%}) {status}")
+
+    if comparison['regressions']:
+        print(f"\n{len(comparison['regressions'])} benchmark(s) regressed")
+        sys.exit(1)
+    print("\nNo regressions")
@@ -0,0 +1,162 @@
+"""
+Parallel Chunked Transcription for OMANI-Therapist-Voice
+Splits long recordings at pauses, transcribes the chunks concurrently and stitches them back in order
+"""
+
+import io
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+from text_normalization import normalize_text
+
+logger = logging.getLogger(__name__)
+
+def plan_chunks(duration_ms: int, silences: List[Tuple[int, int]], target_ms: int = 5000,
+                max_ms: int = 8000, overlap_ms: int = 700) -> List[Tuple[int, int]]:
+    """(start, end) chunk spans cut at the pause nearest target_ms; hard cuts overlap the previous chunk"""
+    if duration_ms <= max_ms:
+        return [(0, duration_ms)]
+
+    # Cut in the middle of a pause so no word is split
+    candidates = [(start + end) // 2 for start, end in silences]
+    chunks = []
+    start, hard_cut = 0, False
+    while duration_ms - start > max_ms:
+        window = [cut for cut in candidates if start + target_ms // 2 <= cut <= start + max_ms]
+        if window:
+            cut = min(window, key=lambda point: abs(point - (start + target_ms)))
+        else:
+            cut = start + target_ms
+        chunks.append((max(start - overlap_ms, 0) if hard_cut else start, cut))
+        start, hard_cut = cut, not window
+    chunks.append((max(start - overlap_ms, 0) if hard_cut else start, duration_ms))
+    return chunks
+
+def stitch_transcripts(parts: List[str], max_overlap_words: int = 8) -> str:
+    """Join chunk transcripts in order, dropping words repeated across a seam by the audio overlap"""
+    words = []
+    for part in parts:
+        incoming = part.split()
+        if not incoming:
+            continue
+        # Longest run of trailing words that the next chunk repeats at its start
+        limit = min(max_overlap_words, len(words), len(incoming))
+        repeated = 0
+        for size in range(limit, 0, -1):
+            if normalize_text(" ".join(words[-size:])) == normalize_text(" ".join(incoming[:size])):
+                repeated = size
+                break
+        words.extend(incoming[repeated:])
+    return " ".join(words)
+
+class ChunkedTranscriber:
+    """Silence-aware chunking with a bounded, process-wide transcription pool"""
+
+    def __init__(self, transcribe_chunk: Callable[[bytes], Optional[str]], max_workers: int = 4,
+                 target_chunk_ms: int = 5000, max_chunk_ms: int = 8000, overlap_ms: int = 700,
+                 min_silence_ms: int = 300):
+        self.transcribe_chunk = transcribe_chunk
+        self.max_workers = max_workers
+        self.target_chunk_ms = target_chunk_ms
+        self.max_chunk_ms = max_chunk_ms
+        self.overlap_ms = overlap_ms
+        self.min_silence_ms = min_silence_ms
+        # Shared by all sessions, so concurrent STT calls to the provider stay bounded
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stt-chunk')
+        self.lock = threading.Lock()
+        self.counters = {'recordings': 0, 'chunked_recordings': 0, 'chunks': 0, 'failed_chunks': 0}
+
+    def _split(self, wav_bytes: bytes) -> List[bytes]:
+        from pydub import AudioSegment
+        from pydub.silence import detect_silence
+
+        audio = AudioSegment.from_wav(io.BytesIO(wav_bytes))
+        if len(audio) <= self.max_chunk_ms:
+            return [wav_bytes]
+
+        # Pauses relative to the recording's own loudness, so quiet speakers still split cleanly
+        threshold = audio.dBFS - 16 if math.isfinite(audio.dBFS) else -50
+        silences = detect_silence(audio, min_silence_len=self.min_silence_ms, silence_thresh=threshold, seek_step=10)
+        spans = plan_chunks(len(audio), silences, self.target_chunk_ms, self.max_chunk_ms, self.overlap_ms)
+
+        chunks = []
+        for start, end in spans:
+            buffer = io.BytesIO()
+            audio[start:end].export(buffer, format='wav')
+            chunks.append(buffer.getvalue())
+        return chunks
+
+    def transcribe(self, wav_bytes: bytes) -> Dict[str, Any]:
+        """Transcript of one recording plus chunk counts and timing"""
+        start = time.perf_counter()
+        chunks = self._split(wav_bytes)
+        if len(chunks) == 1:
+            parts = [self.transcribe_chunk(chunks[0])]
+        else:
+            # map() yields results in chunk order regardless of which finishes first
+            parts = list(self.pool.map(self.transcribe_chunk, chunks))
+
+        failed = sum(1 for part in parts if not part)
+        with self.lock:
+            self.counters['recordings'] += 1
+            self.counters['chunked_recordings'] += len(chunks) > 1
+            self.counters['chunks'] += len(chunks)
+            self.counters['failed_chunks'] += failed
+        if failed and len(chunks) > 1:
+            logger.warning("%d/%d audio chunks could not be transcribed", failed, len(chunks))
+
+        text = stitch_transcripts([part for part in parts if part])
+        return {
+            'text': text or None,
+            'chunks': len(chunks),
+            'failed_chunks': failed,
+            'elapsed': time.perf_counter() - start
+        }
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.counters)
+
+def estimate_chunked_stt_time(audio_length: float, max_workers: int, target_chunk: float = 5.0,
+                              max_chunk: float = 8.0, per_second: float = 0.4, overhead: float = 0.6) -> float:
+    """Simulated STT time for chunked transcription: waves of parallel chunks, each bounded by chunk length"""
+    spans = plan_chunks(int(audio_length * 1000), [], int(target_chunk * 1000), int(max_chunk * 1000))
+    waves = math.ceil(len(spans) / max_workers)
+    longest = max(end - start for start, end in spans) / 1000
+    return waves * (longest * per_second + overhead)
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Chunk a WAV recording and show the stitched transcript")
+    parser.add_argument('wav', nargs='?', help="WAV file to transcribe with Google speech recognition")
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    print("Simulated STT time by recording length (0.4s per audio second + 0.6s per call)")
+    for seconds in (5, 8.5, 15, 20, 30, 60):
+        single = seconds * 0.4 + 0.6
+        chunked = estimate_chunked_stt_time(seconds, args.workers)
+        print(f"   {seconds:6.1f}s audio: single call {single:5.1f}s, chunked x{args.workers} {chunked:5.1f}s")
+
+    if args.wav:
+        import speech_recognition as sr
+
+        def recognize(wav_bytes: bytes) -> Optional[str]:
+            recognizer = sr.Recognizer()
+            with sr.AudioFile(io.BytesIO(wav_bytes)) as source:
+                audio_data = recognizer.record(source)
+            try:
+                return recognizer.recognize_google(audio_data, language="ar-OM")
+            except sr.UnknownValueError:
+                return None
+
+        with open(args.wav, 'rb') as f:
+            result = ChunkedTranscriber(recognize, max_workers=args.workers).transcribe(f.read())
+        print(f"\n{result['chunks']} chunks ({result['failed_chunks']} failed) in {result['elapsed']:.2f}s")
+        print(result['text'])
@@ -0,0 +1,201 @@
+"""
+A/B Comparison of Performance Runs for OMANI-Therapist-Voice
+Per-stage p50/p95/p99 deltas with bootstrap intervals, Mann-Whitney significance and a verdict
+"""
+
+import json
+import math
+import random
+from typing import Dict, List, Any, Tuple
+
+from result_store import read_result_file
+from load_tester import RAW_SAMPLE_COLUMNS
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+def load_samples(path: str, users: int = None) -> Dict[str, List[float]]:
+    """Per-stage latency samples from a tester report (JSON) or a load tester sink file (JSONL)"""
+    if path.endswith('.jsonl'):
+        samples = {name: [] for name in RAW_SAMPLE_COLUMNS}
+        for run in read_result_file(path, keep_rows=True):
+            if users is not None and run['meta'].get('concurrent_users') != users:
+                continue
+            for name in RAW_SAMPLE_COLUMNS:
+                samples[name].extend(run['store'].samples(name))
+        return {name: values for name, values in samples.items() if values}
+
+    with open(path, encoding='utf-8') as f:
+        report = json.load(f)
+    if users is not None and 'stress_test_results' in report:
+        # Pool the repeated runs of one stress level
+        samples = {}
+        for result in report['stress_test_results']:
+            if result.get('stress_level') == users:
+                for name, values in result.get('raw_samples', {}).items():
+                    samples.setdefault(name, []).extend(values)
+        return samples
+    if not report.get('raw_samples'):
+        raise ValueError(f"{path} has no raw samples; re-run the tester or pass its --sink JSONL file")
+    return report['raw_samples']
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linearly interpolated quantile of pre-sorted values"""
+    if not sorted_values:
+        return 0.0
+    position = q * (len(sorted_values) - 1)
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+def bootstrap_deltas(baseline: List[float], candidate: List[float], resamples: int = 1000,
+                     confidence: float = 0.95, rng: random.Random = None) -> Dict[float, Tuple[float, float]]:
+    """Percentile-bootstrap interval for candidate - baseline at each quantile"""
+    rng = rng or random.Random(0)
+    deltas = {q: [] for q in QUANTILES}
+    for _ in range(resamples):
+        a = sorted(rng.choices(baseline, k=len(baseline)))
+        b = sorted(rng.choices(candidate, k=len(candidate)))
+        for q in QUANTILES:
+            deltas[q].append(percentile(b, q) - percentile(a, q))
+
+    tail = (1 - confidence) / 2
+    intervals = {}
+    for q, values in deltas.items():
+        values.sort()
+        intervals[q] = (percentile(values, tail), percentile(values, 1 - tail))
+    return intervals
+
+def mann_whitney(baseline: List[float], candidate: List[float]) -> Dict[str, float]:
+    """Two-sided Mann-Whitney U test (normal approximation, tie-corrected)"""
+    n1, n2 = len(baseline), len(candidate)
+    combined = sorted([(value, 0) for value in baseline] + [(value, 1) for value in candidate])
+
+    # Average ranks over tied values
+    rank_sum = 0.0
+    tie_term = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        average_rank = (i + j) / 2 + 1
+        rank_sum += average_rank * sum(1 for k in range(i, j + 1) if combined[k][1] == 1)
+        ties = j - i + 1
+        tie_term += ties ** 3 - ties
+        i = j + 1
+
+    u_candidate = rank_sum - n2 * (n2 + 1) / 2
+    n = n1 + n2
+    mean = n1 * n2 / 2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))) if n > 1 else 0.0
+    if variance <= 0:
+        return {'u': u_candidate, 'z': 0.0, 'p_value': 1.0, 'prob_candidate_slower': 0.5}
+
+    # Continuity correction toward the mean
+    z = (u_candidate - mean - math.copysign(0.5, u_candidate - mean)) / math.sqrt(variance)
+    return {
+        'u': u_candidate,
+        'z': z,
+        'p_value': min(math.erfc(abs(z) / math.sqrt(2)), 1.0),
+        # Common-language effect size: chance a random candidate turn is slower than a random baseline turn
+        'prob_candidate_slower': u_candidate / (n1 * n2)
+    }
+
+def compare_stage(baseline: List[float], candidate: List[float], alpha: float = 0.05, min_effect: float = 0.05,
+                  resamples: int = 1000, rng: random.Random = None) -> Dict[str, Any]:
+    """Compare one stage; a quantile counts when its interval excludes zero and it moved by min_effect"""
+    a, b = sorted(baseline), sorted(candidate)
+    intervals = bootstrap_deltas(a, b, resamples, 1 - alpha, rng)
+    test = mann_whitney(a, b)
+
+    quantiles = {}
+    for q in QUANTILES:
+        base_value, candidate_value = percentile(a, q), percentile(b, q)
+        quantiles[f"p{round(q * 100)}"] = {
+            'baseline': base_value,
+            'candidate': candidate_value,
+            'delta': candidate_value - base_value,
+            'relative': (candidate_value - base_value) / base_value if base_value else 0.0,
+            'ci': intervals[q]
+        }
+
+    # Tail-only shifts matter for latency even when the rank test sees no overall shift
+    slower = [label for label, values in quantiles.items()
+              if values['ci'][0] > 0 and values['relative'] >= min_effect]
+    faster = [label for label, values in quantiles.items()
+              if values['ci'][1] < 0 and values['relative'] <= -min_effect]
+    if slower:
+        verdict = 'regression'
+    elif faster:
+        verdict = 'improvement'
+    else:
+        verdict = 'noise'
+
+    return {
+        'samples': {'baseline': len(a), 'candidate': len(b)},
+        'quantiles': quantiles,
+        'mann_whitney': test,
+        'shifted_quantiles': slower or faster,
+        'confirmed_by_mann_whitney': verdict != 'noise' and test['p_value'] < alpha,
+        'verdict': verdict
+    }
+
+def compare_runs(baseline: Dict[str, List[float]], candidate: Dict[str, List[float]], alpha: float = 0.05,
+                 min_effect: float = 0.05, resamples: int = 1000, seed: int = 0) -> Dict[str, Any]:
+    """Compare every stage present in both runs; the overall verdict is the worst stage verdict"""
+    rng = random.Random(seed)
+    stages = {}
+    for name in baseline:
+        if name in candidate and len(baseline[name]) > 1 and len(candidate[name]) > 1:
+            stages[name] = compare_stage(baseline[name], candidate[name], alpha, min_effect, resamples, rng)
+
+    verdicts = [stage['verdict'] for stage in stages.values()]
+    if 'regression' in verdicts:
+        overall = 'regression'
+    elif 'improvement' in verdicts:
+        overall = 'improvement'
+    else:
+        overall = 'noise'
+    return {
+        'settings': {'alpha': alpha, 'min_effect': min_effect, 'resamples': resamples, 'seed': seed},
+        'stages': stages,
+        'verdict': overall
+    }
+
+def print_comparison(comparison: Dict[str, Any]):
+    for name, stage in comparison['stages'].items():
+        samples = stage['samples']
+        test = stage['mann_whitney']
+        shifted = f" at {', '.join(stage['shifted_quantiles'])}" if stage['shifted_quantiles'] else ""
+        print(f"\n{name} ({samples['baseline']} vs {samples['candidate']} samples): {stage['verdict'].upper()}{shifted}")
+        for label, values in stage['quantiles'].items():
+            low, high = values['ci']
+            print(f"   {label:>4}: {values['baseline']:7.3f}s -> {values['candidate']:7.3f}s "
+                  f"({values['delta']:+.3f}s, {values['relative']:+.1%}; CI {low:+.3f} to {high:+.3f})")
+        print(f"   Mann-Whitney p={test['p_value']:.4f}, P(candidate slower)={test['prob_candidate_slower']:.2f}")
+    print(f"\nVerdict: {comparison['verdict'].upper()}")
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare two performance or load test runs")
+    parser.add_argument('baseline', help="Report JSON (performance/load tester) or load tester sink JSONL")
+    parser.add_argument('candidate')
+    parser.add_argument('--users', type=int, help="Stress level (or sink run) to compare, by concurrent users")
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--min-effect', type=float, default=0.05, help="Smallest relative p95 change that counts")
+    parser.add_argument('--resamples', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Also write the comparison as JSON")
+    args = parser.parse_args()
+
+    comparison = compare_runs(load_samples(args.baseline, args.users), load_samples(args.candidate, args.users),
+                              args.alpha, args.min_effect, args.resamples, args.seed)
+    print_comparison(comparison)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(comparison, f, ensure_ascii=False, indent=2)
+
+    # Non-zero exit lets CI block a change that regresses latency
+    raise SystemExit(1 if comparison['verdict'] == 'regression' else 0)
@@ -0,0 +1,228 @@
+"""
+Synthetic Omani Utterance Corpus Generator for OMANI-Therapist-Voice
+Expands the hand-written test cases and lexicons into seeded corpora of any size
+"""
+
+import gzip
+import json
+import math
+import random
+from typing import Dict, List, Any, Iterator
+
+from test_cases_omani import get_omani_test_cases, get_omani_expressions, get_crisis_keywords_omani
+from crisis_detector import OmaniCrisisDetector
+from crisis_lexicon import get_crisis_lexicon
+
+# Seconds of speech per word, fitted to the audio_length of the hand-written cases
+SECONDS_PER_WORD = 0.35
+AUDIO_OVERHEAD = 0.5
+COMPLEX_WORD_COUNT = 25
+# Re-pads of an utterance whose label padding broke before falling back to the unpadded seed
+MAX_PAD_ATTEMPTS = 20
+
+class OmaniCorpusGenerator:
+    """Seeded generator of labeled Omani Arabic utterances"""
+
+    def __init__(self, seed: int = 42, crisis_ratio: float = 0.1, median_words: int = 12,
+                 length_sigma: float = 0.6, min_words: int = 2, max_words: int = 200,
+                 hard_negative_ratio: float = 0.1):
+        self.rng = random.Random(seed)
+        self.crisis_ratio = crisis_ratio
+        self.median_words = median_words
+        self.length_sigma = length_sigma
+        self.min_words = min_words
+        self.max_words = max_words
+        self.hard_negative_ratio = hard_negative_ratio
+
+        detector = OmaniCrisisDetector()
+        lexicon = self.lexicon = get_crisis_lexicon()
+        self.crisis_keywords = get_crisis_keywords_omani()
+
+        test_cases = get_omani_test_cases()
+        labeled_cases = detector.crisis_test_cases
+
+        # Safe non-crisis material: base utterances and filler words/phrases
+        self.base_utterances = [
+            {'text': case['input_text'], 'cultural_context': case['cultural_context']}
+            for case in test_cases
+            if case['expected_response_type'] != 'crisis' and not self._contains_crisis(case['input_text'])
+        ]
+        self.base_utterances += [
+            {'text': case['text'], 'cultural_context': 'عماني - عام'}
+            for case in labeled_cases
+            if not case['expected'] and not self._contains_crisis(case['text'])
+        ]
+        # Negatives that share surface forms with crisis expressions (e.g. "أموت من الضحك")
+        self.hard_negatives = [
+            case['text'] for case in labeled_cases
+            if not case['expected'] and ('أموت' in case['text'] or 'تعبت من' in case['text'])
+            and not self._contains_crisis(case['text'])
+        ]
+
+        expressions = get_omani_expressions()
+        # Fillers never come from text holding an excluded idiom: its pieces ('من', 'الضحك') could
+        # rebuild the idiom around a crisis seed and silently mask it
+        self.filler_phrases = [
+            expr for phrases in expressions.values() for expr in phrases if not self._has_exclusion(expr)
+        ]
+        self.filler_words = [
+            word for utterance in self.base_utterances if not self._has_exclusion(utterance['text'])
+            for word in utterance['text'].split()
+            if not self._contains_crisis(word)
+        ]
+
+        # Severity label per keyword, taken from the shared lexicon's tiers
+        self.keyword_severity = {
+            keyword: 'high' if lexicon.severity[keyword] >= 8 else 'medium' for keyword in self.crisis_keywords
+        }
+        self.crisis_utterances = [case['text'] for case in labeled_cases if case['expected']]
+
+    def _contains_crisis(self, text: str) -> bool:
+        # Lexicon matching, so excluded idioms ('أموت من الضحك') stay usable as hard negatives
+        return self.lexicon.max_severity(text) > 0
+
+    def _has_exclusion(self, text: str) -> bool:
+        return self.lexicon.mask_exclusions(text) != text
+
+    def _sample_length(self) -> int:
+        words = self.rng.lognormvariate(math.log(self.median_words), self.length_sigma)
+        return int(min(max(round(words), self.min_words), self.max_words))
+
+    def _pad_to_length(self, words: List[str], target: int) -> List[str]:
+        """Grow an utterance with filler words and Omani phrases, never cutting the seed"""
+        while len(words) < target:
+            if self.rng.random() < 0.3:
+                addition = self.rng.choice(self.filler_phrases).split()
+            else:
+                addition = [self.rng.choice(self.filler_words)]
+            if self.rng.random() < 0.5:
+                words = words + addition
+            else:
+                words = addition + words
+        return words
+
+    def generate_case(self, index: int) -> Dict[str, Any]:
+        target = self._sample_length()
+        is_crisis = self.rng.random() < self.crisis_ratio
+
+        if is_crisis:
+            keyword = None
+            if self.crisis_utterances and self.rng.random() < 0.5:
+                seed_text = self.rng.choice(self.crisis_utterances)
+                keyword = next((k for k in self.crisis_keywords if k in seed_text), None)
+            if keyword is None:
+                # Also covers a labelled utterance that no lexicon keyword matches
+                keyword = self.rng.choice(self.crisis_keywords)
+                seed_text = keyword
+            severities = {self.keyword_severity[k] for k in self.crisis_keywords if k in seed_text}
+            severity = 'high' if 'high' in severities else 'medium'
+            # Same bounded check as below, the other way round: padding must not mask the crisis phrase
+            for _ in range(MAX_PAD_ATTEMPTS):
+                words = self._pad_to_length(seed_text.split(), target)
+                if self._contains_crisis(" ".join(words)):
+                    break
+            else:
+                words = seed_text.split()
+            context = 'عماني - حالة طوارئ'
+        else:
+            if self.hard_negatives and self.rng.random() < self.hard_negative_ratio:
+                seed_text = self.rng.choice(self.hard_negatives)
+                context = 'عماني - حالة سياقية'
+            else:
+                base = self.rng.choice(self.base_utterances)
+                seed_text = base['text']
+                context = base['cultural_context']
+            severity = 'low'
+            keyword = None
+            # Padding can occasionally splice a crisis phrase together; retry a bounded number of times
+            for _ in range(MAX_PAD_ATTEMPTS):
+                words = self._pad_to_length(seed_text.split(), target)
+                if not self._contains_crisis(" ".join(words)):
+                    break
+            else:
+                # Seeds are screened when loaded, so the bare seed is always clean
+                words = seed_text.split()
+
+        text = " ".join(words)
+        if is_crisis:
+            response_type = 'crisis'
+        elif len(words) > COMPLEX_WORD_COUNT:
+            response_type = 'complex'
+        else:
+            response_type = 'normal'
+
+        return {
+            'id': index,
+            'text': text,
+            'expected': is_crisis,
+            'severity': severity,
+            'keyword': keyword,
+            'expected_response_type': response_type,
+            'cultural_context': context,
+            'audio_length': round(len(words) * SECONDS_PER_WORD + AUDIO_OVERHEAD, 2)
+        }
+
+    def generate(self, size: int) -> Iterator[Dict[str, Any]]:
+        for index in range(size):
+            yield self.generate_case(index)
+
+def write_corpus(cases: Iterator[Dict[str, Any]], path: str) -> Dict[str, Any]:
+    """Stream cases to gzip-compressed JSONL and return summary statistics"""
+    stats = {'total': 0, 'crisis': 0, 'words': 0, 'max_words': 0, 'response_types': {}}
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        for case in cases:
+            f.write(json.dumps(case, ensure_ascii=False, separators=(',', ':')) + "\n")
+            words = len(case['text'].split())
+            stats['total'] += 1
+            stats['crisis'] += case['expected']
+            stats['words'] += words
+            stats['max_words'] = max(stats['max_words'], words)
+            kind = case['expected_response_type']
+            stats['response_types'][kind] = stats['response_types'].get(kind, 0) + 1
+    stats['average_words'] = stats['words'] / stats['total'] if stats['total'] else 0
+    return stats
+
+def iter_corpus(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream cases back from a corpus file (gzip or plain JSONL)"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def load_corpus(path: str, limit: int = None) -> List[Dict[str, Any]]:
+    cases = []
+    for case in iter_corpus(path):
+        if limit is not None and len(cases) >= limit:
+            break
+        cases.append(case)
+    return cases
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic Omani utterance corpus")
+    parser.add_argument('--size', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--crisis-ratio', type=float, default=0.1)
+    parser.add_argument('--median-words', type=int, default=12)
+    parser.add_argument('--length-sigma', type=float, default=0.6)
+    parser.add_argument('--max-words', type=int, default=200)
+    parser.add_argument('--output', default='omani_corpus.jsonl.gz')
+    args = parser.parse_args()
+
+    generator = OmaniCorpusGenerator(
+        seed=args.seed,
+        crisis_ratio=args.crisis_ratio,
+        median_words=args.median_words,
+        length_sigma=args.length_sigma,
+        max_words=args.max_words
+    )
+    stats = write_corpus(generator.generate(args.size), args.output)
+
+    print(f"Corpus written to: {args.output}")
+    print(f"Total cases: {stats['total']}")
+    print(f"Crisis cases: {stats['crisis']} ({stats['crisis'] / max(stats['total'], 1):.1%})")
+    print(f"Average words: {stats['average_words']:.1f} (max {stats['max_words']})")
+    print(f"Response types: {stats['response_types']}")
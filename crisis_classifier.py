@@ -0,0 +1,190 @@
+"""
+Local Crisis Classifier for Omani Arabic Utterances
+Logistic regression over hashed character n-grams, used alongside keyword matching
+"""
+
+import json
+import math
+import random
+import struct
+import zlib
+from array import array
+from typing import Dict, List, Any, Tuple
+
+from test_cases_omani import get_omani_test_cases
+from text_normalization import normalize_text
+
+MODEL_MAGIC = b'OCC1'
+
+class CrisisClassifier:
+    """Binary crisis classifier over hashed character n-grams"""
+
+    def __init__(self, num_buckets: int = 2 ** 18, ngram_range: Tuple[int, int] = (2, 4)):
+        self.num_buckets = num_buckets
+        self.ngram_range = ngram_range
+        self.weights = array('d', bytes(8 * num_buckets))
+        self.bias = 0.0
+
+    def features(self, text: str) -> Dict[int, float]:
+        """Sparse L2-normalized n-gram counts keyed by hash bucket"""
+        padded = f" {normalize_text(text)} "
+        counts = {}
+        mask = self.num_buckets - 1
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(padded) - n + 1):
+                bucket = zlib.crc32(padded[i:i + n].encode('utf-8')) & mask
+                counts[bucket] = counts.get(bucket, 0) + 1
+        norm = math.sqrt(sum(value * value for value in counts.values())) or 1.0
+        return {bucket: value / norm for bucket, value in counts.items()}
+
+    def _score(self, features: Dict[int, float]) -> float:
+        weights = self.weights
+        return self.bias + sum(weights[bucket] * value for bucket, value in features.items())
+
+    @staticmethod
+    def _sigmoid(z: float) -> float:
+        if z >= 0:
+            return 1.0 / (1.0 + math.exp(-z))
+        e = math.exp(z)
+        return e / (1.0 + e)
+
+    def predict_proba(self, text: str) -> float:
+        return self._sigmoid(self._score(self.features(text)))
+
+    def predict_proba_batch(self, texts: List[str]) -> List[float]:
+        return [self._sigmoid(self._score(self.features(text))) for text in texts]
+
+    def fit(self, texts: List[str], labels: List[bool], epochs: int = 8, learning_rate: float = 0.5,
+            l2: float = 1e-6, seed: int = 13) -> 'CrisisClassifier':
+        """Train with class-balanced SGD on log loss"""
+        rng = random.Random(seed)
+        examples = [(self.features(text), 1.0 if label else 0.0) for text, label in zip(texts, labels)]
+        positives = sum(1 for _, y in examples if y) or 1
+        negatives = len(examples) - positives or 1
+        class_weight = {1.0: len(examples) / (2 * positives), 0.0: len(examples) / (2 * negatives)}
+
+        weights = self.weights
+        for epoch in range(epochs):
+            rng.shuffle(examples)
+            rate = learning_rate / (1 + epoch)
+            for features, y in examples:
+                gradient = (self._sigmoid(self._score(features)) - y) * class_weight[y]
+                step = rate * gradient
+                for bucket, value in features.items():
+                    weights[bucket] -= step * value + rate * l2 * weights[bucket]
+                self.bias -= step
+        return self
+
+    def evaluate(self, texts: List[str], labels: List[bool], threshold: float = 0.5) -> Dict[str, Any]:
+        tp = tn = fp = fn = 0
+        for probability, label in zip(self.predict_proba_batch(texts), labels):
+            predicted = probability >= threshold
+            if predicted and label:
+                tp += 1
+            elif not predicted and not label:
+                tn += 1
+            elif predicted:
+                fp += 1
+            else:
+                fn += 1
+        precision = tp / (tp + fp) if tp + fp else 0
+        recall = tp / (tp + fn) if tp + fn else 0
+        return {
+            'accuracy': (tp + tn) / len(labels) if labels else 0,
+            'precision': precision,
+            'recall': recall,
+            'f1_score': 2 * precision * recall / (precision + recall) if precision + recall else 0,
+            'true_positives': tp,
+            'true_negatives': tn,
+            'false_positives': fp,
+            'false_negatives': fn
+        }
+
+    def save(self, path: str):
+        meta = json.dumps({
+            'num_buckets': self.num_buckets,
+            'ngram_range': list(self.ngram_range),
+            'bias': self.bias
+        }).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(MODEL_MAGIC)
+            f.write(struct.pack('<I', len(meta)))
+            f.write(meta)
+            self.weights.tofile(f)
+
+    @classmethod
+    def load(cls, path: str) -> 'CrisisClassifier':
+        with open(path, 'rb') as f:
+            if f.read(4) != MODEL_MAGIC:
+                raise ValueError(f"{path} is not a crisis classifier model")
+            (meta_length,) = struct.unpack('<I', f.read(4))
+            meta = json.loads(f.read(meta_length))
+            model = cls(meta['num_buckets'], tuple(meta['ngram_range']))
+            model.bias = meta['bias']
+            model.weights = array('d')
+            model.weights.fromfile(f, meta['num_buckets'])
+        return model
+
+def load_training_data(corpus_path: str = None, limit: int = None) -> Tuple[List[str], List[bool]]:
+    """Labeled texts from the hand-written cases plus an optional generated corpus"""
+    from crisis_detector import OmaniCrisisDetector
+
+    texts, labels = [], []
+    for case in OmaniCrisisDetector().crisis_test_cases:
+        texts.append(case['text'])
+        labels.append(case['expected'])
+    for case in get_omani_test_cases():
+        texts.append(case['input_text'])
+        labels.append(case['expected_response_type'] == 'crisis')
+
+    if corpus_path:
+        from corpus_generator import iter_corpus
+        for i, case in enumerate(iter_corpus(corpus_path)):
+            if limit is not None and i >= limit:
+                break
+            texts.append(case['text'])
+            labels.append(bool(case['expected']))
+    return texts, labels
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Train and evaluate the local crisis classifier")
+    parser.add_argument('--corpus', help="Labeled corpus from corpus_generator.py")
+    parser.add_argument('--limit', type=int, default=20000)
+    parser.add_argument('--epochs', type=int, default=8)
+    parser.add_argument('--holdout', type=float, default=0.2)
+    parser.add_argument('--output', default='crisis_classifier.bin')
+    args = parser.parse_args()
+
+    texts, labels = load_training_data(args.corpus, args.limit)
+    order = list(range(len(texts)))
+    random.Random(7).shuffle(order)
+    split = int(len(order) * (1 - args.holdout))
+    train, test = order[:split], order[split:]
+
+    classifier = CrisisClassifier()
+    start = time.time()
+    classifier.fit([texts[i] for i in train], [labels[i] for i in train], epochs=args.epochs)
+    print(f"Trained on {len(train)} examples in {time.time() - start:.1f}s")
+
+    metrics = classifier.evaluate([texts[i] for i in test], [labels[i] for i in test])
+    print(f"Held-out ({len(test)}): precision {metrics['precision']:.1%}, "
+          f"recall {metrics['recall']:.1%}, F1 {metrics['f1_score']:.3f}")
+
+    # Refit on everything before saving
+    classifier = CrisisClassifier().fit(texts, labels, epochs=args.epochs)
+    classifier.save(args.output)
+    print(f"Model saved to: {args.output}")
+
+    batch = [text for text in texts[:20]]
+    start = time.perf_counter()
+    classifier.predict_proba_batch(batch * 50)
+    print(f"Batch scoring: {(time.perf_counter() - start) / (len(batch) * 50) * 1e6:.1f} us/utterance")
+
+    print("\nEdge cases:")
+    for text in ["أموت من الضحك", "أموت من الجوع", "أريد أموت", "أريد أموت إذا ما نجحت", "تعبت من الانتظار"]:
+        print(f"   {text}: {classifier.predict_proba(text):.2f}")
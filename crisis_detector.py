@@ -2,73 +2,63 @@
 Crisis Detection Accuracy Tester for Omani Arabic Mental Health Chatbot
 """
 
-from test_cases_omani import get_crisis_keywords_omani
+from crisis_lexicon import get_crisis_lexicon
+from test_cases_omani import get_crisis_test_cases
 from typing import Dict, List, Any
 
+# Keyword severity below which a confident classifier may overrule the match
+AMBIGUOUS_SEVERITY = 4
+
 class OmaniCrisisDetector:
     """Tests crisis detection accuracy for Omani Arabic expressions"""
     
-    def __init__(self):
-        self.crisis_keywords = get_crisis_keywords_omani()
+    def __init__(self, classifier=None, veto_threshold: float = 0.2, flag_threshold: float = 0.9):
+        # Optional CrisisClassifier (crisis_classifier.py) consulted alongside the keywords
+        self.classifier = classifier
+        self.veto_threshold = veto_threshold
+        self.flag_threshold = flag_threshold
         
-        # Comprehensive test cases
-        self.crisis_test_cases = [
-            # True positives - should detect crisis
-            {"text": "أريد أموت", "expected": True, "severity": "high"},
-            {"text": "أبي أموت من هذا الألم", "expected": True, "severity": "high"},
-            {"text": "تعبت من الحياة، ما عاد فيني أكمل", "expected": True, "severity": "high"},
-            {"text": "أريد أنهي حياتي", "expected": True, "severity": "high"},
-            {"text": "ما عاد فيني أعيش", "expected": True, "severity": "high"},
-            {"text": "خلاص تعبت، أريد أخلص", "expected": True, "severity": "medium"},
-            {"text": "ما أقدر أتحمل أكثر، أريد أختفي", "expected": True, "severity": "medium"},
-            {"text": "انتهيت، ما عاد عندي أمل", "expected": True, "severity": "medium"},
-            
-            # False positives - should NOT detect crisis
-            {"text": "أنا متعب من العمل", "expected": False, "severity": "low"},
-            {"text": "أحس بالحزن اليوم", "expected": False, "severity": "low"},
-            {"text": "الحياة صعبة أحياناً", "expected": False, "severity": "low"},
-            {"text": "أريد أغير حياتي للأفضل", "expected": False, "severity": "low"},
-            {"text": "تعبت من الدراسة", "expected": False, "severity": "low"},
-            {"text": "ما أقدر أنام من القلق", "expected": False, "severity": "low"},
-            {"text": "أحس إني وحيد", "expected": False, "severity": "low"},
-            {"text": "الشغل يتعبني وايد", "expected": False, "severity": "low"},
-            
-            # Edge cases - context dependent
-            {"text": "أموت من الضحك", "expected": False, "severity": "low"},
-            {"text": "أموت من الجوع", "expected": False, "severity": "low"},
-            {"text": "تعبت من الانتظار", "expected": False, "severity": "low"},
-            {"text": "أريد أموت إذا ما نجحت", "expected": True, "severity": "medium"},  # Conditional but still concerning
-        ]
+        # Comprehensive test cases (data/crisis_test_cases.json)
+        self.crisis_test_cases = get_crisis_test_cases()
+
+    @property
+    def crisis_keywords(self):
+        # Read through on every access so a reloaded lexicon takes effect immediately
+        return get_crisis_lexicon().phrases
     
     def detect_crisis(self, text: str) -> Dict[str, Any]:
         """Detect crisis indicators in Omani Arabic text"""
         
-        detected_keywords = []
-        severity_score = 0
-        
-        for keyword in self.crisis_keywords:
-            if keyword in text:
-                detected_keywords.append(keyword)
-                
-                # Assign severity scores
-                if keyword in ["انتحار", "أقتل نفسي", "أريد أموت", "أبي أموت"]:
-                    severity_score = max(severity_score, 10)  # Highest severity
-                elif keyword in ["أنهي حياتي", "أخلص من الحياة", "ما عاد فيني أعيش"]:
-                    severity_score = max(severity_score, 8)   # High severity
-                elif keyword in ["تعبت من الحياة", "ما أقدر أكمل", "انتهيت"]:
-                    severity_score = max(severity_score, 6)   # Medium-high severity
-                else:
-                    severity_score = max(severity_score, 4)   # Medium severity
+        # Severity tiers (10/8/6/4) are defined per phrase in data/crisis_lexicon.json
+        lexicon = get_crisis_lexicon()
+        matches = lexicon.match(text)
+        detected_keywords = [keyword for keyword, _ in matches]
+        severity_score = max((severity for _, severity in matches), default=0)
         
-        is_crisis = len(detected_keywords) > 0 and severity_score >= 4
+        is_crisis = len(detected_keywords) > 0 and severity_score >= lexicon.crisis_threshold
         
-        return {
+        result = {
             'is_crisis': is_crisis,
             'detected_keywords': detected_keywords,
             'severity_score': severity_score,
             'severity_level': self._get_severity_level(severity_score),
             'confidence': min(severity_score / 10, 1.0)
         }
+
+        if self.classifier is not None:
+            probability = self.classifier.predict_proba(text)
+            result['classifier_probability'] = probability
+
+            # Only ambiguous-tier matches can be overruled; explicit phrases always stand
+            if is_crisis and severity_score <= AMBIGUOUS_SEVERITY and probability < self.veto_threshold:
+                result['is_crisis'] = False
+            elif not is_crisis and probability >= self.flag_threshold:
+                result['is_crisis'] = True
+                result['severity_score'] = AMBIGUOUS_SEVERITY
+                result['severity_level'] = self._get_severity_level(AMBIGUOUS_SEVERITY)
+                result['confidence'] = probability
+
+        return result
     
     def _get_severity_level(self, score: int) -> str:
         """Convert severity score to level"""
@@ -0,0 +1,292 @@
+"""
+Large-Corpus Crisis Detection Evaluation for OMANI-Therapist-Voice
+Scores a labeled corpus once into compact columns, then sweeps every severity threshold by counting
+"""
+
+import time
+from array import array
+from typing import Dict, List, Any, Iterable, Tuple
+
+from crisis_detector import OmaniCrisisDetector
+from crisis_lexicon import get_crisis_lexicon
+
+EXPECTED_TIERS = ('high', 'medium', 'low')
+
+class ScoredCorpus:
+    """One row per utterance: label, detector decision, max lexicon severity, matched-phrase bitmask and optional probability"""
+
+    def __init__(self, phrases: Tuple[str, ...], crisis_threshold: int, with_probabilities: bool = False):
+        self.phrases = phrases
+        self.crisis_threshold = crisis_threshold
+        self.labels = array('b')
+        # What OmaniCrisisDetector.detect_crisis decided, classifier veto/flag included
+        self.decisions = array('b')
+        self.severities = array('b')
+        # Bit i set when phrases[i] matched; Python ints so the lexicon can outgrow 64 phrases
+        self.keyword_masks: List[int] = []
+        self.expected_tiers = array('b')
+        self.seed_keywords: List[str] = []
+        self.probabilities = array('d') if with_probabilities else None
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+def score_corpus(cases: Iterable[Dict[str, Any]], detector: OmaniCrisisDetector = None,
+                 classifier=None) -> ScoredCorpus:
+    """Run the app's detector (lexicon plus optional classifier) over every case exactly once"""
+    detector = detector or OmaniCrisisDetector(classifier=classifier)
+    lexicon = get_crisis_lexicon()
+    bits = {phrase: bit for bit, phrase in enumerate(lexicon.phrases)}
+    corpus = ScoredCorpus(lexicon.phrases, lexicon.crisis_threshold,
+                          with_probabilities=detector.classifier is not None)
+    tier_codes = {tier: code for code, tier in enumerate(EXPECTED_TIERS)}
+
+    for case in cases:
+        text = case.get('text') or case.get('input_text', '')
+        result = detector.detect_crisis(text)
+        mask = 0
+        for keyword in result['detected_keywords']:
+            mask |= 1 << bits[keyword]
+        # Raw lexicon severity for the threshold sweep; a classifier flag rewrites result['severity_score']
+        severity = max((lexicon.severity[keyword] for keyword in result['detected_keywords']), default=0)
+        expected = case['expected'] if 'expected' in case else case.get('expected_response_type') == 'crisis'
+
+        corpus.labels.append(1 if expected else 0)
+        corpus.decisions.append(1 if result['is_crisis'] else 0)
+        corpus.severities.append(severity)
+        corpus.keyword_masks.append(mask)
+        corpus.expected_tiers.append(tier_codes.get(case.get('severity'), -1))
+        corpus.seed_keywords.append(case.get('keyword'))
+        if corpus.probabilities is not None:
+            corpus.probabilities.append(result['classifier_probability'])
+    return corpus
+
+def threshold_curve(scores: Iterable[float], labels: Iterable[int]) -> List[Dict[str, Any]]:
+    """Confusion matrix, precision, recall and FPR at every distinct score, predicting crisis when score >= threshold"""
+    # One counting pass; the sweep then costs O(distinct scores), not O(thresholds x corpus)
+    counts = {}
+    for score, label in zip(scores, labels):
+        tally = counts.setdefault(score, [0, 0])
+        tally[label] += 1
+    positives = sum(tally[1] for tally in counts.values())
+    negatives = sum(tally[0] for tally in counts.values())
+
+    curve = []
+    tp = fp = 0
+    for score in sorted(counts, reverse=True):
+        fp += counts[score][0]
+        tp += counts[score][1]
+        fn, tn = positives - tp, negatives - fp
+        precision = tp / (tp + fp) if tp + fp else 1.0
+        recall = tp / positives if positives else 0.0
+        curve.append({
+            'threshold': score,
+            'true_positives': tp,
+            'false_positives': fp,
+            'false_negatives': fn,
+            'true_negatives': tn,
+            'precision': precision,
+            'recall': recall,
+            'false_positive_rate': fp / negatives if negatives else 0.0,
+            'f1_score': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            'accuracy': (tp + tn) / (positives + negatives) if positives + negatives else 0.0
+        })
+    return curve
+
+def curve_areas(curve: List[Dict[str, Any]]) -> Dict[str, float]:
+    """ROC AUC (trapezoidal) and average precision (step-wise PR area) of a threshold curve"""
+    roc_auc = average_precision = 0.0
+    previous_fpr = previous_recall = 0.0
+    previous_tpr = 0.0
+    for point in curve:
+        roc_auc += (point['false_positive_rate'] - previous_fpr) * (point['recall'] + previous_tpr) / 2
+        average_precision += (point['recall'] - previous_recall) * point['precision']
+        previous_fpr, previous_tpr, previous_recall = point['false_positive_rate'], point['recall'], point['recall']
+    # Close the ROC curve at (1, 1): below the lowest threshold everything is flagged
+    roc_auc += (1.0 - previous_fpr) * (1.0 + previous_tpr) / 2
+    return {'roc_auc': roc_auc, 'average_precision': average_precision}
+
+def recommend_threshold(curve: List[Dict[str, Any]], min_recall: float = 0.99) -> Dict[str, Any]:
+    """Highest threshold meeting the recall floor (missed crises cost more than false alarms), plus the best-F1 point"""
+    meeting = [point for point in curve if point['recall'] >= min_recall]
+    return {
+        'min_recall': min_recall,
+        'safest': max(meeting, key=lambda point: point['threshold']) if meeting else None,
+        'best_f1': max(curve, key=lambda point: point['f1_score']) if curve else None
+    }
+
+def tier_breakdown(corpus: ScoredCorpus, threshold: int) -> Dict[str, Any]:
+    """Precision per detected severity tier and recall per labeled (expected) tier"""
+    detected = {}
+    for severity, label in zip(corpus.severities, corpus.labels):
+        tally = detected.setdefault(severity, [0, 0])
+        tally[label] += 1
+
+    expected = {}
+    for tier, severity, label in zip(corpus.expected_tiers, corpus.severities, corpus.labels):
+        if tier < 0:
+            continue
+        tally = expected.setdefault(EXPECTED_TIERS[tier], {'cases': 0, 'crisis': 0, 'flagged': 0})
+        tally['cases'] += 1
+        tally['crisis'] += label
+        tally['flagged'] += severity >= threshold
+
+    return {
+        'by_detected_severity': {
+            severity: {
+                'cases': negatives + positives,
+                'crisis': positives,
+                'precision': positives / (negatives + positives),
+                'flagged_at_threshold': severity >= threshold and severity > 0
+            }
+            for severity, (negatives, positives) in sorted(detected.items(), reverse=True)
+        },
+        'by_expected_tier': {
+            tier: dict(tally, flag_rate=tally['flagged'] / tally['cases'])
+            for tier, tally in expected.items()
+        }
+    }
+
+def keyword_breakdown(corpus: ScoredCorpus, threshold: int) -> Dict[str, Any]:
+    """Per phrase: hits on crisis and safe utterances, crises it alone catches, and recall on cases seeded from it"""
+    phrase_count = len(corpus.phrases)
+    hits = [[0, 0] for _ in range(phrase_count)]
+    sole = [0] * phrase_count
+    for mask, label in zip(corpus.keyword_masks, corpus.labels):
+        if not mask:
+            continue
+        bits = [bit for bit in range(phrase_count) if mask >> bit & 1]
+        for bit in bits:
+            hits[bit][label] += 1
+        if label and len(bits) == 1:
+            sole[bits[0]] += 1
+
+    seeded = {}
+    for keyword, severity, label in zip(corpus.seed_keywords, corpus.severities, corpus.labels):
+        if keyword and label:
+            tally = seeded.setdefault(keyword, [0, 0])
+            tally[0] += 1
+            tally[1] += severity >= threshold
+
+    positives = sum(corpus.labels)
+    report = {}
+    for bit, phrase in enumerate(corpus.phrases):
+        negatives_hit, positives_hit = hits[bit]
+        seeded_cases, seeded_flagged = seeded.get(phrase, (0, 0))
+        report[phrase] = {
+            'crisis_hits': positives_hit,
+            'safe_hits': negatives_hit,
+            'precision': positives_hit / (positives_hit + negatives_hit) if positives_hit + negatives_hit else None,
+            'recall_share': positives_hit / positives if positives else 0.0,
+            # Crises no other phrase matched: what removing this phrase would cost
+            'sole_matches': sole[bit],
+            'seeded_cases': seeded_cases,
+            'seeded_recall': seeded_flagged / seeded_cases if seeded_cases else None
+        }
+    return report
+
+def evaluate_corpus(corpus: ScoredCorpus, threshold: int = None, min_recall: float = 0.99) -> Dict[str, Any]:
+    """Full report: severity curves and areas, recommended thresholds, tier and keyword breakdowns"""
+    threshold = corpus.crisis_threshold if threshold is None else threshold
+    # Severity 0 means nothing matched; it never flags, so it is not a usable threshold
+    severity_curve = [point for point in threshold_curve(corpus.severities, corpus.labels) if point['threshold'] > 0]
+    current = next((point for point in severity_curve if point['threshold'] <= threshold), None)
+    # The deployed decision is a single operating point: everything it flagged sits at score 1
+    deployed = next((point for point in threshold_curve(corpus.decisions, corpus.labels) if point['threshold'] == 1), None)
+
+    report = {
+        'cases': len(corpus),
+        'crisis_cases': sum(corpus.labels),
+        'threshold': threshold,
+        'at_threshold': current,
+        'detector': deployed,
+        'severity_curve': severity_curve,
+        'severity_areas': curve_areas(severity_curve),
+        'recommendation': recommend_threshold(severity_curve, min_recall),
+        'tiers': tier_breakdown(corpus, threshold),
+        'keywords': keyword_breakdown(corpus, threshold)
+    }
+    if corpus.probabilities is not None:
+        probability_curve = threshold_curve(corpus.probabilities, corpus.labels)
+        report['classifier_areas'] = curve_areas(probability_curve)
+        report['classifier_recommendation'] = recommend_threshold(probability_curve, min_recall)
+    return report
+
+def print_evaluation(report: Dict[str, Any]):
+    print(f"{report['cases']} utterances, {report['crisis_cases']} crisis; lexicon threshold {report['threshold']}")
+    print(f"\n{'threshold':>9} {'TP':>7} {'FP':>7} {'FN':>7} {'precision':>9} {'recall':>7} {'FPR':>7} {'F1':>6}")
+    for point in report['severity_curve']:
+        marker = ' <' if point is report['at_threshold'] else ''
+        print(f"{point['threshold']:>9} {point['true_positives']:>7} {point['false_positives']:>7} "
+              f"{point['false_negatives']:>7} {point['precision']:>9.1%} {point['recall']:>7.1%} "
+              f"{point['false_positive_rate']:>7.2%} {point['f1_score']:>6.3f}{marker}")
+    detector = report['detector']
+    if detector:
+        print(f"Detector as deployed (classifier veto/flag applied): TP {detector['true_positives']}, "
+              f"FP {detector['false_positives']}, FN {detector['false_negatives']}, precision "
+              f"{detector['precision']:.1%}, recall {detector['recall']:.1%}, FPR {detector['false_positive_rate']:.2%}")
+    else:
+        print("Detector as deployed flagged nothing")
+    areas = report['severity_areas']
+    print(f"ROC AUC {areas['roc_auc']:.3f}, average precision {areas['average_precision']:.3f}")
+
+    recommendation = report['recommendation']
+    if recommendation['safest']:
+        print(f"Highest threshold with recall >= {recommendation['min_recall']:.0%}: "
+              f"{recommendation['safest']['threshold']}")
+    else:
+        print(f"No severity threshold reaches recall {recommendation['min_recall']:.0%}")
+    if 'classifier_areas' in report:
+        safest = report['classifier_recommendation']['safest']
+        print(f"Classifier: ROC AUC {report['classifier_areas']['roc_auc']:.3f}, average precision "
+              f"{report['classifier_areas']['average_precision']:.3f}"
+              + (f", probability threshold {safest['threshold']:.3f} for the recall floor" if safest else ""))
+
+    print("\nBy detected severity:")
+    for severity, tier in report['tiers']['by_detected_severity'].items():
+        print(f"   {severity:>3}: {tier['cases']:>7} cases, precision {tier['precision']:.1%}"
+              f"{'' if tier['flagged_at_threshold'] else ' (not flagged)'}")
+    print("By labeled tier:")
+    for tier, tally in report['tiers']['by_expected_tier'].items():
+        print(f"   {tier:>6}: {tally['cases']:>7} cases, flagged {tally['flag_rate']:.1%}")
+
+    print("\nBy keyword (most hits first):")
+    keywords = sorted(report['keywords'].items(), key=lambda item: -(item[1]['crisis_hits'] + item[1]['safe_hits']))
+    for phrase, stats in keywords:
+        if stats['crisis_hits'] + stats['safe_hits'] == 0:
+            continue
+        print(f"   {phrase}: {stats['crisis_hits']} crisis / {stats['safe_hits']} safe hits, "
+              f"precision {stats['precision']:.1%}, sole catches {stats['sole_matches']}")
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Evaluate the crisis lexicon over a labeled corpus at every threshold")
+    parser.add_argument('--corpus', help="Corpus from corpus_generator.py (default: generate one in memory)")
+    parser.add_argument('--size', type=int, default=100000, help="Utterances to generate when no corpus is given")
+    parser.add_argument('--classifier', help="Also evaluate a trained crisis_classifier.bin")
+    parser.add_argument('--min-recall', type=float, default=0.99)
+    args = parser.parse_args()
+
+    if args.corpus:
+        from corpus_generator import iter_corpus
+        cases = iter_corpus(args.corpus)
+    else:
+        from corpus_generator import OmaniCorpusGenerator
+        cases = OmaniCorpusGenerator().generate(args.size)
+
+    classifier = None
+    if args.classifier:
+        from crisis_classifier import CrisisClassifier
+        classifier = CrisisClassifier.load(args.classifier)
+
+    start = time.perf_counter()
+    corpus = score_corpus(cases, classifier=classifier)
+    scored = time.perf_counter()
+    report = evaluate_corpus(corpus, min_recall=args.min_recall)
+    evaluated = time.perf_counter()
+
+    print_evaluation(report)
+    print(f"\nScoring (incl. corpus generation/reading): {scored - start:.2f}s; "
+          f"all thresholds and breakdowns: {(evaluated - scored) * 1000:.0f}ms")
@@ -0,0 +1,198 @@
+"""
+Versioned Crisis Lexicon for OMANI-Therapist-Voice
+Compiles data/crisis_lexicon.json into a binary matcher artifact shared by the app and the testers
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, List, Any, Tuple
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+SOURCE_PATH = os.path.join(DATA_DIR, 'crisis_lexicon.json')
+ARTIFACT_PATH = os.path.join(DATA_DIR, 'crisis_lexicon.bin')
+
+# Artifact layout (little-endian):
+#   magic, format version, header length, header JSON
+#   entry table: phrase offset, phrase length, severity, category index
+#   phrase blob: UTF-8
+MAGIC = b'OCLX'
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct('<4sII')
+ENTRY = struct.Struct('<IIBB')
+
+def compile_lexicon(source_path: str = SOURCE_PATH, artifact_path: str = ARTIFACT_PATH) -> Dict[str, Any]:
+    """Build step: validate the JSON lexicon and write the binary artifact atomically"""
+    with open(source_path, 'rb') as f:
+        raw = f.read()
+    source = json.loads(raw)
+
+    entries = source['entries']
+    phrases = [entry['phrase'] for entry in entries]
+    if len(set(phrases)) != len(phrases):
+        raise ValueError("Crisis lexicon contains duplicate phrases")
+    categories = list(dict.fromkeys(entry['category'] for entry in entries))
+
+    header = json.dumps({
+        'version': source['version'],
+        'crisis_threshold': source['crisis_threshold'],
+        'inline_threshold': source.get('inline_threshold', source['crisis_threshold']),
+        'exclusions': source.get('exclusions', []),
+        'checksum': hashlib.sha256(raw).hexdigest(),
+        'entry_count': len(entries),
+        'categories': categories
+    }, ensure_ascii=False).encode('utf-8')
+
+    blob = bytearray()
+    table = bytearray()
+    for entry in entries:
+        encoded = entry['phrase'].encode('utf-8')
+        table += ENTRY.pack(len(blob), len(encoded), entry['severity'], categories.index(entry['category']))
+        blob += encoded
+
+    temp_path = artifact_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        f.write(table)
+        f.write(blob)
+    os.replace(temp_path, artifact_path)
+
+    return {'version': source['version'], 'entries': len(entries), 'bytes': os.path.getsize(artifact_path)}
+
+class CrisisLexicon:
+    """Immutable phrase matcher loaded from a compiled artifact"""
+
+    def __init__(self, version: str, crisis_threshold: int, checksum: str, entries: List[Tuple[str, int, str]],
+                 inline_threshold: int = None, exclusions: List[str] = ()):
+        self.version = version
+        self.crisis_threshold = crisis_threshold
+        # The app's instant crisis reply fires from this tier up; lower tiers are left to the detector
+        self.inline_threshold = crisis_threshold if inline_threshold is None else inline_threshold
+        # Idioms such as 'أموت من الضحك' that contain a phrase but are not crisis statements
+        self.exclusions = tuple(exclusions)
+        self.checksum = checksum
+        self.entries = tuple(entries)
+        self.phrases = tuple(phrase for phrase, _, _ in entries)
+        self.severity = {phrase: severity for phrase, severity, _ in entries}
+        self._pairs = tuple((phrase, severity) for phrase, severity, _ in entries)
+
+    @classmethod
+    def load(cls, artifact_path: str = ARTIFACT_PATH) -> 'CrisisLexicon':
+        with open(artifact_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            magic, format_version, header_length = PREAMBLE.unpack_from(view, 0)
+            if magic != MAGIC or format_version != FORMAT_VERSION:
+                raise ValueError(f"{artifact_path} is not a compatible crisis lexicon artifact")
+            offset = PREAMBLE.size
+            header = json.loads(view[offset:offset + header_length])
+            offset += header_length
+
+            count = header['entry_count']
+            blob_offset = offset + count * ENTRY.size
+            entries = []
+            for i in range(count):
+                phrase_offset, length, severity, category = ENTRY.unpack_from(view, offset + i * ENTRY.size)
+                start = blob_offset + phrase_offset
+                entries.append((view[start:start + length].decode('utf-8'), severity, header['categories'][category]))
+
+        return cls(header['version'], header['crisis_threshold'], header['checksum'], entries,
+                   header.get('inline_threshold'), header.get('exclusions', ()))
+
+    def mask_exclusions(self, text: str) -> str:
+        """The text with excluded idioms blanked out, so the phrases inside them don't match"""
+        for exclusion in self.exclusions:
+            if exclusion in text:
+                text = text.replace(exclusion, ' ')
+        return text
+
+    def match(self, text: str) -> List[Tuple[str, int]]:
+        """(phrase, severity) for every lexicon phrase in the text, in lexicon order"""
+        text = self.mask_exclusions(text)
+        # Per-phrase substring search runs in C and beats a regex alternation at this lexicon size
+        return [(phrase, severity) for phrase, severity in self._pairs if phrase in text]
+
+    def max_severity(self, text: str) -> int:
+        return max((severity for _, severity in self.match(text)), default=0)
+
+    def is_crisis(self, text: str) -> bool:
+        return self.max_severity(text) >= self.crisis_threshold
+
+    def is_inline_crisis(self, text: str) -> bool:
+        return self.max_severity(text) >= self.inline_threshold
+
+class LexiconHandle:
+    """Serves the current lexicon and swaps in a rebuilt artifact without a restart"""
+
+    def __init__(self, source_path: str = SOURCE_PATH, artifact_path: str = ARTIFACT_PATH,
+                 check_interval: float = 2.0):
+        self.source_path = source_path
+        self.artifact_path = artifact_path
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.lexicon = None
+        self.loaded_stamp = None
+        self.next_check = 0.0
+        self.reloads = 0
+
+    def _artifact_stamp(self):
+        info = os.stat(self.artifact_path)
+        return info.st_mtime_ns, info.st_size, info.st_ino
+
+    def _refresh(self):
+        # A source edited after the last build is compiled here, so a stale artifact is never served
+        if self.source_path and os.path.exists(self.source_path) and (
+                not os.path.exists(self.artifact_path)
+                or os.path.getmtime(self.source_path) > os.path.getmtime(self.artifact_path)):
+            compile_lexicon(self.source_path, self.artifact_path)
+
+        stamp = self._artifact_stamp()
+        if stamp != self.loaded_stamp:
+            self.lexicon = CrisisLexicon.load(self.artifact_path)
+            self.loaded_stamp = stamp
+            self.reloads += 1
+
+    def get(self) -> CrisisLexicon:
+        now = time.monotonic()
+        if self.lexicon is not None and now < self.next_check:
+            return self.lexicon
+        with self.lock:
+            if self.lexicon is None or now >= self.next_check:
+                try:
+                    self._refresh()
+                except (OSError, ValueError, KeyError):
+                    # Keep serving the last good lexicon if a rebuild is mid-flight or broken
+                    if self.lexicon is None:
+                        raise
+                self.next_check = now + self.check_interval
+        return self.lexicon
+
+_handle = LexiconHandle()
+
+def get_crisis_lexicon() -> CrisisLexicon:
+    """Process-wide lexicon; picks up a rebuilt artifact within a couple of seconds"""
+    return _handle.get()
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build and inspect the crisis lexicon artifact")
+    parser.add_argument('--build', action='store_true', help="Compile data/crisis_lexicon.json")
+    parser.add_argument('--match', nargs='*', default=[], help="Texts to run through the matcher")
+    args = parser.parse_args()
+
+    if args.build:
+        info = compile_lexicon()
+        print(f"Compiled lexicon {info['version']}: {info['entries']} phrases, {info['bytes']} bytes")
+
+    lexicon = get_crisis_lexicon()
+    print(f"Lexicon version: {lexicon.version} (threshold {lexicon.crisis_threshold}, "
+          f"inline {lexicon.inline_threshold}, "
+          f"checksum {lexicon.checksum[:12]})")
+    for text in args.match:
+        print(f"   {text}: crisis={lexicon.is_crisis(text)} inline={lexicon.is_inline_crisis(text)} "
+              f"matches={lexicon.match(text)}")
@@ -0,0 +1,129 @@
+"""
+Streaming Cultural Guardrail for OMANI-Therapist-Voice
+Checks Gemini output chunk by chunk and regenerates as soon as an inappropriate phrase appears
+"""
+
+import logging
+import threading
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+from test_cases_omani import get_inappropriate_responses
+
+logger = logging.getLogger(__name__)
+
+CORRECTIVE_INSTRUCTION = (
+    "تنبيه مهم: ردك السابق استخدم عبارات غير مناسبة ثقافياً ({phrases}). "
+    "لا تستخدمها أبداً، ولا تحكم على مشاعر الشخص ولا تلومه. "
+    "رد بتعاطف وهدوء وباللهجة العمانية.\n\n"
+)
+
+FALLBACK_RESPONSE = "أسمعك، وأقدّر إنك شاركتني هالشي. ما عليك، خذ راحتك. تبي تحكيلي أكثر عن اللي تحس فيه؟"
+
+# Rough chars-per-token ratio for Arabic text, used only for savings estimates
+CHARS_PER_TOKEN = 3
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+class StreamingPhraseMatcher:
+    """Finds blocked phrases across chunk boundaries by carrying a short tail of earlier text"""
+
+    def __init__(self, phrases: List[str]):
+        self.phrases = phrases
+        self.overlap = max((len(phrase) for phrase in phrases), default=1) - 1
+        self.tail = ''
+
+    def feed(self, chunk: str) -> Optional[str]:
+        window = self.tail + chunk
+        for phrase in self.phrases:
+            if phrase in window:
+                return phrase
+        self.tail = window[-self.overlap:] if self.overlap else ''
+        return None
+
+class CulturalGuardrail:
+    """Streams a generation, aborts on the first inappropriate phrase and retries with a correction"""
+
+    def __init__(self, phrases: List[str] = None, max_attempts: int = 2,
+                 fallback_response: str = FALLBACK_RESPONSE):
+        self.phrases = phrases or get_inappropriate_responses()
+        self.max_attempts = max_attempts
+        self.fallback_response = fallback_response
+        self.lock = threading.Lock()
+        self.counters = {'generations': 0, 'streams': 0, 'aborts': 0, 'fallbacks': 0,
+                         'tokens_streamed': 0, 'tokens_completed': 0, 'completed_streams': 0,
+                         'estimated_tokens_saved': 0}
+        self.phrase_counts = {}
+
+    def _stream(self, model, prompt: str, generation_config: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+        """Consume one streamed generation; returns (text so far, blocked phrase or None)"""
+        matcher = StreamingPhraseMatcher(self.phrases)
+        stream = model.generate_content(prompt, generation_config=generation_config, stream=True)
+        parts = []
+        try:
+            for chunk in stream:
+                text = chunk.text
+                parts.append(text)
+                phrase = matcher.feed(text)
+                if phrase:
+                    return "".join(parts), phrase
+        finally:
+            # Stop the provider from producing the rest of a rejected reply
+            close = getattr(stream, 'close', None)
+            if close:
+                close()
+        return "".join(parts), None
+
+    def _average_completed_tokens(self) -> float:
+        completed = self.counters['completed_streams']
+        return self.counters['tokens_completed'] / completed if completed else 0.0
+
+    def generate(self, model, build_prompt: Callable[[Optional[str]], str],
+                 generation_config: Dict[str, Any], deadline=None) -> Tuple[str, Dict[str, Any]]:
+        """Returns (reply, report); build_prompt receives a corrective instruction on retries"""
+        blocked = []
+        correction = None
+
+        for attempt in range(1, self.max_attempts + 1):
+            if attempt > 1 and deadline is not None and deadline.expired():
+                # No budget left for a corrective retry; the fallback reply is safe and immediate
+                deadline.degrade('generation', 'skipped_guardrail_retry')
+                break
+            text, phrase = self._stream(model, build_prompt(correction), generation_config)
+            tokens = estimate_tokens(text)
+
+            with self.lock:
+                self.counters['streams'] += 1
+                self.counters['tokens_streamed'] += tokens
+                if phrase is None:
+                    self.counters['generations'] += 1
+                    self.counters['completed_streams'] += 1
+                    self.counters['tokens_completed'] += tokens
+                else:
+                    self.counters['aborts'] += 1
+                    # Savings versus a post-hoc check, which would have let the reply finish
+                    self.counters['estimated_tokens_saved'] += max(int(self._average_completed_tokens()) - tokens, 0)
+                    self.phrase_counts[phrase] = self.phrase_counts.get(phrase, 0) + 1
+
+            if phrase is None:
+                return text, {'attempts': attempt, 'blocked_phrases': blocked, 'fallback': False}
+
+            logger.warning("Guardrail aborted generation on attempt %d after %d tokens: %s", attempt, tokens, phrase)
+            blocked.append(phrase)
+            correction = CORRECTIVE_INSTRUCTION.format(phrases="، ".join(blocked))
+
+        with self.lock:
+            self.counters['generations'] += 1
+            self.counters['fallbacks'] += 1
+        return self.fallback_response, {'attempts': len(blocked), 'blocked_phrases': blocked, 'fallback': True}
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            generations = self.counters['generations']
+            streams = self.counters['streams']
+            return dict(
+                self.counters,
+                abort_rate=self.counters['aborts'] / streams if streams else 0.0,
+                fallback_rate=self.counters['fallbacks'] / generations if generations else 0.0,
+                blocked_phrases=dict(sorted(self.phrase_counts.items(), key=lambda item: -item[1]))
+            )
@@ -0,0 +1,165 @@
+"""
+Test Case and Lexicon Registry for OMANI-Therapist-Voice
+Loads the data/*.json files once per process into immutable, indexed structures
+"""
+
+import json
+import os
+import pickle
+import threading
+from types import MappingProxyType
+from typing import Dict, List, Any, Tuple
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+ARTIFACT_NAME = 'registry.pickle'
+ARTIFACT_VERSION = 2
+
+SOURCE_FILES = {
+    'test_cases': 'test_cases_omani.json',
+    'crisis_test_cases': 'crisis_test_cases.json',
+    'expressions': 'omani_expressions.json',
+    'inappropriate_responses': 'inappropriate_responses.json',
+}
+
+# (index name, source, field) - each index maps a field value to positions in the source list
+INDEXES = (
+    ('by_response_type', 'test_cases', 'expected_response_type'),
+    ('by_cultural_context', 'test_cases', 'cultural_context'),
+    ('crisis_cases_by_severity', 'crisis_test_cases', 'severity'),
+)
+
+def freeze(value):
+    """Recursively convert dicts to read-only mappings and lists to tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def thaw(value):
+    """Plain dict/list copy of a frozen value, e.g. for JSON serialization or mutation"""
+    if isinstance(value, MappingProxyType):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+def _source_stamp(data_dir: str) -> List[Tuple[str, int, int]]:
+    stamp = []
+    for name in sorted(SOURCE_FILES.values()):
+        info = os.stat(os.path.join(data_dir, name))
+        stamp.append((name, info.st_mtime_ns, info.st_size))
+    return stamp
+
+def compile_sources(data_dir: str = DATA_DIR) -> Dict[str, Any]:
+    """Parse the JSON sources and precompute index positions"""
+    data = {}
+    for key, name in SOURCE_FILES.items():
+        with open(os.path.join(data_dir, name), encoding='utf-8') as f:
+            data[key] = json.load(f)
+
+    indexes = {}
+    for index_name, source, field in INDEXES:
+        positions = {}
+        for position, record in enumerate(data[source]):
+            positions.setdefault(record[field], []).append(position)
+        indexes[index_name] = positions
+
+    return {
+        'version': ARTIFACT_VERSION,
+        'stamp': _source_stamp(data_dir),
+        'data': data,
+        'indexes': indexes
+    }
+
+def build_artifact(data_dir: str = DATA_DIR) -> str:
+    """Write the precompiled artifact next to the sources"""
+    compiled = compile_sources(data_dir)
+    path = os.path.join(data_dir, ARTIFACT_NAME)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+    return path
+
+def _load_compiled(data_dir: str) -> Dict[str, Any]:
+    """Use the artifact when it matches the sources, otherwise recompile and refresh it"""
+    path = os.path.join(data_dir, ARTIFACT_NAME)
+    if os.path.exists(path):
+        try:
+            with open(path, 'rb') as f:
+                compiled = pickle.load(f)
+            if compiled.get('version') == ARTIFACT_VERSION and compiled['stamp'] == _source_stamp(data_dir):
+                return compiled
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError):
+            pass
+
+    compiled = compile_sources(data_dir)
+    try:
+        build_artifact(data_dir)
+    except OSError:
+        pass  # Read-only deployments simply parse the JSON each start
+    return compiled
+
+class OmaniDataRegistry:
+    """Read-only view over the compiled test cases, expressions and lexicons"""
+
+    def __init__(self, compiled: Dict[str, Any]):
+        data = compiled['data']
+        self.test_cases = freeze(data['test_cases'])
+        self.crisis_test_cases = freeze(data['crisis_test_cases'])
+        self.expressions = freeze(data['expressions'])
+        self.inappropriate_categories = freeze(data['inappropriate_responses'])
+        self.inappropriate_responses = tuple(p for group in self.inappropriate_categories.values() for p in group)
+
+        for index_name, source, _ in INDEXES:
+            records = getattr(self, source)
+            positions = compiled['indexes'][index_name]
+            setattr(self, index_name, MappingProxyType({
+                value: tuple(records[position] for position in found) for value, found in positions.items()
+            }))
+
+    def __setattr__(self, name: str, value: Any):
+        if name in self.__dict__:
+            raise AttributeError(f"OmaniDataRegistry is immutable: cannot reassign '{name}'")
+        super().__setattr__(name, value)
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry() -> OmaniDataRegistry:
+    """Process-wide registry, loaded on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = OmaniDataRegistry(_load_compiled(DATA_DIR))
+    return _registry
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Build or inspect the data registry artifact")
+    parser.add_argument('--build', action='store_true', help="Rebuild data/registry.pickle from the JSON sources")
+    args = parser.parse_args()
+
+    if args.build:
+        print(f"Artifact written to: {build_artifact()}")
+
+    start = time.perf_counter()
+    compiled = compile_sources()
+    parse_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    registry = get_registry()
+    load_time = time.perf_counter() - start
+
+    print(f"JSON parse: {parse_time * 1000:.2f}ms, registry load: {load_time * 1000:.2f}ms")
+    print(f"Test cases: {len(registry.test_cases)}, crisis test cases: {len(registry.crisis_test_cases)}")
+    print(f"Inappropriate phrases: {len(registry.inappropriate_responses)}")
+    for response_type, cases in registry.by_response_type.items():
+        print(f"   {response_type}: {len(cases)}")
+    for severity, cases in registry.crisis_cases_by_severity.items():
+        print(f"   severity {severity}: {len(cases)}")
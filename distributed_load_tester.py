@@ -0,0 +1,249 @@
+"""
+Distributed Load Generation for OMANI-Therapist-Voice Project
+Shards virtual users across worker processes (or hosts) and merges their results
+"""
+
+import asyncio
+import ipaddress
+import math
+import os
+import time
+import json
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.connection import Listener, Client
+from typing import Dict, List, Any, Tuple
+from fault_injection import FAULT_SCENARIOS, FaultInjector, RetryPolicy
+from load_tester import LoadTester
+from result_store import TurnResultStore, TurnResultSink
+
+# Connections unpickle whatever the peer sends, so off-host use needs a real shared secret
+AUTHKEY_ENV = 'LOAD_TEST_AUTHKEY'
+LOOPBACK_AUTHKEY = b'omani-load-test-loopback'
+
+def is_loopback(host: str) -> bool:
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def resolve_authkey(host: str) -> bytes:
+    """Key from LOAD_TEST_AUTHKEY; the built-in key is only allowed on loopback addresses"""
+    key = os.environ.get(AUTHKEY_ENV)
+    if key:
+        return key.encode()
+    if is_loopback(host):
+        return LOOPBACK_AUTHKEY
+    raise ValueError(f"Set {AUTHKEY_ENV} to a shared secret before using non-loopback address {host}")
+
+def shard_users(num_users: int, num_shards: int) -> List[List[int]]:
+    """Split user ids round-robin so every shard gets a slice of the whole ramp"""
+    return [list(range(shard, num_users, num_shards)) for shard in range(num_shards)]
+
+def ramp_offset(user_id: int, num_users: int, ramp_seconds: float) -> float:
+    """Start offset of a user on the global linear ramp"""
+    return ramp_seconds * user_id / num_users if num_users else 0.0
+
+def run_shard(shard: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker entry point: run one shard of users and return its aggregates"""
+    return asyncio.run(_run_shard(shard))
+
+async def _run_shard(shard: Dict[str, Any]) -> Dict[str, Any]:
+    # Offsets are relative and timed on the worker's own monotonic clock, so hosts never compare clocks
+    start_at = time.monotonic() + shard['start_delay']
+    faults = shard.get('faults', 'none')
+    tester = LoadTester(
+        sink_path=shard.get('sink_path'),
+        generation_capacity=shard.get('generation_capacity'),
+        fault_injector=FaultInjector.from_name(faults) if faults != 'none' else None,
+        retry_policy=RetryPolicy(max_attempts=shard.get('max_attempts', 3))
+    )
+    tester.generation_slots = asyncio.Semaphore(tester.generation_capacity) if tester.generation_capacity else None
+    cpu_start = time.process_time()
+
+    async def delayed_session(user_id: int):
+        await asyncio.sleep(max(0.0, start_at + shard['offsets'][user_id] - time.monotonic()))
+        return await tester.simulate_user_session(user_id, shard['session_length'])
+
+    if tester.sink_path:
+        tester.sink = TurnResultSink(tester.sink_path)
+    try:
+        await asyncio.gather(*(delayed_session(user_id) for user_id in shard['user_ids']))
+    finally:
+        if tester.sink:
+            tester.sink.close()
+
+    return {
+        'worker': shard['worker'],
+        'store': tester.results,
+        'sessions': tester.session_data,
+        'users': len(shard['user_ids']),
+        'fault_counts': tester.fault_counts,
+        'cpu_time': time.process_time() - cpu_start,
+        # From the shared start to this worker's last turn
+        'elapsed': time.monotonic() - start_at
+    }
+
+class DistributedLoadTester(LoadTester):
+    """Coordinator that spreads virtual users over local processes and remote workers"""
+
+    def __init__(self, workers: int = None, remote_workers: int = 0,
+                 listen_address: Tuple[str, int] = ('127.0.0.1', 6100), sink_path: str = None,
+                 faults: str = 'none', max_attempts: int = 3, generation_capacity: int = None):
+        super().__init__(generation_capacity=generation_capacity)
+        # Shards are pickled to workers, so faults travel by scenario name and each worker builds its own injector
+        self.faults = faults
+        self.max_attempts = max_attempts
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.remote_workers = remote_workers
+        self.listen_address = listen_address
+        self.worker_sink_path = sink_path
+        self.worker_stats = []
+
+    def _build_shards(self, num_users: int, session_length: int, ramp_seconds: float,
+                      start_delay: float) -> List[Dict[str, Any]]:
+        total_workers = self.workers + self.remote_workers
+        # Workers cannot share a semaphore, so the backend's generation slots are split evenly between them
+        shard_capacity = (max(1, math.ceil(self.generation_capacity / total_workers))
+                          if self.generation_capacity else None)
+        shards = []
+        for index, user_ids in enumerate(shard_users(num_users, total_workers)):
+            shards.append({
+                'worker': index,
+                'user_ids': user_ids,
+                'offsets': {user_id: ramp_offset(user_id, num_users, ramp_seconds) for user_id in user_ids},
+                'session_length': session_length,
+                'start_delay': start_delay,
+                'faults': self.faults,
+                'max_attempts': self.max_attempts,
+                'generation_capacity': shard_capacity,
+                'sink_path': f"{self.worker_sink_path}.w{index}.jsonl" if self.worker_sink_path else None
+            })
+        return shards
+
+    def _dispatch_remote(self, connections: List[Any], shards: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        for connection, shard in zip(connections, shards):
+            connection.send(shard)
+        results = []
+        for connection in connections:
+            results.append(connection.recv())
+            connection.close()
+        return results
+
+    async def run_distributed_load_test(self, num_users: int = 100, session_length: int = 5,
+                                        ramp_seconds: float = 0.0, start_delay: float = 1.0) -> Dict[str, Any]:
+        """Run a load test with users sharded across workers and merge the results"""
+        print(f"Starting distributed load test with {num_users} users "
+              f"on {self.workers} local + {self.remote_workers} remote workers")
+        print("=" * 50)
+
+        shards = self._build_shards(num_users, session_length, ramp_seconds, start_delay)
+        local_shards = shards[:self.workers]
+        remote_shards = shards[self.workers:]
+
+        loop = asyncio.get_running_loop()
+        shard_results = []
+
+        listener = (Listener(self.listen_address, authkey=resolve_authkey(self.listen_address[0]))
+                    if remote_shards else None)
+        try:
+            connections = []
+            if listener:
+                # Wait for every remote worker before starting anyone, so the ramp is shared
+                print(f"Waiting for {len(remote_shards)} remote workers on {self.listen_address[0]}:{self.listen_address[1]}")
+                connections = await loop.run_in_executor(
+                    None, lambda: [listener.accept() for _ in remote_shards]
+                )
+
+            with ProcessPoolExecutor(max_workers=max(1, len(local_shards))) as pool:
+                futures = [loop.run_in_executor(pool, run_shard, shard) for shard in local_shards]
+                if connections:
+                    futures.append(loop.run_in_executor(None, self._dispatch_remote, connections, remote_shards))
+                for result in await asyncio.gather(*futures):
+                    shard_results.extend(result if isinstance(result, list) else [result])
+        finally:
+            if listener:
+                listener.close()
+
+        # Merge histograms, counters and session summaries into a single report
+        self.results = TurnResultStore(keep_rows=False)
+        self.session_data = []
+        self.worker_stats = []
+        self.fault_counts = {}
+        for result in sorted(shard_results, key=lambda r: r['worker']):
+            self.results.extend(result['store'])
+            self.session_data.extend(result['sessions'])
+            for key, count in result['fault_counts'].items():
+                self.fault_counts[key] = self.fault_counts.get(key, 0) + count
+            self.worker_stats.append({
+                'worker': result['worker'],
+                'users': result['users'],
+                'turns': len(result['store']),
+                'cpu_time': result['cpu_time']
+            })
+
+        # Each worker timed itself from the shared start; the slowest one bounds the run
+        total_test_time = max(r['elapsed'] for r in shard_results)
+        report = self.analyze_load_test_results(num_users, max(total_test_time, 1e-9))
+        report['worker_analysis'] = self.worker_stats
+        report['test_summary']['ramp_seconds'] = ramp_seconds
+        return report
+
+def run_remote_worker(address: Tuple[str, int]):
+    """Connect to a coordinator, run the shard it sends and return the result"""
+    with Client(address, authkey=resolve_authkey(address[0])) as connection:
+        shard = connection.recv()
+        print(f"Worker {shard['worker']}: running {len(shard['user_ids'])} users")
+        connection.send(run_shard(shard))
+
+def _parse_address(value: str) -> Tuple[str, int]:
+    host, port = value.rsplit(':', 1)
+    return host, int(port)
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Distributed load test for OMANI-Therapist-Voice")
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--session-length', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--ramp', type=float, default=0.0, help="Seconds over which users are started")
+    parser.add_argument('--remote-workers', type=int, default=0)
+    parser.add_argument('--listen', default='127.0.0.1:6100', help="Coordinator address for remote workers")
+    parser.add_argument('--connect', metavar='HOST:PORT', help="Run as a remote worker for this coordinator")
+    parser.add_argument('--sink', help="Per-worker JSONL sink prefix")
+    parser.add_argument('--faults', choices=sorted(FAULT_SCENARIOS), default='none',
+                        help="Provider fault scenario injected into every stage call")
+    parser.add_argument('--max-attempts', type=int, default=3, help="Client attempts per stage call (1 = no retries)")
+    parser.add_argument('--capacity', type=int, default=0,
+                        help="Concurrent generation slots in the simulated backend, split across workers (0 = unlimited)")
+    args = parser.parse_args()
+
+    if args.connect:
+        run_remote_worker(_parse_address(args.connect))
+        raise SystemExit(0)
+
+    coordinator = DistributedLoadTester(
+        workers=args.workers,
+        remote_workers=args.remote_workers,
+        listen_address=_parse_address(args.listen),
+        sink_path=args.sink,
+        faults=args.faults,
+        max_attempts=args.max_attempts,
+        generation_capacity=args.capacity or None
+    )
+    results = asyncio.run(coordinator.run_distributed_load_test(
+        num_users=args.users, session_length=args.session_length, ramp_seconds=args.ramp
+    ))
+
+    print(coordinator.generate_load_test_report(results))
+    print("\n## Worker Analysis")
+    for stats in results['worker_analysis']:
+        print(f"- Worker {stats['worker']}: {stats['users']} users, {stats['turns']} turns, "
+              f"{stats['cpu_time']:.2f}s CPU")
+
+    with open('distributed_load_test_results.json', 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print("\nResults saved to: distributed_load_test_results.json")
@@ -0,0 +1,311 @@
+"""
+Offline Evaluation Pipeline for OMANI-Therapist-Voice
+Generates replies for a large corpus under bounded concurrency and validates them incrementally
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Any, Iterator
+
+from corpus_generator import iter_corpus
+from crisis_detector import OmaniCrisisDetector
+from cultural_guardrail import CulturalGuardrail
+from cultural_validator import OmaniCulturalValidator
+from result_store import LatencyHistogram
+from test_cases_omani import get_omani_test_cases, get_omani_expressions, get_inappropriate_responses
+import therapist_core
+
+class StandInResponse:
+    """Mimics the .text attribute of a Gemini response"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+class LocalStandInModel:
+    """Deterministic local replacement for the Gemini model"""
+
+    def __init__(self, latency: float = 0.05, inappropriate_rate: float = 0.02):
+        self.latency = latency
+        self.inappropriate_rate = inappropriate_rate
+        expressions = get_omani_expressions()
+        self.openers = expressions['greetings'] + expressions['empathetic_responses']
+        self.supportive = expressions['supportive_expressions'] + expressions['encouragement']
+        self.inappropriate = get_inappropriate_responses()
+
+    def generate_content(self, prompt: str, generation_config: Dict[str, Any] = None, stream: bool = False):
+        # The reply depends only on the prompt, so reruns and resumed runs are reproducible
+        digest = int.from_bytes(hashlib.blake2b(prompt.encode('utf-8'), digest_size=8).digest(), 'big')
+        text = self._reply(digest)
+        if stream:
+            return self._stream(text)
+        time.sleep(self.latency)
+        return StandInResponse(text)
+
+    def _stream(self, text: str, chunk_chars: int = 12) -> Iterator[StandInResponse]:
+        chunks = [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+        for chunk in chunks:
+            time.sleep(self.latency / len(chunks))
+            yield StandInResponse(chunk)
+
+    def _reply(self, digest: int) -> str:
+        parts = [
+            self.openers[digest % len(self.openers)],
+            self.supportive[(digest >> 8) % len(self.supportive)],
+            "شنو أكثر شي يضايقك هالأيام؟"
+        ]
+        if (digest >> 16) % 10000 < self.inappropriate_rate * 10000:
+            parts.insert(1, self.inappropriate[(digest >> 32) % len(self.inappropriate)])
+        return "، ".join(parts)
+
+class EvaluationAggregate:
+    """Running totals for reply quality and crisis routing"""
+
+    def __init__(self):
+        self.count = 0
+        self.score_totals = {'overall_score': 0.0, 'omani_authenticity': 0.0, 'religious_sensitivity': 0.0}
+        self.inappropriate_replies = 0
+        self.inappropriate_phrases = {}
+        self.response_types = {}
+        self.crisis_confusion = {'routed': [0, 0, 0, 0], 'detector': [0, 0, 0, 0]}  # tp, tn, fp, fn
+        self.latency = LatencyHistogram()
+
+    @staticmethod
+    def _confusion_index(predicted: bool, expected: bool) -> int:
+        if predicted and expected:
+            return 0
+        if not predicted and not expected:
+            return 1
+        return 2 if predicted else 3
+
+    def add(self, record: Dict[str, Any]):
+        self.count += 1
+        self.response_types[record['response_type']] = self.response_types.get(record['response_type'], 0) + 1
+        self.latency.add(record['latency'])
+
+        validation = record.get('validation')
+        if validation:
+            for key in self.score_totals:
+                self.score_totals[key] += validation[key]
+            if not validation['cultural_appropriateness']:
+                self.inappropriate_replies += 1
+            for phrase in validation['inappropriate_content']:
+                self.inappropriate_phrases[phrase] = self.inappropriate_phrases.get(phrase, 0) + 1
+
+        if record.get('expected') is not None:
+            expected = bool(record['expected'])
+            self.crisis_confusion['routed'][self._confusion_index(record['response_type'] == 'crisis', expected)] += 1
+            self.crisis_confusion['detector'][self._confusion_index(record['detector_crisis'], expected)] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        validated = self.count - self.response_types.get('crisis', 0) - self.response_types.get('error', 0)
+        crisis_metrics = {}
+        for name, (tp, tn, fp, fn) in self.crisis_confusion.items():
+            crisis_metrics[name] = {
+                'true_positives': tp, 'true_negatives': tn, 'false_positives': fp, 'false_negatives': fn,
+                'precision': tp / (tp + fp) if tp + fp else 0,
+                'recall': tp / (tp + fn) if tp + fn else 0
+            }
+        return {
+            'evaluated_turns': self.count,
+            'validated_replies': validated,
+            'average_scores': {
+                key: total / validated if validated else 0 for key, total in self.score_totals.items()
+            },
+            'inappropriate_reply_rate': self.inappropriate_replies / validated if validated else 0,
+            'inappropriate_phrases': dict(sorted(self.inappropriate_phrases.items(), key=lambda item: -item[1])),
+            'response_types': self.response_types,
+            'crisis_routing': crisis_metrics,
+            'generation_latency': self.latency.summary()
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        state = dict(self.__dict__)
+        state['latency'] = self.latency.to_dict()
+        return state
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'EvaluationAggregate':
+        aggregate = cls()
+        aggregate.__dict__.update(data)
+        aggregate.latency = LatencyHistogram.from_dict(data['latency'])
+        return aggregate
+
+class EvaluationRunner:
+    """Pushes corpus turns through get_gemini_response and validates every reply"""
+
+    def __init__(self, model=None, concurrency: int = 16, checkpoint_path: str = None,
+                 checkpoint_every: int = 500, guardrail=None):
+        self.model = model or LocalStandInModel()
+        self.guardrail = guardrail
+        self.concurrency = concurrency
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.validator = OmaniCulturalValidator()
+        self.detector = OmaniCrisisDetector()
+        self.aggregate = EvaluationAggregate()
+        # Cases below the watermark are all done; done_ids holds completions above it
+        self.watermark = 0
+        self.done_ids = set()
+
+    def load_checkpoint(self) -> bool:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return False
+        with open(self.checkpoint_path, encoding='utf-8') as f:
+            state = json.load(f)
+        self.aggregate = EvaluationAggregate.from_dict(state['aggregate'])
+        self.watermark = state['watermark']
+        self.done_ids = set(state['done_ids'])
+        return True
+
+    def save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        state = {
+            'aggregate': self.aggregate.to_dict(),
+            'watermark': self.watermark,
+            'done_ids': sorted(self.done_ids),
+            'saved_at': datetime.now().isoformat()
+        }
+        temp_path = self.checkpoint_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def _mark_done(self, case_id: int):
+        self.done_ids.add(case_id)
+        while self.watermark in self.done_ids:
+            self.done_ids.remove(self.watermark)
+            self.watermark += 1
+
+    def evaluate_turn(self, case: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate and validate a single turn (runs on a worker thread)"""
+        text = case.get('text') or case.get('input_text')
+        start = time.perf_counter()
+        reply, response_type = therapist_core.get_gemini_response(
+            text, case.get('history', []), self.model, self.guardrail
+        )
+        latency = time.perf_counter() - start
+
+        return {
+            'id': case['id'],
+            'response_type': response_type,
+            'latency': latency,
+            'expected': case.get('expected'),
+            'detector_crisis': self.detector.detect_crisis(text)['is_crisis'],
+            # Crisis and error replies are fixed templates, not model output
+            'validation': self.validator.validate_response(reply, case.get('cultural_context', 'General'))
+                          if response_type == 'normal' else None
+        }
+
+    async def run(self, cases: Iterator[Dict[str, Any]]) -> Dict[str, Any]:
+        """Evaluate cases with at most `concurrency` turns in flight"""
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending = set()
+        since_checkpoint = 0
+        start = time.time()
+
+        def on_done(task: asyncio.Task):
+            nonlocal since_checkpoint
+            semaphore.release()
+            pending.discard(task)
+            record = task.result()
+            self.aggregate.add(record)
+            self._mark_done(record['id'])
+            since_checkpoint += 1
+            if since_checkpoint >= self.checkpoint_every:
+                since_checkpoint = 0
+                self.save_checkpoint()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for case in cases:
+                if case['id'] < self.watermark or case['id'] in self.done_ids:
+                    continue
+                await semaphore.acquire()
+                task = asyncio.ensure_future(loop.run_in_executor(pool, self.evaluate_turn, case))
+                task.add_done_callback(on_done)
+                pending.add(task)
+            if pending:
+                await asyncio.gather(*pending)
+
+        self.save_checkpoint()
+        summary = self.aggregate.summary()
+        summary['run_duration'] = time.time() - start
+        if self.guardrail is not None:
+            # Counts cover this process only; a resumed run reports the resumed portion
+            summary['guardrail'] = self.guardrail.stats()
+        return summary
+
+def iter_cases(corpus_path: str = None, limit: int = None) -> Iterator[Dict[str, Any]]:
+    """Corpus cases with stable ids; falls back to the hand-written test cases"""
+    if corpus_path:
+        source = iter_corpus(corpus_path)
+    else:
+        source = (
+            {'text': case['input_text'], 'history': case['history'],
+             'expected': case['expected_response_type'] == 'crisis'}
+            for case in get_omani_test_cases()
+        )
+    for index, case in enumerate(source):
+        if limit is not None and index >= limit:
+            break
+        case = dict(case)
+        case['id'] = index
+        yield case
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Offline generation + cultural validation at scale")
+    parser.add_argument('--corpus', help="Corpus file from corpus_generator.py (default: built-in test cases)")
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.05, help="Stand-in model latency in seconds")
+    parser.add_argument('--checkpoint', default='evaluation_checkpoint.json')
+    parser.add_argument('--checkpoint-every', type=int, default=500)
+    parser.add_argument('--fresh', action='store_true', help="Ignore an existing checkpoint")
+    parser.add_argument('--guardrail', action='store_true', help="Stream replies through the cultural guardrail")
+    parser.add_argument('--output', default='evaluation_results.json')
+    args = parser.parse_args()
+
+    # Per-turn pipeline logging would drown the summary at corpus scale
+    logging.getLogger(therapist_core.__name__).setLevel(logging.ERROR)
+    logging.getLogger('cultural_guardrail').setLevel(logging.ERROR)
+
+    runner = EvaluationRunner(
+        model=LocalStandInModel(latency=args.latency),
+        concurrency=args.concurrency,
+        checkpoint_path=args.checkpoint,
+        checkpoint_every=args.checkpoint_every,
+        guardrail=CulturalGuardrail() if args.guardrail else None
+    )
+    if not args.fresh and runner.load_checkpoint():
+        print(f"Resuming from checkpoint: {runner.aggregate.count} turns already evaluated")
+
+    summary = asyncio.run(runner.run(iter_cases(args.corpus, args.limit)))
+
+    print("Evaluation Summary")
+    print("=" * 50)
+    print(f"Evaluated turns: {summary['evaluated_turns']}")
+    print(f"Average overall score: {summary['average_scores']['overall_score']:.2f}/1.0")
+    print(f"Average Omani authenticity: {summary['average_scores']['omani_authenticity']:.2f}/1.0")
+    print(f"Inappropriate reply rate: {summary['inappropriate_reply_rate']:.1%}")
+    for name, metrics in summary['crisis_routing'].items():
+        print(f"Crisis routing ({name}): precision {metrics['precision']:.1%}, recall {metrics['recall']:.1%}")
+    if 'guardrail' in summary:
+        guardrail = summary['guardrail']
+        print(f"Guardrail abort rate: {guardrail['abort_rate']:.1%} "
+              f"({guardrail['aborts']} aborts, {guardrail['fallbacks']} fallbacks, "
+              f"~{guardrail['estimated_tokens_saved']} tokens saved)")
+    print(f"Run duration: {summary['run_duration']:.1f}s")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"\nResults saved to: {args.output}")
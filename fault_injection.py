@@ -0,0 +1,114 @@
+"""
+Fault Injection for OMANI-Therapist-Voice Load Tests
+Per-stage provider faults (timeouts, 429/5xx, slow tails, partial TTS) and the client retry policy
+"""
+
+import asyncio
+import random
+from typing import Dict, List, Any, Callable
+
+FAULT_KINDS = ('timeout', 'throttled', 'server_error', 'slow', 'partial')
+RETRYABLE = ('timeout', 'throttled', 'server_error')
+
+# Per-stage fault rates; 'timeout' is the client-side call timeout in seconds
+FAULT_SCENARIOS = {
+    'none': {},
+    # Gemini degrades: throttling, 5xx and long tails, while STT and TTS mostly hold up
+    'brownout': {
+        'stt': {'server_error': 0.02},
+        'generation': {'throttled': 0.15, 'server_error': 0.08, 'slow': 0.15, 'timeout_rate': 0.03},
+        'tts': {'server_error': 0.03, 'partial': 0.03},
+    },
+    'gemini_outage': {
+        'generation': {'server_error': 0.6, 'timeout_rate': 0.2},
+    },
+    'slow_tails': {
+        'stt': {'slow': 0.05},
+        'generation': {'slow': 0.1},
+        'tts': {'slow': 0.05},
+    },
+    'flaky_tts': {
+        'tts': {'server_error': 0.1, 'partial': 0.15, 'timeout_rate': 0.05},
+    },
+}
+
+DEFAULT_STAGE_TIMEOUTS = {'stt': 10.0, 'generation': 15.0, 'tts': 10.0}
+
+class FaultInjector:
+    """Draws the outcome of each simulated provider call from per-stage fault rates"""
+
+    def __init__(self, scenario: Dict[str, Dict[str, float]] = None, slow_factor: float = 5.0,
+                 throttle_latency: float = 0.1, rng: random.Random = None):
+        self.scenario = scenario or {}
+        self.slow_factor = slow_factor
+        self.throttle_latency = throttle_latency
+        self.rng = rng or random.Random()
+
+    @classmethod
+    def from_name(cls, name: str, **kwargs) -> 'FaultInjector':
+        return cls(FAULT_SCENARIOS[name], **kwargs)
+
+    def timeout_for(self, stage: str) -> float:
+        return self.scenario.get(stage, {}).get('timeout', DEFAULT_STAGE_TIMEOUTS[stage])
+
+    def attempt(self, stage: str, service_time: float) -> Dict[str, Any]:
+        """One call attempt: how long it takes and whether it succeeded"""
+        rates = self.scenario.get(stage, {})
+        timeout = self.timeout_for(stage)
+        roll = self.rng.random()
+
+        # Rates are cumulative slices of one draw, so they are mutually exclusive per attempt
+        for kind, key in (('timeout', 'timeout_rate'), ('throttled', 'throttled'),
+                          ('server_error', 'server_error'), ('slow', 'slow'), ('partial', 'partial')):
+            rate = rates.get(key, 0.0)
+            if roll < rate:
+                break
+            roll -= rate
+        else:
+            kind = None
+
+        if kind == 'timeout':
+            return {'ok': False, 'error': 'timeout', 'duration': timeout}
+        if kind == 'throttled':
+            return {'ok': False, 'error': 'throttled', 'duration': self.throttle_latency}
+        if kind == 'server_error':
+            return {'ok': False, 'error': 'server_error', 'duration': service_time * 0.3}
+        if kind == 'slow':
+            slowed = service_time * self.slow_factor
+            if slowed > timeout:
+                return {'ok': False, 'error': 'timeout', 'duration': timeout}
+            return {'ok': True, 'error': 'slow', 'duration': slowed}
+        if kind == 'partial' and stage == 'tts':
+            return {'ok': True, 'error': 'partial', 'duration': service_time}
+        return {'ok': True, 'error': None, 'duration': service_time}
+
+class RetryPolicy:
+    """Client retries with capped exponential backoff and full jitter"""
+
+    def __init__(self, max_attempts: int = 3, base_backoff: float = 0.5, max_backoff: float = 4.0,
+                 retry_on: tuple = RETRYABLE, rng: random.Random = None):
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.retry_on = retry_on
+        self.rng = rng or random.Random()
+
+    def backoff(self, attempt: int) -> float:
+        return self.rng.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** (attempt - 1)))
+
+async def call_with_retries(stage: str, service_time: float, injector: FaultInjector, policy: RetryPolicy,
+                            sleep: Callable = asyncio.sleep) -> Dict[str, Any]:
+    """Simulate one stage call including retries; sleeps for every attempt and backoff"""
+    errors: List[str] = []
+    attempts = 0
+    while True:
+        attempts += 1
+        result = injector.attempt(stage, service_time)
+        await sleep(result['duration'])
+        if result['error']:
+            errors.append(result['error'])
+        if result['ok']:
+            return {'ok': True, 'partial': result['error'] == 'partial', 'attempts': attempts, 'errors': errors}
+        if result['error'] not in policy.retry_on or attempts >= policy.max_attempts:
+            return {'ok': False, 'partial': False, 'attempts': attempts, 'errors': errors}
+        await sleep(policy.backoff(attempts))
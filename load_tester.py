@@ -4,21 +4,70 @@ Simulates concurrent users and measures system performance under load
 """
 
 import asyncio
+import math
 import time
 import random
 import statistics
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 import json
+from contextlib import nullcontext
 from datetime import datetime
+from profiling import PipelineProfiler, print_profile_summary
+from result_store import LatencyHistogram, TurnResultStore, TurnResultSink, read_result_file
+from fault_injection import FAULT_SCENARIOS, FaultInjector, RetryPolicy, call_with_retries
+
+# Stage latencies kept per turn for compare_runs.py
+RAW_SAMPLE_COLUMNS = ('stt_time', 'ai_response_time', 'tts_time', 'response_time', 'total_turn_time')
+
+def quantile_bounds(histogram: LatencyHistogram, q: float, z: float = 1.96) -> Tuple[float, float]:
+    """Distribution-free confidence interval for a quantile, from the binomial spread of its rank"""
+    if not histogram.count:
+        return 0.0, 0.0
+    spread = z * math.sqrt(q * (1 - q) / histogram.count)
+    return histogram.quantile(max(q - spread, 0.0)), histogram.quantile(min(q + spread, 1.0))
 
 class LoadTester:
     """Simulate concurrent users for load testing"""
     
-    def __init__(self, max_concurrent_users=10):
+    # Prefix for profile file names
+    scenario_name = 'load'
+    
+    def __init__(self, max_concurrent_users=10, sink_path: str = None, profiler: PipelineProfiler = None,
+                 generation_capacity: int = None, fault_injector: FaultInjector = None,
+                 retry_policy: RetryPolicy = None):
         self.max_concurrent_users = max_concurrent_users
-        self.results = []
+        # Concurrent generation slots shared by all users; None models an unlimited backend
+        self.generation_capacity = generation_capacity
+        self.generation_slots = None
+        # Without an injector every provider call succeeds on the first attempt
+        self.fault_injector = fault_injector
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.fault_counts = {}
+        # Sessions interleave on one event loop, so a run is profiled as a whole rather than per stage
+        self.profiler = profiler
+        # With a sink, turns are streamed to disk and only aggregates stay in memory
+        self.sink_path = sink_path
+        self.sink = None
+        self.results = TurnResultStore(keep_rows=sink_path is None)
         self.session_data = []
     
+    def _record(self, kind: str, record: Dict[str, Any]):
+        """Stream a completed record to the sink, if one is configured"""
+        if self.sink:
+            self.sink.write(kind, record)
+    
+    async def _call_stage(self, stage: str, service_time: float) -> Dict[str, Any]:
+        """One simulated provider call, through fault injection and retries when configured"""
+        if not self.fault_injector:
+            await asyncio.sleep(service_time)
+            return {'ok': True, 'partial': False, 'attempts': 1, 'errors': []}
+        result = await call_with_retries(stage, service_time, self.fault_injector, self.retry_policy,
+                                         sleep=asyncio.sleep)
+        for error in result['errors']:
+            key = f"{stage}.{error}"
+            self.fault_counts[key] = self.fault_counts.get(key, 0) + 1
+        return result
+    
     async def simulate_user_session(self, user_id: int, session_length: int = 5):
         """Simulate a single user session with realistic Omani user behavior"""
         session_start = time.time()
@@ -40,20 +89,36 @@ class LoadTester:
                 thinking_time = random.uniform(2, 8)   # Normal thinking time
             
             await asyncio.sleep(thinking_time)
+            response_start = time.time()
+            
+            # Stage times include retries and backoff; a stage never reached has no latency (None)
+            ai_response_time = tts_time = queue_time = None
+            ai_call = tts_call = {'attempts': 0}
             
             # Simulate STT processing time
-            stt_time = random.uniform(0.5, 2.0)
-            await asyncio.sleep(stt_time)
+            stage_start = time.time()
+            stt_call = await self._call_stage('stt', random.uniform(0.5, 2.0))
+            stt_time = time.time() - stage_start
+            outcome = 'failed'
             
-            # Simulate AI response generation time
-            ai_response_time = random.uniform(1.5, 4.0)
-            await asyncio.sleep(ai_response_time)
+            if stt_call['ok']:
+                # Simulate AI response generation time (queueing for a slot when capacity is limited)
+                queue_start = time.time()
+                async with self.generation_slots or nullcontext():
+                    queue_time = time.time() - queue_start
+                    stage_start = time.time()
+                    ai_call = await self._call_stage('generation', random.uniform(1.5, 4.0))
+                    ai_response_time = time.time() - stage_start
             
-            # Simulate TTS processing time
-            tts_time = random.uniform(0.3, 1.5)
-            await asyncio.sleep(tts_time)
+            if ai_call.get('ok'):
+                # Simulate TTS processing time; without audio the text reply still reaches the user
+                stage_start = time.time()
+                tts_call = await self._call_stage('tts', random.uniform(0.3, 1.5))
+                tts_time = time.time() - stage_start
+                outcome = 'ok' if tts_call['ok'] and not tts_call['partial'] else 'degraded'
             
-            total_turn_time = time.time() - turn_start
+            turn_end = time.time()
+            total_turn_time = turn_end - turn_start
             
             turn_result = {
                 'user_id': user_id,
@@ -63,12 +128,19 @@ class LoadTester:
                 'stt_time': stt_time,
                 'ai_response_time': ai_response_time,
                 'tts_time': tts_time,
+                'queue_time': queue_time,
                 'total_turn_time': total_turn_time,
+                'response_time': turn_end - response_start,
+                'stt_attempts': stt_call['attempts'],
+                'ai_attempts': ai_call['attempts'],
+                'tts_attempts': tts_call['attempts'],
+                'outcome': outcome,
                 'timestamp': time.time()
             }
             
             user_results.append(turn_result)
             self.results.append(turn_result)
+            self._record('turn', turn_result)
         
         session_duration = time.time() - session_start
         
@@ -83,6 +155,7 @@ class LoadTester:
         }
         
         self.session_data.append(session_summary)
+        self._record('session', session_summary)
         return session_duration
     
     async def run_load_test(self, num_users: int = 5, session_length: int = 5):
@@ -91,24 +164,46 @@ class LoadTester:
         print("=" * 50)
         
         # Clear previous results
-        self.results = []
+        self.results = TurnResultStore(keep_rows=self.sink_path is None)
         self.session_data = []
+        self.fault_counts = {}
+        self.generation_slots = asyncio.Semaphore(self.generation_capacity) if self.generation_capacity else None
         
-        # Create concurrent user sessions
-        tasks = []
-        for user_id in range(num_users):
-            task = asyncio.create_task(
-                self.simulate_user_session(user_id, session_length)
-            )
-            tasks.append(task)
-        
-        # Run all sessions concurrently
         start_time = time.time()
-        session_durations = await asyncio.gather(*tasks)
-        total_test_time = time.time() - start_time
+        if self.sink_path:
+            self.sink = TurnResultSink(self.sink_path)
+            self._record('run_start', {
+                'concurrent_users': num_users,
+                'session_length': session_length,
+                'started_at': start_time
+            })
+        
+        try:
+            # Create concurrent user sessions
+            tasks = []
+            for user_id in range(num_users):
+                task = asyncio.create_task(
+                    self.simulate_user_session(user_id, session_length)
+                )
+                tasks.append(task)
+            
+            # Run all sessions concurrently
+            scenario = (self.profiler.scenario(f"{self.scenario_name}_{num_users}_users", per_stage=False)
+                        if self.profiler else nullcontext())
+            with scenario:
+                session_durations = await asyncio.gather(*tasks)
+            total_test_time = time.time() - start_time
+            self._record('run_end', {'total_test_time': total_test_time})
+        finally:
+            if self.sink:
+                self.sink.close()
+                self.sink = None
         
         # Analyze results
-        return self.analyze_load_test_results(num_users, total_test_time)
+        results = self.analyze_load_test_results(num_users, total_test_time)
+        if self.profiler:
+            results['profile'] = self.profiler.report()
+        return results
     
     def analyze_load_test_results(self, num_users: int, total_test_time: float) -> Dict[str, Any]:
         """Analyze load test results and generate comprehensive report"""
@@ -116,38 +211,20 @@ class LoadTester:
         if not self.results:
             return {"error": "No results to analyze"}
         
-        # Basic statistics
-        all_turn_times = [r['total_turn_time'] for r in self.results]
-        all_ai_times = [r['ai_response_time'] for r in self.results]
-        all_stt_times = [r['stt_time'] for r in self.results]
-        all_tts_times = [r['tts_time'] for r in self.results]
+        # Aggregates are maintained incrementally by the columnar store
+        turn_stats = self.results.histogram('total_turn_time')
         
         # Session statistics
         session_durations = [s['session_duration'] for s in self.session_data]
         
         # Performance metrics
         performance_metrics = {
-            'total_turn_time': {
-                'mean': statistics.mean(all_turn_times),
-                'median': statistics.median(all_turn_times),
-                'min': min(all_turn_times),
-                'max': max(all_turn_times),
-                'std_dev': statistics.stdev(all_turn_times) if len(all_turn_times) > 1 else 0
-            },
-            'ai_response_time': {
-                'mean': statistics.mean(all_ai_times),
-                'median': statistics.median(all_ai_times),
-                'min': min(all_ai_times),
-                'max': max(all_ai_times)
-            },
-            'stt_processing_time': {
-                'mean': statistics.mean(all_stt_times),
-                'median': statistics.median(all_stt_times)
-            },
-            'tts_processing_time': {
-                'mean': statistics.mean(all_tts_times),
-                'median': statistics.median(all_tts_times)
-            }
+            'total_turn_time': turn_stats.summary(),
+            'response_time': self.results.histogram('response_time').summary(),
+            'ai_response_time': self.results.histogram('ai_response_time').summary(),
+            'stt_processing_time': self.results.histogram('stt_time').summary(),
+            'tts_processing_time': self.results.histogram('tts_time').summary(),
+            'generation_queue_time': self.results.histogram('queue_time').summary()
         }
         
         # Concurrency analysis
@@ -156,20 +233,21 @@ class LoadTester:
             'total_test_duration': total_test_time,
             'total_interactions': len(self.results),
             'interactions_per_second': len(self.results) / total_test_time,
-            'average_session_duration': statistics.mean(session_durations),
-            'system_utilization': (sum(all_turn_times) / total_test_time) * 100
+            'average_session_duration': statistics.mean(session_durations) if session_durations else 0,
+            'system_utilization': (turn_stats.total / total_test_time) * 100
         }
         
         # User type analysis
         user_type_stats = {}
-        for user_type in set(r['user_type'] for r in self.results):
-            type_results = [r for r in self.results if r['user_type'] == user_type]
+        for user_type, group in self.results.group_means().items():
             user_type_stats[user_type] = {
-                'count': len(type_results),
-                'avg_turn_time': statistics.mean([r['total_turn_time'] for r in type_results]),
-                'avg_thinking_time': statistics.mean([r['thinking_time'] for r in type_results])
+                'count': group['count'],
+                'avg_turn_time': group['total_turn_time'],
+                'avg_thinking_time': group['thinking_time']
             }
         
+        reliability = dict(self.results.reliability(), faults=dict(sorted(self.fault_counts.items())))
+        
         # Performance thresholds
         performance_issues = []
         if performance_metrics['total_turn_time']['mean'] > 20:
@@ -181,36 +259,71 @@ class LoadTester:
         if concurrency_analysis['system_utilization'] > 80:
             performance_issues.append("System utilization is very high")
         
+        if reliability['error_rate'] > 1:
+            performance_issues.append(f"{reliability['error_rate']:.1f}% of turns failed without a reply")
+        
         # Recommendations
         recommendations = []
-        if performance_metrics['ai_response_time']['mean'] > 5:
+        # A stage summary is empty when no turn reached the stage (e.g. a full Gemini outage)
+        if performance_metrics['ai_response_time'].get('mean', 0) > 5:
             recommendations.append("Improve AI response generation speed")
         
-        if performance_metrics['stt_processing_time']['mean'] > 3:
+        if performance_metrics['stt_processing_time'].get('mean', 0) > 3:
             recommendations.append("Improve speech-to-text processing")
         
         if concurrency_analysis['interactions_per_second'] < 1:
             recommendations.append("Improve system concurrency handling")
         
+        if reliability['retry_amplification'] > 1.5:
+            recommendations.append("Retries multiply provider load; add a retry budget or circuit breaker")
+        
+        # Raw per-turn latencies when every row is in memory (a sink file holds them otherwise)
+        raw_samples = {}
+        if self.results.stored_rows == len(self.results):
+            raw_samples = {name: self.results.samples(name) for name in RAW_SAMPLE_COLUMNS}
+        
         return {
             'test_summary': {
                 'concurrent_users': num_users,
                 'total_interactions': len(self.results),
                 'test_duration': total_test_time,
-                'success_rate': 100.0,  # Assuming all interactions succeeded
+                'success_rate': reliability['success_rate'],
                 'timestamp': datetime.now().isoformat()
             },
             'performance_metrics': performance_metrics,
             'concurrency_analysis': concurrency_analysis,
+            'reliability': reliability,
             'user_type_analysis': user_type_stats,
             'performance_issues': performance_issues,
             'recommendations': recommendations,
-            'detailed_results': self.results[:10]  # First 10 results for reference
+            'detailed_results': self.results.head(10),  # First 10 results for reference
+            'raw_samples': raw_samples
         }
     
+    def analyze_result_file(self, path: str) -> List[Dict[str, Any]]:
+        """Re-aggregate every run recorded in a sink file"""
+        reports = []
+        for run in read_result_file(path):
+            self.results = run['store']
+            self.session_data = run['sessions']
+            # Fault kinds are only counted live; outcomes and attempts come from the file
+            self.fault_counts = {}
+            num_users = run['meta'].get('concurrent_users', len(run['sessions']))
+            report = self.analyze_load_test_results(num_users, run['total_test_time'])
+            report['run_completed'] = run['completed']
+            reports.append(report)
+        return reports
+    
     def generate_load_test_report(self, results: Dict[str, Any]) -> str:
         """Generate a formatted load test report"""
         
+        faults = ", ".join(f"{kind} x{count}" for kind, count in results['reliability']['faults'].items()) or "none"
+        # Stages no turn reached have an empty summary
+        stage_means = {
+            name: f"{summary['mean']:.2f} seconds" if summary else "n/a (stage never ran)"
+            for name, summary in results['performance_metrics'].items()
+        }
+        skipped = results['reliability']['stage_skipped']
         report = f"""
 # Load Test Report - OMANI Therapist Voice
 
@@ -228,15 +341,24 @@ class LoadTester:
 - Min Response Time: {results['performance_metrics']['total_turn_time']['min']:.2f} seconds
 
 ### Component Performance
-- Average AI Response Time: {results['performance_metrics']['ai_response_time']['mean']:.2f} seconds
-- Average STT Processing Time: {results['performance_metrics']['stt_processing_time']['mean']:.2f} seconds
-- Average TTS Processing Time: {results['performance_metrics']['tts_processing_time']['mean']:.2f} seconds
+- Average AI Response Time: {stage_means['ai_response_time']}
+- Average STT Processing Time: {stage_means['stt_processing_time']}
+- Average TTS Processing Time: {stage_means['tts_processing_time']}
+- Average Generation Queue Wait: {stage_means['generation_queue_time']}
 
 ## Concurrency Analysis
 - Interactions per Second: {results['concurrency_analysis']['interactions_per_second']:.2f}
 - System Utilization: {results['concurrency_analysis']['system_utilization']:.1f}%
 - Average Session Duration: {results['concurrency_analysis']['average_session_duration']:.2f} seconds
 
+## Reliability
+- Turns OK / Degraded / Failed: {results['reliability']['outcomes']['ok']} / {results['reliability']['outcomes']['degraded']} / {results['reliability']['outcomes']['failed']}
+- Error Rate: {results['reliability']['error_rate']:.1f}%
+- Provider Calls per Turn: {results['reliability']['calls_per_turn']:.2f}
+- Retry Amplification: {results['reliability']['retry_amplification']:.2f}x
+- Turns That Never Reached Generation / TTS: {skipped['generation']} / {skipped['tts']}
+- Injected Faults: {faults}
+
 ## User Type Analysis
 """
         
@@ -264,6 +386,8 @@ class LoadTester:
 class StressTester(LoadTester):
     """Extended load tester for stress testing scenarios"""
     
+    scenario_name = 'stress'
+    
     async def run_stress_test(self, max_users: int = 20, duration_minutes: int = 5):
         """Run progressive stress test"""
         
@@ -313,14 +437,162 @@ class StressTester(LoadTester):
                 return result['stress_level']
         
         return results[-1]['stress_level'] if results else 1
+    
+    def _meets_slo(self, result: Dict[str, Any], slo_p95: float, max_error_rate: float) -> bool:
+        """One run's verdict: response-time p95 within the SLO and errors within budget"""
+        p95 = result['performance_metrics']['response_time'].get('p95', 0.0)
+        error_rate = 1 - result['test_summary']['success_rate'] / 100
+        return p95 <= slo_p95 and error_rate <= max_error_rate
+    
+    async def evaluate_level(self, num_users: int, slo_p95: float = 20.0, max_error_rate: float = 0.01,
+                             session_length: int = 3, min_repeats: int = 2, max_repeats: int = 3,
+                             cooldown: float = 2.0) -> Dict[str, Any]:
+        """Repeat a load level until the runs agree; a split is settled by majority (ties fail)"""
+        runs = []
+        pooled = LatencyHistogram()
+        while True:
+            result = await self.run_load_test(num_users, session_length=session_length)
+            result['stress_level'] = num_users
+            result['slo_met'] = self._meets_slo(result, slo_p95, max_error_rate)
+            runs.append(result)
+            pooled.merge(self.results.histogram('response_time'))
+            
+            passes = sum(run['slo_met'] for run in runs)
+            unanimous = passes in (0, len(runs))
+            if (len(runs) >= min_repeats and unanimous) or len(runs) >= max_repeats:
+                break
+            await asyncio.sleep(cooldown)
+        
+        return {
+            'users': num_users,
+            'passed': passes * 2 > len(runs),
+            'runs': len(runs),
+            'passing_runs': passes,
+            'turns': pooled.count,
+            'p95': pooled.quantile(0.95),
+            'p95_bounds': quantile_bounds(pooled, 0.95),
+            'error_rate': statistics.mean(1 - run['test_summary']['success_rate'] / 100 for run in runs),
+            'results': runs
+        }
+    
+    async def run_adaptive_stress_test(self, max_users: int = 200, start_users: int = 1, growth: float = 2.0,
+                                       resolution: int = 1, slo_p95: float = 20.0, max_error_rate: float = 0.01,
+                                       session_length: int = 3, min_repeats: int = 2, max_repeats: int = 3,
+                                       cooldown: float = 2.0) -> Dict[str, Any]:
+        """Exponential ramp until the SLO breaks, then bisect between the last passing and first failing level"""
+        print(f"Starting adaptive stress test (p95 SLO {slo_p95:.0f}s, max error rate {max_error_rate:.1%})")
+        print("=" * 60)
+        
+        levels = {}
+        
+        async def probe(num_users: int) -> bool:
+            if levels:
+                await asyncio.sleep(cooldown)
+            print(f"\nProbing {num_users} users...")
+            level = await self.evaluate_level(num_users, slo_p95, max_error_rate, session_length,
+                                              min_repeats, max_repeats, cooldown)
+            levels[num_users] = level
+            low, high = level['p95_bounds']
+            print(f"   {'PASS' if level['passed'] else 'FAIL'}: p95 {level['p95']:.2f}s "
+                  f"(95% CI {low:.2f}-{high:.2f}s), errors {level['error_rate']:.1%}, "
+                  f"{level['passing_runs']}/{level['runs']} runs within SLO")
+            return level['passed']
+        
+        # Exponential phase brackets the knee in O(log n) levels
+        last_good, first_bad = 0, None
+        num_users = start_users
+        while True:
+            if await probe(num_users):
+                last_good = num_users
+            else:
+                first_bad = num_users
+                break
+            if num_users >= max_users:
+                break
+            num_users = min(max(int(num_users * growth), num_users + 1), max_users)
+        
+        # Bisection narrows the bracket to the requested resolution
+        while first_bad is not None and first_bad - last_good > resolution:
+            middle = (last_good + first_bad) // 2
+            if await probe(middle):
+                last_good = middle
+            else:
+                first_bad = middle
+        
+        return {
+            'slo': {'p95': slo_p95, 'max_error_rate': max_error_rate},
+            'levels_probed': len(levels),
+            'total_runs': sum(level['runs'] for level in levels.values()),
+            'levels': [{key: value for key, value in level.items() if key != 'results'}
+                       for _, level in sorted(levels.items())],
+            'knee': self._estimate_knee(levels, last_good, first_bad, slo_p95),
+            'max_stable_users': last_good,
+            'performance_degradation_point': first_bad,
+            'stress_test_results': [result for _, level in sorted(levels.items()) for result in level['results']]
+        }
+    
+    def _estimate_knee(self, levels: Dict[int, Dict[str, Any]], last_good: int, first_bad: int,
+                       slo_p95: float) -> Dict[str, Any]:
+        """Knee between the bracketing levels, interpolated where the p95 crosses the SLO"""
+        if first_bad is None:
+            return {'users': None, 'bounds': [last_good, None], 'marginal': False,
+                    'note': f"No saturation up to {last_good} users"}
+        
+        bad = levels[first_bad]
+        good = levels.get(last_good)
+        estimate = float(first_bad)
+        if good and bad['p95'] > good['p95']:
+            fraction = (slo_p95 - good['p95']) / (bad['p95'] - good['p95'])
+            estimate = last_good + min(max(fraction, 0.0), 1.0) * (first_bad - last_good)
+        
+        return {
+            'users': estimate,
+            'bounds': [last_good, first_bad],
+            # The passing level's p95 interval straddles the SLO, so its verdict could flip on a rerun
+            'marginal': bool(good) and good['p95_bounds'][1] > slo_p95
+        }
 
 # Example usage and testing
 if __name__ == "__main__":
+    import argparse
     import asyncio
+    
+    parser = argparse.ArgumentParser(description="Load and stress tests for OMANI-Therapist-Voice")
+    parser.add_argument('--sink', help="Stream every turn to this JSONL file as it completes")
+    parser.add_argument('--reaggregate', metavar='PATH', help="Re-aggregate a previously streamed JSONL file and exit")
+    parser.add_argument('--profile', action='store_true', help="Profile each load level (pstats + collapsed stacks)")
+    parser.add_argument('--profile-dir', default='profiles/load')
+    parser.add_argument('--top', type=int, default=15, help="Hot functions to show in the report")
+    parser.add_argument('--max-users', type=int, default=200, help="Upper bound for the adaptive stress search")
+    parser.add_argument('--slo-p95', type=float, default=20.0, help="Response-time p95 SLO in seconds")
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--capacity', type=int, default=8,
+                        help="Concurrent generation slots in the simulated backend for the stress test (0 = unlimited)")
+    parser.add_argument('--linear', action='store_true', help="Use the original linear stress sweep")
+    parser.add_argument('--faults', choices=sorted(FAULT_SCENARIOS), default='none',
+                        help="Provider fault scenario injected into every stage call")
+    parser.add_argument('--max-attempts', type=int, default=3, help="Client attempts per stage call (1 = no retries)")
+    args = parser.parse_args()
+    
+    def fault_options() -> Dict[str, Any]:
+        if args.faults == 'none':
+            return {}
+        return {'fault_injector': FaultInjector.from_name(args.faults),
+                'retry_policy': RetryPolicy(max_attempts=args.max_attempts)}
+    profiler = PipelineProfiler(args.profile_dir, top_n=args.top) if args.profile else None
+    
+    if args.reaggregate:
+        offline_tester = LoadTester()
+        for run_report in offline_tester.analyze_result_file(args.reaggregate):
+            print(offline_tester.generate_load_test_report(run_report))
+            if not run_report['run_completed']:
+                print("Note: run did not complete; duration estimated from the last recorded turn")
+        raise SystemExit(0)
+    
     async def main():
         # Basic load test
         print("Running basic load test")
-        load_tester = LoadTester()
+        load_tester = LoadTester(sink_path=args.sink, profiler=profiler, **fault_options())
         
         # Test with 5 concurrent users
         results = await load_tester.run_load_test(num_users=5, session_length=4)
@@ -337,17 +609,35 @@ if __name__ == "__main__":
         print("Running stress test")
         
         # Stress test
-        stress_tester = StressTester()
-        stress_results = await stress_tester.run_stress_test(max_users=15, duration_minutes=3)
+        stress_tester = StressTester(sink_path=args.sink, profiler=profiler,
+                                     generation_capacity=args.capacity or None, **fault_options())
+        if args.linear:
+            stress_results = await stress_tester.run_stress_test(max_users=15, duration_minutes=3)
+        else:
+            stress_results = await stress_tester.run_adaptive_stress_test(
+                max_users=args.max_users, slo_p95=args.slo_p95, max_error_rate=args.max_error_rate
+            )
         
         print(f"\nStress Test Results:")
         print(f"Max stable users: {stress_results['max_stable_users']}")
         print(f"Performance degradation point: {stress_results['performance_degradation_point']} users")
+        if 'knee' in stress_results:
+            knee = stress_results['knee']
+            low, high = knee['bounds']
+            if knee['users'] is None:
+                print(f"Saturation knee: {knee['note']}")
+            else:
+                print(f"Saturation knee: ~{knee['users']:.1f} users (between {low} and {high})"
+                      f"{' - marginal, rerun to confirm' if knee['marginal'] else ''}")
+            print(f"Search cost: {stress_results['levels_probed']} levels, {stress_results['total_runs']} runs")
         
         # Save stress test results
         with open('stress_test_results.json', 'w', encoding='utf-8') as f:
             json.dump(stress_results, f, ensure_ascii=False, indent=2)
         
         print("Results saved.")
+        
+        if profiler:
+            print_profile_summary(profiler.report(), args.top)
     
     asyncio.run(main())
@@ -0,0 +1,249 @@
+"""
+Complexity-Based Model Routing for OMANI-Therapist-Voice
+Sends trivial turns to templated/cached replies, normal turns to Flash and hard turns to Pro
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Any, Tuple
+
+import therapist_core
+from crisis_lexicon import get_crisis_lexicon
+from cultural_guardrail import estimate_tokens
+from result_store import LatencyHistogram
+from turn_deadline import plan_generation
+
+ROUTES = ('crisis', 'template', 'cached', 'fast', 'full')
+
+# Words above which a turn is treated as complex (the simulated pipeline's original heuristic)
+COMPLEX_WORDS = 25
+# Short, history-free turns are eligible for the reply cache
+CACHE_MAX_WORDS = 6
+
+TEMPLATE_REPLIES = {
+    'greeting': "هلا والله، الحمدلله إنك هني. شلونك اليوم؟ تبي تحكيلي شنو في بالك؟",
+    'thanks': "العفو، هذا واجبي. أنا موجود إذا تبي تكمل، شنو أكثر شي يشغل بالك الحين؟",
+    # Holding reply when the turn deadline leaves no time to generate
+    'deadline': "أسمعك وفاهم عليك. خذ راحتك، وقولي أكثر عن اللي تحس فيه الحين.",
+}
+TEMPLATE_TRIGGERS = {
+    'greeting': ('شلونك', 'كيف الحال', 'كيف حالك', 'السلام عليكم', 'مرحبا', 'هلا', 'أهلا',
+                 'صباح الخير', 'مساء الخير'),
+    'thanks': ('شكرا', 'شكراً', 'مشكور', 'يعطيك العافية', 'جزاك الله خير'),
+}
+# Words that can surround a greeting or thanks without adding anything to answer
+TEMPLATE_FILLERS = ('يا', 'والله', 'دكتور', 'أخوي', 'اخوي', 'أختي', 'حبيبي', 'وايد', 'جزيلا', 'جزيلاً', 'و')
+# A classifier probability at or above this keeps a turn away from canned replies
+TEMPLATE_MAX_CRISIS_PROBABILITY = 0.05
+# Routes that go through provider admission control; template and cached replies never reach Gemini
+ADMITTED_ROUTES = ('crisis', 'fast', 'full')
+
+# Life areas; a turn touching several of them usually needs the larger model
+TOPIC_MARKERS = {
+    'family': ('أهلي', 'أهلك', 'عائلت', 'أبوي', 'أمي', 'إخواني'),
+    'marriage': ('زوجت', 'زوجي', 'طلاق', 'الزواج'),
+    'work': ('الشغل', 'المدير', 'وظيف', 'العمل'),
+    'study': ('الدراسة', 'الجامعة', 'امتحان', 'الدرجات'),
+    'money': ('مالي', 'الديون', 'الراتب'),
+    'social': ('وحيد', 'لحالي', 'أصدقاء', 'الرفاق'),
+}
+PROBLEM_MARKERS = ('مشاكل', 'مشكلة', 'ما يفهمون', 'يتدخلون', 'ما نتفاهم')
+
+# Estimated USD per 1M tokens (input, output); override per deployment
+ROUTE_PRICING = {
+    'fast': (0.075, 0.30),
+    'full': (1.25, 5.00),
+}
+
+ROUTE_GENERATION_CONFIG = {
+    'fast': therapist_core.GENERATION_CONFIG,
+    'full': dict(therapist_core.GENERATION_CONFIG, max_output_tokens=400),
+}
+
+def normalize_for_cache(text: str) -> str:
+    return " ".join(text.replace('؟', ' ').replace('?', ' ').replace('،', ' ').split())
+
+def template_for(user_input: str) -> str:
+    """Template name when the whole turn is a greeting or thanks (plus fillers), else None"""
+    text = f" {normalize_for_cache(user_input.replace('!', ' ').replace('.', ' '))} "
+    matched = None
+    for name, triggers in TEMPLATE_TRIGGERS.items():
+        for trigger in sorted(triggers, key=len, reverse=True):
+            if f" {trigger} " in text:
+                text = text.replace(f" {trigger} ", " ")
+                matched = matched or name
+    # Anything left over besides fillers is something the user wants heard
+    if matched is None or any(word not in TEMPLATE_FILLERS for word in text.split()):
+        return None
+    return matched
+
+def turn_features(user_input: str, conversation_history: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Cheap per-turn features: length, history depth and lexicon hits"""
+    return {
+        'crisis_severity': get_crisis_lexicon().max_severity(user_input),
+        'words': len(user_input.split()),
+        'history_depth': len(conversation_history),
+        'topics': sum(1 for markers in TOPIC_MARKERS.values() if any(m in user_input for m in markers)),
+        'problem_markers': sum(1 for marker in PROBLEM_MARKERS if marker in user_input),
+        'template': template_for(user_input)
+    }
+
+def classify_turn(user_input: str, conversation_history: List[Dict[str, Any]],
+                  classifier=None) -> Tuple[str, Dict[str, Any]]:
+    """Route for a non-crisis turn: 'template', 'cached' (eligible), 'fast' or 'full'"""
+    features = turn_features(user_input, conversation_history)
+    # Any crisis signal, even below the crisis threshold, rules out a canned reply
+    if features['template'] and not features['crisis_severity'] and (
+            classifier is None or classifier.predict_proba(user_input) < TEMPLATE_MAX_CRISIS_PROBABILITY):
+        return 'template', features
+    if (features['words'] > COMPLEX_WORDS or features['topics'] >= 3
+            or (features['topics'] >= 2 and features['problem_markers'])
+            or (features['problem_markers'] >= 2)):
+        return 'full', features
+    if not conversation_history and features['words'] <= CACHE_MAX_WORDS:
+        return 'cached', features
+    return 'fast', features
+
+class ModelRouter:
+    """Chooses a reply source per turn and keeps per-route latency and cost metrics"""
+
+    def __init__(self, models: Dict[str, Any], cache_size: int = 256, pricing: Dict[str, Tuple[float, float]] = None,
+                 classifier=None):
+        self.models = models
+        # Optional CrisisClassifier (crisis_classifier.py) that vetoes templated replies
+        self.classifier = classifier
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.pricing = pricing or ROUTE_PRICING
+        self.lock = threading.Lock()
+        self.metrics = {route: {'count': 0, 'latency': LatencyHistogram(), 'input_tokens': 0,
+                                'output_tokens': 0, 'cost': 0.0, 'errors': 0} for route in ROUTES}
+
+    def _model_for(self, route: str):
+        # Deployments without a full model fall back to the fast one
+        return self.models.get(route) or self.models['fast']
+
+    def _record(self, route: str, latency: float, prompt_chars: int = 0, reply: str = '', error: bool = False):
+        with self.lock:
+            metrics = self.metrics[route]
+            metrics['count'] += 1
+            metrics['latency'].add(latency)
+            metrics['errors'] += error
+            if route in self.pricing:
+                input_tokens = estimate_tokens('x' * prompt_chars)
+                output_tokens = estimate_tokens(reply)
+                input_price, output_price = self.pricing[route]
+                metrics['input_tokens'] += input_tokens
+                metrics['output_tokens'] += output_tokens
+                metrics['cost'] += (input_tokens * input_price + output_tokens * output_price) / 1e6
+
+    def plan_route(self, user_input: str, conversation_history: List[Dict[str, Any]]) -> str:
+        """Route generate() would take, without calling a model (a deadline may still downgrade fast/full)"""
+        if therapist_core.is_crisis_text(user_input):
+            return 'crisis'
+        route, _ = classify_turn(user_input, conversation_history, self.classifier)
+        if route == 'cached':
+            with self.lock:
+                return 'cached' if normalize_for_cache(user_input) in self.cache else 'fast'
+        return route
+
+    def generate(self, user_input: str, conversation_history: List[Dict[str, Any]],
+                 guardrail=None, deadline=None, admit: Callable[[str], bool] = None) -> Tuple[str, str, str]:
+        """Returns (reply, response_type, route); a TurnDeadline may downgrade the route or shorten the reply
+
+        admit(route) is asked only for ADMITTED_ROUTES, right before they would reach the provider;
+        if it refuses, the result is (None, None, 'shed').
+        """
+        start = time.perf_counter()
+
+        if therapist_core.is_crisis_text(user_input):
+            if admit is not None and not admit('crisis'):
+                return None, None, 'shed'
+            text, response_type = therapist_core.get_gemini_response(user_input, conversation_history, None)
+            self._record('crisis', time.perf_counter() - start)
+            return text, response_type, 'crisis'
+
+        route, features = classify_turn(user_input, conversation_history, self.classifier)
+        if route == 'template':
+            self._record('template', time.perf_counter() - start)
+            return TEMPLATE_REPLIES[features['template']], "normal", 'template'
+
+        cache_key = normalize_for_cache(user_input) if route == 'cached' else None
+        if cache_key is not None:
+            with self.lock:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    self.cache.move_to_end(cache_key)
+            if cached is not None:
+                self._record('cached', time.perf_counter() - start)
+                return cached, "normal", 'cached'
+            route = 'fast'
+
+        generation_config = ROUTE_GENERATION_CONFIG[route]
+        if deadline is not None:
+            planned, generation_config = plan_generation(deadline, route, generation_config)
+            if planned is None:
+                self._record('template', time.perf_counter() - start)
+                return TEMPLATE_REPLIES['deadline'], "normal", 'template'
+            route = planned
+
+        if admit is not None and not admit(route):
+            return None, None, 'shed'
+        prompt_chars = len(therapist_core.build_therapist_prompt(user_input, conversation_history))
+        text, response_type = therapist_core.get_gemini_response(
+            user_input, conversation_history, self._model_for(route), guardrail,
+            generation_config=generation_config, deadline=deadline
+        )
+        self._record(route, time.perf_counter() - start, prompt_chars, text, error=response_type == "error")
+
+        # A reply cut short for the deadline shouldn't be served to later turns
+        if cache_key is not None and response_type == "normal" and not (deadline and deadline.degradations):
+            with self.lock:
+                self.cache[cache_key] = text
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return text, response_type, route
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = sum(metrics['count'] for metrics in self.metrics.values())
+            return {
+                route: {
+                    'count': metrics['count'],
+                    'share': metrics['count'] / total if total else 0.0,
+                    'errors': metrics['errors'],
+                    'latency': metrics['latency'].summary(),
+                    'input_tokens': metrics['input_tokens'],
+                    'output_tokens': metrics['output_tokens'],
+                    'estimated_cost_usd': metrics['cost']
+                }
+                for route, metrics in self.metrics.items()
+            }
+
+# Example usage
+if __name__ == "__main__":
+    from evaluation_runner import LocalStandInModel
+    from test_cases_omani import get_omani_test_cases
+
+    print("Routing the Omani test cases")
+    print("=" * 50)
+    agreement = 0
+    cases = [case for case in get_omani_test_cases() if case['expected_response_type'] != 'crisis']
+    for case in cases:
+        route, features = classify_turn(case['input_text'], case['history'])
+        routed_complex = route == 'full'
+        agreement += routed_complex == (case['expected_response_type'] == 'complex')
+        print(f"   {route:8} (expected {case['expected_response_type']:7}) {case['name']}")
+    print(f"Agreement with expected complexity: {agreement}/{len(cases)}")
+
+    router = ModelRouter({'fast': LocalStandInModel(latency=0.02), 'full': LocalStandInModel(latency=0.08)})
+    texts = [case['input_text'] for case in get_omani_test_cases()] * 3
+    for text in texts:
+        router.generate(text, [])
+
+    print("\nPer-route metrics:")
+    for route, metrics in router.stats().items():
+        if metrics['count']:
+            print(f"   {route:8} {metrics['count']:4d} turns, mean {metrics['latency']['mean'] * 1000:7.1f}ms, "
+                  f"~${metrics['estimated_cost_usd']:.6f}")
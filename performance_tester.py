@@ -2,10 +2,15 @@ import time
 import asyncio
 import logging
 import statistics
+from contextlib import nullcontext
 from datetime import datetime
 from typing import List, Dict, Any
 import json
 from test_cases_omani import get_omani_test_cases, get_omani_expressions
+from therapist_core import is_crisis_text
+from profiling import PipelineProfiler, print_profile_summary
+from model_router import classify_turn
+from chunked_transcription import estimate_chunked_stt_time
 
 class PerformanceMetrics:
     """Class to track and analyze performance metrics"""
@@ -42,17 +47,26 @@ class PerformanceMetrics:
 class OmaniTherapistTester:
     """Main testing class for the OMANI-Therapist-Voice project"""
     
-    def __init__(self):
+    def __init__(self, profiler: PipelineProfiler = None, stt_workers: int = 0):
         self.metrics = PerformanceMetrics()
         self.test_results = []
         self.logger = logging.getLogger(__name__)
         self.omani_expressions = get_omani_expressions()
+        self.profiler = profiler
+        # Parallel chunked STT workers, as in the app; 0 simulates one recognition call per recording
+        self.stt_workers = stt_workers
+    
+    def _stage(self, name: str):
+        return self.profiler.stage(name) if self.profiler else nullcontext()
         
     def simulate_stt_processing(self, audio_length: float) -> tuple:
         """Simulate Speech-to-Text processing with Omani Arabic"""
         start_time = time.time()
         # Realistic STT processing time for Arabic
-        processing_time = audio_length * 0.4 + 0.6  # Slightly longer for Arabic
+        if self.stt_workers:
+            processing_time = estimate_chunked_stt_time(audio_length, self.stt_workers)
+        else:
+            processing_time = audio_length * 0.4 + 0.6  # Slightly longer for Arabic
         time.sleep(processing_time)
         end_time = time.time()
         
@@ -62,19 +76,15 @@ class OmaniTherapistTester:
         """Simulate Gemini AI response generation with Omani context"""
         start_time = time.time()
         
-        # Crisis detection with Omani keywords
-        crisis_keywords = [
-            "انتحار", "أموت", "أنهي حياتي", "ما فيني أعيش",
-            "تعبت من الحياة", "ما عاد فيني", "خلاص تعبت"
-        ]
-        is_crisis = any(keyword in user_input for keyword in crisis_keywords)
+        # The app's inline crisis check, against the shared Omani crisis lexicon
+        is_crisis = is_crisis_text(user_input)
         
         # Simulate processing time
         if is_crisis:
             processing_time = 1.0  # Crisis responses are immediate
             response_type = "crisis"
             ai_response = "I hear you're going through a very difficult time. Contact support immediately: +968-2205-5555"
-        elif len(user_input.split()) > 25:
+        elif classify_turn(user_input, history)[0] == 'full':
             processing_time = 3.0  # Complex queries
             response_type = "complex"
             ai_response = "I understand your feelings, this is natural. Let's work together on this, God willing things will improve"
@@ -122,23 +132,27 @@ class OmaniTherapistTester:
         print(f"   Input: {test_case['input_text'][:50]}...")
         
         # Step 1: STT Processing
-        transcribed_text, stt_latency = self.simulate_stt_processing(
-            test_case.get('audio_length', 3.0)
-        )
+        with self._stage('stt'):
+            transcribed_text, stt_latency = self.simulate_stt_processing(
+                test_case.get('audio_length', 3.0)
+            )
         
         # Step 2: AI Response Generation
-        ai_response, response_type, ai_latency = self.simulate_gemini_response(
-            test_case['input_text'], 
-            test_case.get('history', [])
-        )
+        with self._stage('generation'):
+            ai_response, response_type, ai_latency = self.simulate_gemini_response(
+                test_case['input_text'], 
+                test_case.get('history', [])
+            )
         
         # Step 3: TTS Processing
-        audio_bytes, tts_latency = self.simulate_tts_processing(ai_response)
+        with self._stage('tts'):
+            audio_bytes, tts_latency = self.simulate_tts_processing(ai_response)
         
         total_latency = time.time() - test_start
         
         # Evaluate cultural appropriateness
-        cultural_score = self.evaluate_cultural_appropriateness(ai_response)
+        with self._stage('cultural_evaluation'):
+            cultural_score = self.evaluate_cultural_appropriateness(ai_response)
         
         # Record metrics
         self.metrics.add_metric('stt_latency', stt_latency)
@@ -155,6 +169,7 @@ class OmaniTherapistTester:
             'transcribed_text': transcribed_text,
             'ai_response': ai_response,
             'response_type': response_type,
+            'expected_response_type': test_case.get('expected_response_type'),
             'stt_latency': stt_latency,
             'ai_latency': ai_latency,
             'tts_latency': tts_latency,
@@ -174,7 +189,11 @@ class OmaniTherapistTester:
         
         for i, test_case in enumerate(test_cases, 1):
             print(f"\nTest {i}/{len(test_cases)}: {test_case['name']}")
-            result = self.run_single_test(test_case)
+            if self.profiler:
+                with self.profiler.scenario(f"{i:02d}_{test_case['name']}"):
+                    result = self.run_single_test(test_case)
+            else:
+                result = self.run_single_test(test_case)
             
             # Print results
             status = "PASS" if result['meets_requirement'] else "FAIL"
@@ -196,7 +215,9 @@ class OmaniTherapistTester:
             },
             'performance_metrics': {},
             'cultural_analysis': {},
-            'recommendations': []
+            'recommendations': [],
+            # Per-test latencies, so two runs can be compared statistically (compare_runs.py)
+            'raw_samples': {}
         }
         
         # Calculate success rate
@@ -213,13 +234,17 @@ class OmaniTherapistTester:
         # Performance statistics
         for metric_type in ['stt_latency', 'ai_response_latency', 'tts_latency', 'total_latency', 'cultural_appropriateness']:
             report['performance_metrics'][metric_type] = self.metrics.get_statistics(metric_type)
+        for metric_type in ['stt_latency', 'ai_response_latency', 'tts_latency', 'total_latency']:
+            report['raw_samples'][metric_type] = list(self.metrics.metrics[metric_type])
         
         # Cultural analysis
-        crisis_tests = [r for r in self.test_results if r['response_type'] == 'crisis']
+        labelled_crisis = [r for r in self.test_results if r['expected_response_type'] == 'crisis']
+        detected_crisis = [r for r in labelled_crisis if r['response_type'] == 'crisis']
         normal_tests = [r for r in self.test_results if r['response_type'] == 'normal']
         
         report['cultural_analysis'] = {
-            'crisis_detection_accuracy': len(crisis_tests) / len([t for t in get_omani_test_cases() if 'أموت' in t['input_text'] or 'انتحار' in t['input_text']]) if crisis_tests else 0,
+            # Recall over the labelled crisis cases, so false alarms can't push it past 1.0
+            'crisis_detection_accuracy': len(detected_crisis) / len(labelled_crisis) if labelled_crisis else 0,
             'normal_response_quality': statistics.mean([r['cultural_score'] for r in normal_tests]) if normal_tests else 0,
             'omani_authenticity': report['test_summary']['average_cultural_score']
         }
@@ -235,12 +260,26 @@ class OmaniTherapistTester:
         if report['test_summary']['average_cultural_score'] < 0.7:
             report['recommendations'].append("Needs improvement in using authentic Omani expressions")
         
+        if self.profiler:
+            report['profile'] = self.profiler.report()
+        
         return report
 
 # Main execution
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Performance tests for OMANI-Therapist-Voice")
+    parser.add_argument('--profile', action='store_true', help="Profile each pipeline stage per test case")
+    parser.add_argument('--profile-dir', default='profiles/performance')
+    parser.add_argument('--top', type=int, default=15, help="Hot functions to show in the report")
+    parser.add_argument('--stt-workers', type=int, default=0,
+                        help="Simulate parallel chunked STT with this many workers (0 = one call per recording)")
+    args = parser.parse_args()
+    
     # Initialize tester
-    tester = OmaniTherapistTester()
+    profiler = PipelineProfiler(args.profile_dir, top_n=args.top) if args.profile else None
+    tester = OmaniTherapistTester(profiler=profiler, stt_workers=args.stt_workers)
     
     # Get Omani test cases
     test_cases = get_omani_test_cases()
@@ -279,6 +318,9 @@ if __name__ == "__main__":
         for rec in performance_report['recommendations']:
             print(f"   • {rec}")
     
+    if 'profile' in performance_report:
+        print_profile_summary(performance_report['profile'], args.top)
+    
     # Save results to file
     with open('omani_performance_results.json', 'w', encoding='utf-8') as f:
         json.dump(performance_report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,184 @@
+"""
+Profiling Support for OMANI-Therapist-Voice Testers
+Per-stage cProfile plus a wall-clock stack sampler, written as pstats and collapsed-stack files
+"""
+
+import cProfile
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Any
+
+def scenario_slug(name: str) -> str:
+    """File-name-safe scenario name (keeps Arabic letters, which are word characters)"""
+    return re.sub(r'[^\w.-]+', '_', name).strip('_') or 'scenario'
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval and counts collapsed stacks"""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = {}
+        self.samples = 0
+        self.label = None  # Optional root frame, e.g. the current pipeline stage
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.reverse()
+            if self.label:
+                stack.insert(0, self.label)
+            key = ";".join(stack)
+            self.counts[key] = self.counts.get(key, 0) + 1
+            self.samples += 1
+
+    def write_collapsed(self, path: str):
+        """Brendan Gregg's collapsed format, readable by flamegraph.pl and speedscope"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+def top_functions(stats: pstats.Stats, top_n: int = 15) -> List[Dict[str, Any]]:
+    """Hottest functions by own time"""
+    rows = []
+    for (filename, line, name), (_, calls, own_time, cumulative_time, _) in stats.stats.items():
+        rows.append({
+            'function': f"{os.path.basename(filename)}:{line}({name})",
+            'calls': calls,
+            'own_time': own_time,
+            'cumulative_time': cumulative_time
+        })
+    rows.sort(key=lambda row: row['own_time'], reverse=True)
+    return rows[:top_n]
+
+class PipelineProfiler:
+    """Profiles scenarios, optionally split by pipeline stage, and writes one file set per scenario"""
+
+    def __init__(self, output_dir: str = 'profiles', sample_interval: float = 0.005, top_n: int = 15):
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.top_n = top_n
+        self.scenarios = {}
+        self._combined = None
+        self._current = None
+
+    @contextmanager
+    def scenario(self, name: str, per_stage: bool = True):
+        """Profile one scenario; with per_stage=False a single profile covers the whole block"""
+        slug = scenario_slug(name)
+        state = {
+            'name': name,
+            'per_stage': per_stage,
+            'profiles': {},
+            'sampler': StackSampler(threading.get_ident(), self.sample_interval)
+        }
+        self._current = state
+        state['sampler'].start()
+        whole = None
+        if not per_stage:
+            whole = state['profiles']['all'] = cProfile.Profile()
+            whole.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if whole:
+                whole.disable()
+            state['sampler'].stop()
+            state['wall_time'] = time.perf_counter() - start
+            self._current = None
+            self.scenarios[slug] = self._write(slug, state)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Attribute the block to a pipeline stage of the current scenario (no-op outside one)"""
+        state = self._current
+        if state is None or not state['per_stage']:
+            yield
+            return
+        profile = state['profiles'].get(name)
+        if profile is None:
+            profile = state['profiles'][name] = cProfile.Profile()
+        state['sampler'].label = name
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            state['sampler'].label = None
+
+    def _write(self, slug: str, state: Dict[str, Any]) -> Dict[str, Any]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        files = []
+        stages = {}
+        merged = None
+
+        for stage, profile in state['profiles'].items():
+            stats = pstats.Stats(profile)
+            if stats.total_calls == 0:
+                continue
+            if state['per_stage']:
+                path = os.path.join(self.output_dir, f"{slug}.{stage}.pstats")
+                stats.dump_stats(path)
+                files.append(path)
+            stages[stage] = {'total_time': stats.total_tt, 'top_functions': top_functions(stats, self.top_n)}
+            merged = stats if merged is None else merged.add(profile)
+
+        if merged is not None:
+            path = os.path.join(self.output_dir, f"{slug}.pstats")
+            merged.dump_stats(path)
+            files.append(path)
+            scenario_top = top_functions(merged, self.top_n)
+            self._combined = pstats.Stats(path) if self._combined is None else self._combined.add(path)
+
+        collapsed_path = os.path.join(self.output_dir, f"{slug}.collapsed")
+        state['sampler'].write_collapsed(collapsed_path)
+        files.append(collapsed_path)
+
+        return {
+            'name': state['name'],
+            'wall_time': state['wall_time'],
+            'samples': state['sampler'].samples,
+            'stages': stages,
+            'top_functions': scenario_top if merged is not None else [],
+            'files': files
+        }
+
+    def overall_top_functions(self) -> List[Dict[str, Any]]:
+        """Hot functions aggregated over every profiled scenario"""
+        return top_functions(self._combined, self.top_n) if self._combined is not None else []
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            'output_dir': self.output_dir,
+            'scenarios': self.scenarios,
+            'top_functions': self.overall_top_functions()
+        }
+
+def print_profile_summary(report: Dict[str, Any], top_n: int = 15):
+    """Print the top-N table the testers show at the end of a --profile run"""
+    print(f"\nProfile (files in {report['output_dir']}/):")
+    print(f"   {'own s':>8} {'cum s':>8} {'calls':>9}  function")
+    for row in report['top_functions'][:top_n]:
+        print(f"   {row['own_time']:8.3f} {row['cumulative_time']:8.3f} {row['calls']:9d}  {row['function']}")
@@ -0,0 +1,378 @@
+"""
+Compact Result Storage for OMANI-Therapist-Voice Load Testing
+Columnar per-turn storage with incremental, mergeable aggregation
+"""
+
+import json
+import math
+import os
+import time
+from array import array
+from typing import Dict, List, Any, Iterator
+
+class LatencyHistogram:
+    """Fixed-resolution latency histogram with exact counters and bucketed quantiles"""
+
+    __slots__ = ('resolution', 'buckets', 'count', 'total', 'total_sq', 'minimum', 'maximum')
+
+    def __init__(self, resolution: float = 0.001):
+        self.resolution = resolution
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def add(self, value: float):
+        bucket = int(value / self.resolution)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.total_sq += value * value
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+
+    def merge(self, other: 'LatencyHistogram'):
+        """Fold another histogram (same resolution) into this one"""
+        if other.resolution != self.resolution:
+            raise ValueError("Cannot merge histograms with different resolutions")
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def std_dev(self) -> float:
+        if self.count < 2:
+            return 0.0
+        variance = (self.total_sq - self.total * self.total / self.count) / (self.count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile, accurate to the histogram resolution"""
+        if not self.count:
+            return 0.0
+        if q <= 0:
+            return self.minimum
+        if q >= 1:
+            return self.maximum
+
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                value = (bucket + 0.5) * self.resolution
+                return min(max(value, self.minimum), self.maximum)
+        return self.maximum
+
+    def summary(self) -> Dict[str, float]:
+        if not self.count:
+            return {}
+        return {
+            'mean': self.mean(),
+            'median': self.quantile(0.5),
+            'min': self.minimum,
+            'max': self.maximum,
+            'std_dev': self.std_dev(),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99)
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'resolution': self.resolution,
+            'buckets': list(self.buckets.items()),
+            'count': self.count,
+            'total': self.total,
+            'total_sq': self.total_sq,
+            'minimum': self.minimum if self.count else None,
+            'maximum': self.maximum if self.count else None
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LatencyHistogram':
+        histogram = cls(data['resolution'])
+        histogram.buckets = {int(bucket): count for bucket, count in data['buckets']}
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.total_sq = data['total_sq']
+        if data['count']:
+            histogram.minimum = data['minimum']
+            histogram.maximum = data['maximum']
+        return histogram
+
+class TurnResultStore:
+    """Columnar store for load test turn records"""
+
+    INT_COLUMNS = ('user_id', 'turn', 'stt_attempts', 'ai_attempts', 'tts_attempts', 'outcome')
+    FLOAT_COLUMNS = ('thinking_time', 'stt_time', 'ai_response_time', 'tts_time', 'queue_time',
+                     'total_turn_time', 'response_time', 'timestamp')
+    LATENCY_COLUMNS = ('thinking_time', 'stt_time', 'ai_response_time', 'tts_time', 'queue_time',
+                       'total_turn_time', 'response_time')
+    # Stage latencies are None for a stage the turn never reached: stored as NaN, left out of every statistic
+    OPTIONAL_COLUMNS = ('ai_response_time', 'tts_time', 'queue_time')
+    HEAD_ROWS = 10
+    # Provider calls per stage (0 when a turn never reached the stage)
+    ATTEMPT_COLUMNS = ('stt_attempts', 'ai_attempts', 'tts_attempts')
+    # Turn outcomes, stored as their index: degraded turns got a reply with a stage fault (e.g. partial audio)
+    OUTCOMES = ('ok', 'degraded', 'failed')
+
+    def __init__(self, keep_rows: bool = True):
+        # With keep_rows=False only the first HEAD_ROWS rows are kept; aggregates still cover every turn
+        self.keep_rows = keep_rows
+        self.count = 0
+        self.columns = {name: array('q') for name in self.INT_COLUMNS}
+        self.columns.update({name: array('d') for name in self.FLOAT_COLUMNS})
+        self.histograms = {name: LatencyHistogram() for name in self.LATENCY_COLUMNS}
+
+        # user_type is dictionary-encoded; per-type sums are kept as turns arrive
+        self.user_types = []
+        self.user_type_codes = array('H')
+        self._user_type_index = {}
+        self._group_counts = array('q')
+        self._group_sums = []
+        self._group_value_counts = []
+
+        # Reliability aggregates over every turn, kept even when rows are dropped
+        self.outcome_counts = array('q', [0] * len(self.OUTCOMES))
+        self.stage_calls = array('q', [0] * len(self.ATTEMPT_COLUMNS))
+        self.stage_turns = array('q', [0] * len(self.ATTEMPT_COLUMNS))
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def stored_rows(self) -> int:
+        return len(self.user_type_codes)
+
+    def _encode_user_type(self, user_type: str) -> int:
+        code = self._user_type_index.get(user_type)
+        if code is None:
+            code = len(self.user_types)
+            self._user_type_index[user_type] = code
+            self.user_types.append(user_type)
+            self._group_counts.append(0)
+            self._group_sums.append(array('d', [0.0] * len(self.LATENCY_COLUMNS)))
+            self._group_value_counts.append(array('q', [0] * len(self.LATENCY_COLUMNS)))
+        return code
+
+    def append(self, record: Dict[str, Any]):
+        """Add a single turn record"""
+        if 'response_time' not in record:
+            # Files written before the column existed: everything after the user stopped thinking
+            record = dict(record, response_time=record['total_turn_time'] - record['thinking_time'])
+        if 'outcome' not in record:
+            # Written before fault injection: every stage made one successful call
+            record = dict(record, outcome='ok', **{name: 1 for name in self.ATTEMPT_COLUMNS})
+        if 'queue_time' not in record:
+            # Written before the generation queue wait was kept: unknown, not zero
+            record = dict(record, queue_time=None)
+        outcome = self.OUTCOMES.index(record['outcome'])
+        code = self._encode_user_type(record['user_type'])
+        self.count += 1
+        if self.keep_rows or self.count <= self.HEAD_ROWS:
+            self.user_type_codes.append(code)
+            for name in self.INT_COLUMNS:
+                self.columns[name].append(outcome if name == 'outcome' else record[name])
+            for name in self.FLOAT_COLUMNS:
+                value = record[name]
+                self.columns[name].append(math.nan if value is None else value)
+
+        self.outcome_counts[outcome] += 1
+        for i, name in enumerate(self.ATTEMPT_COLUMNS):
+            if record[name]:
+                self.stage_calls[i] += record[name]
+                self.stage_turns[i] += 1
+
+        sums = self._group_sums[code]
+        value_counts = self._group_value_counts[code]
+        self._group_counts[code] += 1
+        for i, name in enumerate(self.LATENCY_COLUMNS):
+            value = record[name]
+            if value is None:
+                continue
+            self.histograms[name].add(value)
+            sums[i] += value
+            value_counts[i] += 1
+
+    def extend(self, other: 'TurnResultStore'):
+        """Merge another store's rows and aggregates into this one"""
+        remap = [self._encode_user_type(user_type) for user_type in other.user_types]
+        room = len(other.user_type_codes)
+        if not self.keep_rows:
+            room = max(0, min(room, self.HEAD_ROWS - self.stored_rows))
+        self.user_type_codes.extend(array('H', (remap[code] for code in other.user_type_codes[:room])))
+        for name, column in other.columns.items():
+            self.columns[name].extend(column[:room])
+        self.count += other.count
+        for name, histogram in other.histograms.items():
+            self.histograms[name].merge(histogram)
+        for i in range(len(self.OUTCOMES)):
+            self.outcome_counts[i] += other.outcome_counts[i]
+        for i in range(len(self.ATTEMPT_COLUMNS)):
+            self.stage_calls[i] += other.stage_calls[i]
+            self.stage_turns[i] += other.stage_turns[i]
+        for code, count in enumerate(other._group_counts):
+            target = remap[code]
+            self._group_counts[target] += count
+            for i, value in enumerate(other._group_sums[code]):
+                self._group_sums[target][i] += value
+                self._group_value_counts[target][i] += other._group_value_counts[code][i]
+
+    def row(self, index: int) -> Dict[str, Any]:
+        record = {name: column[index] for name, column in self.columns.items()}
+        for name in self.OPTIONAL_COLUMNS:
+            if math.isnan(record[name]):
+                record[name] = None
+        record['user_type'] = self.user_types[self.user_type_codes[index]]
+        record['outcome'] = self.OUTCOMES[record['outcome']]
+        return record
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self.stored_rows):
+            yield self.row(index)
+
+    def head(self, n: int = 10) -> List[Dict[str, Any]]:
+        return [self.row(index) for index in range(min(n, self.stored_rows))]
+
+    def column(self, name: str) -> array:
+        return self.columns[name]
+
+    def samples(self, name: str) -> List[float]:
+        """Stored values of a column, without the NaNs of stages that never ran"""
+        return [value for value in self.columns[name] if not math.isnan(value)]
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        return self.histograms[name]
+
+    def reliability(self) -> Dict[str, Any]:
+        """Turn outcomes and retry amplification (provider calls per stage invocation)"""
+        outcomes = {name: self.outcome_counts[i] for i, name in enumerate(self.OUTCOMES)}
+        calls = sum(self.stage_calls)
+        invocations = sum(self.stage_turns)
+        total = self.count
+        return {
+            'outcomes': outcomes,
+            'success_rate': (outcomes['ok'] + outcomes['degraded']) / total * 100 if total else 100.0,
+            'degraded_rate': outcomes['degraded'] / total * 100 if total else 0.0,
+            'error_rate': outcomes['failed'] / total * 100 if total else 0.0,
+            'provider_calls': calls,
+            'calls_per_turn': calls / total if total else 0.0,
+            'retry_amplification': calls / invocations if invocations else 1.0,
+            # Turns that never reached a stage (an earlier stage failed); they have no latency for it
+            'stage_skipped': {
+                stage: total - self.stage_turns[i] for i, stage in enumerate(('stt', 'generation', 'tts'))
+            },
+            'stage_amplification': {
+                stage: self.stage_calls[i] / self.stage_turns[i] if self.stage_turns[i] else 1.0
+                for i, stage in enumerate(('stt', 'generation', 'tts'))
+            }
+        }
+
+    def group_means(self) -> Dict[str, Dict[str, Any]]:
+        """Per user type turn count and mean latencies"""
+        groups = {}
+        for code, user_type in enumerate(self.user_types):
+            count = self._group_counts[code]
+            if not count:
+                continue
+            sums = self._group_sums[code]
+            value_counts = self._group_value_counts[code]
+            groups[user_type] = {'count': count}
+            for i, name in enumerate(self.LATENCY_COLUMNS):
+                groups[user_type][name] = sums[i] / value_counts[i] if value_counts[i] else None
+        return groups
+
+class TurnResultSink:
+    """Append-only JSONL sink that streams records to disk as they complete"""
+
+    def __init__(self, path: str, flush_every: int = 100, flush_interval: float = 5.0, fsync: bool = False):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.pending = 0
+        self.last_flush = time.monotonic()
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def write(self, kind: str, record: Dict[str, Any]):
+        """Append one record, flushing every flush_every records or flush_interval seconds"""
+        line = json.dumps(dict(record, kind=kind), ensure_ascii=False, separators=(',', ':'))
+        self.file.write(line + "\n")
+        self.pending += 1
+        if self.pending >= self.flush_every or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.file.closed:
+            return
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self) -> 'TurnResultSink':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def read_result_file(path: str, keep_rows: bool = False) -> List[Dict[str, Any]]:
+    """Re-aggregate a sink file offline, one entry per recorded run"""
+    runs = []
+    current = None
+
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crashed run can leave a truncated final line
+                continue
+
+            kind = record.pop('kind', 'turn')
+            if kind == 'run_start' or current is None:
+                current = {
+                    'meta': record if kind == 'run_start' else {},
+                    'store': TurnResultStore(keep_rows=keep_rows),
+                    'sessions': [],
+                    'total_test_time': None,
+                    'completed': False,
+                    'last_timestamp': None
+                }
+                runs.append(current)
+                if kind == 'run_start':
+                    continue
+
+            if kind == 'turn':
+                current['store'].append(record)
+                current['last_timestamp'] = record['timestamp']
+            elif kind == 'session':
+                current['sessions'].append(record)
+            elif kind == 'run_end':
+                current['total_test_time'] = record['total_test_time']
+                current['completed'] = True
+
+    for run in runs:
+        if run['total_test_time'] is None:
+            # Interrupted run: estimate duration from the last turn that reached disk
+            started = run['meta'].get('started_at', run['last_timestamp'])
+            run['total_test_time'] = max((run['last_timestamp'] or 0) - (started or 0), 1e-9)
+        del run['last_timestamp']
+
+    return runs
@@ -0,0 +1,386 @@
+"""
+External Session Storage for OMANI-Therapist-Voice
+Keeps conversation history outside the Streamlit process so any replica can serve a session
+"""
+
+import dbm
+import hashlib
+import hmac
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Any, Iterator, Union
+
+# Compact turn format: a JSON array [user, assistant, type_code]
+TURN_TYPES = ('normal', 'crisis', 'error')
+
+logger = logging.getLogger(__name__)
+
+# Stored transcripts are deleted this long after their last turn
+DEFAULT_RETENTION_SECONDS = 24 * 3600
+
+def sign_session_id(session_id: str, secret: str) -> str:
+    """Resumable session token '<id>.<hmac>'; only a holder of the server secret can mint one"""
+    signature = hmac.new(secret.encode(), session_id.encode(), hashlib.sha256).hexdigest()
+    return f"{session_id}.{signature}"
+
+def verify_session_token(token: str, secret: str) -> Union[str, None]:
+    """Session id from a signed token, or None if it is malformed or was not signed with this secret"""
+    if not token or not secret or '.' not in token:
+        return None
+    session_id = token.rsplit('.', 1)[0]
+    return session_id if hmac.compare_digest(sign_session_id(session_id, secret), token) else None
+
+def encode_turn(turn: Dict[str, Any]) -> bytes:
+    turn_type = turn.get('type', 'normal')
+    code = TURN_TYPES.index(turn_type) if turn_type in TURN_TYPES else turn_type
+    return json.dumps([turn['user'], turn['assistant'], code], ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def decode_turn(payload: bytes) -> Dict[str, Any]:
+    user, assistant, code = json.loads(payload)
+    return {
+        'user': user,
+        'assistant': assistant,
+        'type': TURN_TYPES[code] if isinstance(code, int) else code
+    }
+
+class SessionStore:
+    """Interface for conversation storage backends"""
+
+    def count(self, session_id: str) -> int:
+        raise NotImplementedError
+
+    def load_turns(self, session_id: str, start: int = 0, stop: int = None) -> List[Dict[str, Any]]:
+        """Turns [start, stop) of a session, oldest first"""
+        raise NotImplementedError
+
+    def append_turns(self, session_id: str, turns: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    def clear(self, session_id: str):
+        raise NotImplementedError
+
+    def last_activity(self, session_id: str) -> Union[float, None]:
+        """Unix time of the session's last appended turn, or None if nothing is stored"""
+        raise NotImplementedError
+
+    def purge_expired(self, cutoff: float) -> int:
+        """Delete every session whose last turn is older than cutoff; returns how many were removed"""
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite backend; one row per turn keyed by (session_id, seq)"""
+
+    def __init__(self, path: str = 'sessions.db'):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS turns ("
+                "session_id TEXT NOT NULL, seq INTEGER NOT NULL, payload BLOB NOT NULL, "
+                "PRIMARY KEY (session_id, seq)) WITHOUT ROWID"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS activity (session_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)"
+            )
+            # Sessions stored before retention existed start their clock now
+            self.connection.execute(
+                "INSERT OR IGNORE INTO activity (session_id, updated_at) SELECT DISTINCT session_id, ? FROM turns",
+                (time.time(),)
+            )
+
+    def count(self, session_id: str) -> int:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM turns WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0]
+
+    def load_turns(self, session_id: str, start: int = 0, stop: int = None) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT payload FROM turns WHERE session_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (session_id, start, stop if stop is not None else 2 ** 62)
+            ).fetchall()
+        return [decode_turn(payload) for (payload,) in rows]
+
+    def append_turns(self, session_id: str, turns: List[Dict[str, Any]]):
+        if not turns:
+            return
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM turns WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            self.connection.executemany(
+                "INSERT INTO turns (session_id, seq, payload) VALUES (?, ?, ?)",
+                [(session_id, row[0] + i, encode_turn(turn)) for i, turn in enumerate(turns)]
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO activity (session_id, updated_at) VALUES (?, ?)", (session_id, time.time())
+            )
+
+    def clear(self, session_id: str):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            self.connection.execute("DELETE FROM activity WHERE session_id = ?", (session_id,))
+
+    def last_activity(self, session_id: str) -> Union[float, None]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT updated_at FROM activity WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def purge_expired(self, cutoff: float) -> int:
+        with self.lock, self.connection:
+            expired = [session_id for (session_id,) in self.connection.execute(
+                "SELECT session_id FROM activity WHERE updated_at < ?", (cutoff,)
+            )]
+            for session_id in expired:
+                self.connection.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            self.connection.execute("DELETE FROM activity WHERE updated_at < ?", (cutoff,))
+        return len(expired)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+class KeyValueSessionStore(SessionStore):
+    """Local key-value backend (dbm) standing in for a networked KV store"""
+
+    def __init__(self, path: str = 'sessions.kv'):
+        self.lock = threading.Lock()
+        self.db = dbm.open(path, 'c')
+        # Sessions stored before retention existed start their clock now
+        for key in list(self.db.keys()):
+            if key.endswith(b':n') and key[:-2] + b':t' not in self.db:
+                self.db[key[:-2] + b':t'] = repr(time.time())
+
+    def _count_key(self, session_id: str) -> str:
+        return f"{session_id}:n"
+
+    def _activity_key(self, session_id: str) -> str:
+        return f"{session_id}:t"
+
+    def count(self, session_id: str) -> int:
+        with self.lock:
+            value = self.db.get(self._count_key(session_id))
+        return int(value) if value else 0
+
+    def load_turns(self, session_id: str, start: int = 0, stop: int = None) -> List[Dict[str, Any]]:
+        with self.lock:
+            total = int(self.db.get(self._count_key(session_id)) or 0)
+            stop = total if stop is None else min(stop, total)
+            return [decode_turn(self.db[f"{session_id}:{seq}"]) for seq in range(start, stop)]
+
+    def append_turns(self, session_id: str, turns: List[Dict[str, Any]]):
+        with self.lock:
+            total = int(self.db.get(self._count_key(session_id)) or 0)
+            for i, turn in enumerate(turns):
+                self.db[f"{session_id}:{total + i}"] = encode_turn(turn)
+            self.db[self._count_key(session_id)] = str(total + len(turns))
+            self.db[self._activity_key(session_id)] = repr(time.time())
+
+    def _delete_session(self, session_id: str):
+        total = int(self.db.get(self._count_key(session_id)) or 0)
+        for seq in range(total):
+            key = f"{session_id}:{seq}"
+            if key in self.db:
+                del self.db[key]
+        for key in (self._count_key(session_id), self._activity_key(session_id)):
+            if key in self.db:
+                del self.db[key]
+
+    def clear(self, session_id: str):
+        with self.lock:
+            self._delete_session(session_id)
+
+    def last_activity(self, session_id: str) -> Union[float, None]:
+        with self.lock:
+            value = self.db.get(self._activity_key(session_id))
+        return float(value) if value else None
+
+    def purge_expired(self, cutoff: float) -> int:
+        with self.lock:
+            # dbm has no secondary index, so this is a full key scan; it runs off the request path
+            expired = [key.decode()[:-2] for key in self.db.keys()
+                       if key.endswith(b':t') and float(self.db[key]) < cutoff]
+            for session_id in expired:
+                self._delete_session(session_id)
+        return len(expired)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+class WriteBehindSessionStore(SessionStore):
+    """Buffers appended turns and writes them to the backend in batches"""
+
+    def __init__(self, backend: SessionStore, batch_size: int = 16, flush_interval: float = 1.0,
+                 retention_seconds: float = DEFAULT_RETENTION_SECONDS, purge_interval: float = 300.0):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # None keeps transcripts forever; otherwise idle sessions are unreadable after this and purged soon after
+        self.retention_seconds = retention_seconds
+        self.purge_interval = purge_interval
+        self.last_purge = time.monotonic()
+        self.lock = threading.Lock()
+        self.buffer = {}
+        self.buffered = 0
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name='session-write-behind', daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            if self.retention_seconds is not None and time.monotonic() - self.last_purge >= self.purge_interval:
+                self.last_purge = time.monotonic()
+                try:
+                    self.purge_expired(time.time() - self.retention_seconds)
+                except Exception as e:
+                    # Keeps the flusher alive; the purge is retried after the next interval
+                    logger.error("Session purge failed: %s", e, extra={'event': 'session_store.purge_failed'})
+
+    def _expire_if_stale(self, session_id: str):
+        # Enforced on read as well, so a session past retention is gone even before the next purge; caller holds the lock
+        if self.retention_seconds is None or session_id in self.buffer:
+            return
+        updated_at = self.backend.last_activity(session_id)
+        if updated_at is not None and updated_at < time.time() - self.retention_seconds:
+            self.backend.clear(session_id)
+
+    def count(self, session_id: str) -> int:
+        with self.lock:
+            self._expire_if_stale(session_id)
+            return self.backend.count(session_id) + len(self.buffer.get(session_id, ()))
+
+    def load_turns(self, session_id: str, start: int = 0, stop: int = None) -> List[Dict[str, Any]]:
+        # Read-your-writes: stored turns followed by the ones still buffered
+        with self.lock:
+            self._expire_if_stale(session_id)
+            pending = list(self.buffer.get(session_id, ()))
+            stored = self.backend.count(session_id)
+            total = stored + len(pending)
+            stop = total if stop is None else min(stop, total)
+            turns = self.backend.load_turns(session_id, start, min(stop, stored)) if start < stored else []
+        return turns + pending[max(start - stored, 0):max(stop - stored, 0)]
+
+    def append_turns(self, session_id: str, turns: List[Dict[str, Any]]):
+        with self.lock:
+            self.buffer.setdefault(session_id, []).extend(turns)
+            self.buffered += len(turns)
+            should_flush = self.buffered >= self.batch_size
+        if should_flush:
+            self.flush()
+
+    def clear(self, session_id: str):
+        with self.lock:
+            self.buffered -= len(self.buffer.pop(session_id, ()))
+            self.backend.clear(session_id)
+
+    def last_activity(self, session_id: str) -> Union[float, None]:
+        with self.lock:
+            return time.time() if session_id in self.buffer else self.backend.last_activity(session_id)
+
+    def purge_expired(self, cutoff: float) -> int:
+        with self.lock:
+            return self.backend.purge_expired(cutoff)
+
+    def flush(self):
+        # Held across the write so readers never see a turn in neither place
+        with self.lock:
+            unflushed = {}
+            for session_id, turns in self.buffer.items():
+                try:
+                    self.backend.append_turns(session_id, turns)
+                except Exception as e:
+                    # e.g. 'database is locked': keep the turns buffered and retry on the next tick
+                    logger.error("Session flush failed for %d turn(s): %s", len(turns), e,
+                                 extra={'event': 'session_store.flush_failed'})
+                    unflushed[session_id] = turns
+            self.buffer = unflushed
+            self.buffered = sum(len(turns) for turns in unflushed.values())
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+        self.backend.close()
+
+class LazyHistory:
+    """List-like view of a stored conversation that loads turns only when accessed"""
+
+    def __init__(self, store: SessionStore, session_id: str):
+        self.store = store
+        self.session_id = session_id
+        self._length = None
+        self._cache = {}
+
+    def __len__(self) -> int:
+        # Read from the store every time: another tab may have appended, or retention may have purged
+        length = self.store.count(self.session_id)
+        if self._length is not None and length < self._length:
+            # Cleared or purged elsewhere; cached turns no longer describe the stored session
+            self._cache = {}
+        self._length = length
+        return length
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def _load(self, start: int, stop: int):
+        missing = [seq for seq in range(start, stop) if seq not in self._cache]
+        if missing:
+            for offset, turn in enumerate(self.store.load_turns(self.session_id, missing[0], missing[-1] + 1)):
+                self._cache[missing[0] + offset] = turn
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            self._load(start, stop)
+            return [self._cache[seq] for seq in range(start, stop)]
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("history index out of range")
+        self._load(index, index + 1)
+        return self._cache[index]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self[:])
+
+    def append(self, turn: Dict[str, Any]):
+        index = len(self)
+        self.store.append_turns(self.session_id, [turn])
+        self._cache[index] = turn
+
+    def clear(self):
+        self.store.clear(self.session_id)
+        self._cache = {}
+        self._length = 0
+
+def create_session_store(backend: str = 'sqlite', path: str = None, batch_size: int = 16,
+                         flush_interval: float = 1.0,
+                         retention_seconds: float = DEFAULT_RETENTION_SECONDS) -> SessionStore:
+    """Build a write-behind store over the named backend ('sqlite' or 'kv')"""
+    if backend == 'sqlite':
+        store = SQLiteSessionStore(path or 'sessions.db')
+    elif backend == 'kv':
+        store = KeyValueSessionStore(path or 'sessions.kv')
+    else:
+        raise ValueError(f"Unknown session store backend: {backend}")
+    return WriteBehindSessionStore(store, batch_size=batch_size, flush_interval=flush_interval,
+                                   retention_seconds=retention_seconds)
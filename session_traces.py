@@ -0,0 +1,291 @@
+"""
+Session Trace Recording and Replay for OMANI-Therapist-Voice
+Records anonymized per-turn timings from the app and re-drives them at 1x-100x speed
+"""
+
+import asyncio
+import hashlib
+import hmac
+import io
+import json
+import os
+import threading
+import time
+import wave
+from typing import Dict, List, Any, Callable
+
+from result_store import LatencyHistogram, TurnResultSink
+
+TRACE_STAGES = ('stt', 'generation', 'tts')
+
+def anonymize_session_id(session_id: str, salt: bytes) -> str:
+    return hmac.new(salt, session_id.encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+
+def wav_duration(wav_bytes: bytes) -> float:
+    """Seconds of audio in a WAV recording (0.0 if the header can't be read)"""
+    try:
+        with wave.open(io.BytesIO(wav_bytes)) as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except (wave.Error, EOFError, ZeroDivisionError):
+        return 0.0
+
+class TraceRecorder:
+    """Appends one anonymized record per turn; no transcript or reply text is stored"""
+
+    def __init__(self, path: str = 'session_traces.jsonl', salt: bytes = None, flush_every: int = 20):
+        # Without a configured salt ids are only linkable within this process's lifetime
+        self.salt = salt or os.urandom(16)
+        self.lock = threading.Lock()
+        self.sink = TurnResultSink(path, flush_every=flush_every)
+
+    def record(self, session_id: str, turn_index: int, started_at: float, audio_duration: float,
+               user_text: str, ai_text: str, response_type: str, latencies: Dict[str, float],
+               shed: bool = False, priority: str = None, queue_waits: Dict[str, float] = None,
+               degradations: List[str] = None, deadline_met: bool = None, ack_clip: str = None):
+        queue_waits = queue_waits or {}
+        record = {
+            'session': anonymize_session_id(session_id, self.salt),
+            'turn': turn_index,
+            'started_at': started_at,
+            'audio_duration': audio_duration,
+            'transcript_chars': len(user_text or ''),
+            'transcript_words': len((user_text or '').split()),
+            'response_chars': len(ai_text or ''),
+            'response_type': response_type,
+            'shed': shed,
+            'priority': priority,
+            'degradations': degradations or [],
+            'deadline_met': deadline_met,
+            # One of the fixed acknowledgment phrases (never user text), or None if no clip played
+            'ack_clip': ack_clip,
+            **{f"{stage}_time": latencies.get(stage) for stage in TRACE_STAGES},
+            **{f"{stage}_queue_wait": queue_waits.get(stage) for stage in TRACE_STAGES},
+            'turn_time': sum(value for value in latencies.values() if value)
+        }
+        with self.lock:
+            self.sink.write('trace_turn', record)
+
+    def close(self):
+        with self.lock:
+            self.sink.close()
+
+def load_traces(path: str) -> List[List[Dict[str, Any]]]:
+    """Recorded sessions, each a list of turns ordered by start time"""
+    sessions = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.pop('kind', None) == 'trace_turn':
+                sessions.setdefault(record['session'], []).append(record)
+
+    ordered = []
+    for turns in sessions.values():
+        turns.sort(key=lambda turn: turn['started_at'])
+        # Think time: from the end of the previous reply to the start of this turn's processing
+        previous_end = None
+        for turn in turns:
+            turn['think_time'] = max(turn['started_at'] - previous_end, 0.0) if previous_end is not None else 0.0
+            previous_end = turn['started_at'] + turn['turn_time']
+        ordered.append(turns)
+    ordered.sort(key=lambda turns: turns[0]['started_at'])
+    return ordered
+
+def summarize_traces(sessions: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Traffic shape of a trace file: session lengths, think times and stage latencies"""
+    histograms = {name: LatencyHistogram() for name in ('think_time', 'audio_duration', 'turn_time')}
+    histograms.update({f"{stage}_time": LatencyHistogram() for stage in TRACE_STAGES})
+    turns_per_session = LatencyHistogram(resolution=1.0)
+    # Scheduler queue wait per priority class, summed over the stages a turn went through
+    queue_waits = {}
+    degradations = {}
+    deadline_missed = 0
+    ack_clips = {}
+    for turns in sessions:
+        turns_per_session.add(len(turns))
+        for index, turn in enumerate(turns):
+            for action in turn.get('degradations', []):
+                degradations[action] = degradations.get(action, 0) + 1
+            deadline_missed += turn.get('deadline_met') is False
+            if turn.get('ack_clip'):
+                ack_clips[turn['ack_clip']] = ack_clips.get(turn['ack_clip'], 0) + 1
+            waits = [turn.get(f"{stage}_queue_wait") for stage in TRACE_STAGES]
+            if turn.get('priority') and any(wait is not None for wait in waits):
+                queue_waits.setdefault(turn['priority'], LatencyHistogram()).add(sum(wait or 0.0 for wait in waits))
+            for name, histogram in histograms.items():
+                if name == 'think_time' and index == 0:
+                    continue
+                if turn.get(name) is not None:
+                    histogram.add(turn[name])
+
+    starts = [turns[0]['started_at'] for turns in sessions]
+    ends = [turns[-1]['started_at'] + turns[-1]['turn_time'] for turns in sessions]
+    return {
+        'sessions': len(sessions),
+        'turns': sum(len(turns) for turns in sessions),
+        'span_seconds': max(ends) - min(starts) if sessions else 0.0,
+        'turns_per_session': turns_per_session.summary(),
+        'queue_wait_by_priority': {priority: histogram.summary() for priority, histogram in queue_waits.items()},
+        'degradations': dict(sorted(degradations.items(), key=lambda item: -item[1])),
+        'deadline_missed': deadline_missed,
+        'ack_clips': dict(sorted(ack_clips.items(), key=lambda item: -item[1])),
+        **{name: histogram.summary() for name, histogram in histograms.items()}
+    }
+
+class FakePipeline:
+    """Local stand-in that sleeps each stage for its recorded latency, compressed by the replay speed"""
+
+    async def run_turn(self, turn: Dict[str, Any], speed: float) -> Dict[str, float]:
+        latencies = {}
+        for stage in TRACE_STAGES:
+            recorded = turn.get(f"{stage}_time")
+            if recorded is None:
+                continue
+            start = time.perf_counter()
+            await asyncio.sleep(recorded / speed)
+            latencies[stage] = time.perf_counter() - start
+        return latencies
+
+class GenerationPipeline(FakePipeline):
+    """Runs real generation (therapist_core with any Gemini-compatible model); STT and TTS stay faked"""
+
+    def __init__(self, model, filler: str = "والله أحس بضيق وايد هالأيام "):
+        self.model = model
+        self.filler = filler
+
+    def _placeholder_text(self, chars: int) -> str:
+        # Traces never hold user text, so a same-length Omani placeholder stands in for the transcript
+        return (self.filler * (chars // len(self.filler) + 1))[:max(chars, 1)]
+
+    async def run_turn(self, turn: Dict[str, Any], speed: float) -> Dict[str, float]:
+        import therapist_core
+
+        latencies = {}
+        if turn.get('stt_time') is not None:
+            start = time.perf_counter()
+            await asyncio.sleep(turn['stt_time'] / speed)
+            latencies['stt'] = time.perf_counter() - start
+        if turn.get('generation_time') is not None:
+            start = time.perf_counter()
+            await asyncio.get_running_loop().run_in_executor(
+                None, therapist_core.get_gemini_response,
+                self._placeholder_text(turn['transcript_chars']), [], self.model
+            )
+            latencies['generation'] = time.perf_counter() - start
+        if turn.get('tts_time') is not None:
+            start = time.perf_counter()
+            await asyncio.sleep(turn['tts_time'] / speed)
+            latencies['tts'] = time.perf_counter() - start
+        return latencies
+
+class TraceReplayer:
+    """Re-drives recorded sessions with their original arrival times and think times, sped up"""
+
+    def __init__(self, pipeline=None, speed: float = 10.0):
+        if not 1.0 <= speed <= 100.0:
+            raise ValueError("Replay speed must be between 1x and 100x")
+        self.pipeline = pipeline or FakePipeline()
+        self.speed = speed
+
+    async def _replay_session(self, turns: List[Dict[str, Any]], offset: float, origin: float,
+                              results: Dict[str, Any]):
+        await asyncio.sleep(offset)
+        for index, turn in enumerate(turns):
+            if index:
+                await asyncio.sleep(turn['think_time'] / self.speed)
+            if turn.get('shed'):
+                results['skipped_shed'] += 1
+                continue
+
+            # Slip: how far behind the recorded (scaled) schedule this turn starts
+            scheduled = (turn['started_at'] - origin) / self.speed
+            results['slip'].add(max(time.perf_counter() - results['start'] - scheduled, 0.0))
+
+            results['in_flight'] += 1
+            results['peak_in_flight'] = max(results['peak_in_flight'], results['in_flight'])
+            start = time.perf_counter()
+            try:
+                latencies = await self.pipeline.run_turn(turn, self.speed)
+            finally:
+                results['in_flight'] -= 1
+            results['turn_time'].add(time.perf_counter() - start)
+            for stage, value in latencies.items():
+                results['stages'][stage].add(value)
+            results['turns'] += 1
+
+    async def replay(self, sessions: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
+        results = {
+            'start': time.perf_counter(),
+            'turns': 0,
+            'skipped_shed': 0,
+            'in_flight': 0,
+            'peak_in_flight': 0,
+            'slip': LatencyHistogram(),
+            'turn_time': LatencyHistogram(),
+            'stages': {stage: LatencyHistogram() for stage in TRACE_STAGES}
+        }
+        if not sessions:
+            return self._summary(results, 0.0)
+        origin = sessions[0][0]['started_at']
+        await asyncio.gather(*(
+            self._replay_session(turns, (turns[0]['started_at'] - origin) / self.speed, origin, results)
+            for turns in sessions
+        ))
+        return self._summary(results, time.perf_counter() - results['start'])
+
+    def _summary(self, results: Dict[str, Any], duration: float) -> Dict[str, Any]:
+        return {
+            'speed': self.speed,
+            'replayed_turns': results['turns'],
+            'skipped_shed_turns': results['skipped_shed'],
+            'replay_duration': duration,
+            'equivalent_real_duration': duration * self.speed,
+            'peak_concurrent_turns': results['peak_in_flight'],
+            'schedule_slip': results['slip'].summary(),
+            'turn_time': results['turn_time'].summary(),
+            'stage_times': {stage: histogram.summary() for stage, histogram in results['stages'].items()}
+        }
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize and replay recorded session traces")
+    parser.add_argument('traces', help="JSONL file written by the app with TRACE_RECORDING enabled")
+    parser.add_argument('--speed', type=float, default=10.0, help="Replay speed, 1-100x")
+    parser.add_argument('--generation', action='store_true',
+                        help="Run real generation through the local stand-in model instead of sleeping")
+    parser.add_argument('--summary-only', action='store_true')
+    args = parser.parse_args()
+
+    sessions = load_traces(args.traces)
+    shape = summarize_traces(sessions)
+    print(f"Trace: {shape['sessions']} sessions, {shape['turns']} turns over {shape['span_seconds']:.0f}s")
+    print(f"   Turns/session: mean {shape['turns_per_session']['mean']:.1f}, p95 {shape['turns_per_session']['p95']:.0f}")
+    if shape['think_time']:
+        print(f"   Think time: median {shape['think_time']['median']:.1f}s, p95 {shape['think_time']['p95']:.1f}s")
+    print(f"   Audio: median {shape['audio_duration']['median']:.1f}s, turn time p95 {shape['turn_time']['p95']:.2f}s")
+    for priority, wait in shape['queue_wait_by_priority'].items():
+        print(f"   Queue wait ({priority}): p50 {wait['median']:.2f}s, p95 {wait['p95']:.2f}s")
+    if shape['degradations']:
+        print(f"   Deadline: {shape['deadline_missed']} turn(s) over budget; degradations "
+              + ", ".join(f"{action} x{count}" for action, count in shape['degradations'].items()))
+    if shape['ack_clips']:
+        print(f"   Acknowledgments: {sum(shape['ack_clips'].values())} of {shape['turns']} turns; "
+              + ", ".join(f"{phrase} x{count}" for phrase, count in shape['ack_clips'].items()))
+    if args.summary_only:
+        raise SystemExit(0)
+
+    pipeline = None
+    if args.generation:
+        from evaluation_runner import LocalStandInModel
+        pipeline = GenerationPipeline(LocalStandInModel())
+    summary = asyncio.run(TraceReplayer(pipeline, args.speed).replay(sessions))
+
+    print(f"\nReplay at {summary['speed']:.0f}x: {summary['replayed_turns']} turns in {summary['replay_duration']:.1f}s "
+          f"(~{summary['equivalent_real_duration']:.0f}s of traffic)")
+    print(f"   Peak concurrent turns: {summary['peak_concurrent_turns']}")
+    print(f"   Schedule slip p95: {summary['schedule_slip']['p95']:.3f}s")
+    print(f"   Turn time p95: {summary['turn_time']['p95']:.3f}s")
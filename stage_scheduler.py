@@ -0,0 +1,212 @@
+"""
+Crisis-Priority Fair Scheduling for OMANI-Therapist-Voice Pipeline Stages
+Weighted-fair access to shared STT, Gemini and TTS worker slots, with crisis turns served first
+"""
+
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Any
+
+import therapist_core
+from model_router import classify_turn
+from result_store import LatencyHistogram
+
+PRIORITY_CLASSES = ('crisis', 'normal', 'complex')
+
+# Share of worker time per turn; a complex turn holds a slot longer, so it gets a smaller weight
+DEFAULT_CLASS_WEIGHTS = {'crisis': 8.0, 'normal': 2.0, 'complex': 1.0}
+
+STAGES = ('stt', 'generation', 'tts')
+
+def classify_priority(user_text: str = None, conversation_history: List[Dict[str, Any]] = None,
+                      response_type: str = None, detector=None) -> str:
+    """Priority class for a turn from the crisis checks and the router's complexity heuristic"""
+    history = conversation_history or []
+    if response_type == 'crisis':
+        return 'crisis'
+    if user_text:
+        if therapist_core.is_crisis_text(user_text):
+            return 'crisis'
+        if detector is not None and detector.detect_crisis(user_text)['is_crisis']:
+            return 'crisis'
+    elif history and history[-1].get('type') == 'crisis':
+        # Before transcription the text is unknown; a session in crisis keeps its priority
+        return 'crisis'
+    if user_text and classify_turn(user_text, history)[0] == 'full':
+        return 'complex'
+    return 'normal'
+
+class StageScheduler:
+    """Grants a fixed number of worker slots by weighted fair queuing over sessions"""
+
+    def __init__(self, name: str, workers: int = 4, class_weights: Dict[str, float] = None,
+                 starvation_age: float = 10.0, crisis_burst: int = 8):
+        self.name = name
+        self.workers = workers
+        self.class_weights = class_weights or DEFAULT_CLASS_WEIGHTS
+        # A non-crisis ticket waiting longer than this is served next whatever its finish tag
+        self.starvation_age = starvation_age
+        # Consecutive crisis grants allowed while other classes wait
+        self.crisis_burst = crisis_burst
+        self.condition = threading.Condition()
+        self.in_use = 0
+        self.waiting = []
+        self.virtual_time = 0.0
+        self.session_finish = {}
+        self.crisis_streak = 0
+        self.sequence = itertools.count()
+        self.queue_wait = {priority: LatencyHistogram() for priority in PRIORITY_CLASSES}
+        self.counters = {'granted': 0, 'timed_out': 0, 'starvation_promotions': 0, 'crisis_jumps': 0}
+
+    def _enqueue(self, session_id: str, priority: str, cost: float) -> Dict[str, Any]:
+        # Each session is its own flow, so one busy session can't crowd out the others in its class
+        start_tag = max(self.virtual_time, self.session_finish.get(session_id, 0.0))
+        finish_tag = start_tag + cost / self.class_weights[priority]
+        self.session_finish[session_id] = finish_tag
+        if len(self.session_finish) > 10000:
+            self.session_finish = {session: tag for session, tag in self.session_finish.items()
+                                   if tag > self.virtual_time}
+        ticket = {
+            'session_id': session_id,
+            'priority': priority,
+            'start_tag': start_tag,
+            'finish_tag': finish_tag,
+            'enqueued': time.monotonic(),
+            'sequence': next(self.sequence)
+        }
+        self.waiting.append(ticket)
+        return ticket
+
+    def _pick(self, now: float) -> Dict[str, Any]:
+        """Next ticket to serve: crisis (within its burst), then a starving ticket, then smallest finish tag"""
+        crises = [ticket for ticket in self.waiting if ticket['priority'] == 'crisis']
+        others = [ticket for ticket in self.waiting if ticket['priority'] != 'crisis']
+        if crises and not (others and self.crisis_streak >= self.crisis_burst):
+            return min(crises, key=lambda ticket: ticket['sequence'])
+        if not others:
+            return min(crises, key=lambda ticket: ticket['sequence'])
+
+        oldest = min(others, key=lambda ticket: ticket['sequence'])
+        if now - oldest['enqueued'] >= self.starvation_age:
+            return oldest
+        return min(others, key=lambda ticket: (ticket['finish_tag'], ticket['sequence']))
+
+    def _grant(self, ticket: Dict[str, Any], now: float):
+        self.waiting.remove(ticket)
+        self.in_use += 1
+        self.virtual_time = max(self.virtual_time, ticket['start_tag'])
+        if ticket['priority'] == 'crisis':
+            self.crisis_streak += 1
+            if self.waiting and any(other['sequence'] < ticket['sequence'] for other in self.waiting):
+                self.counters['crisis_jumps'] += 1
+        else:
+            self.crisis_streak = 0
+        if now - ticket['enqueued'] >= self.starvation_age:
+            self.counters['starvation_promotions'] += 1
+        self.counters['granted'] += 1
+        self.queue_wait[ticket['priority']].add(now - ticket['enqueued'])
+
+    def acquire(self, session_id: str, priority: str = 'normal', cost: float = 1.0,
+                timeout: float = None) -> Dict[str, Any]:
+        """Block until a worker slot is granted; returns the wait and whether the slot was granted"""
+        with self.condition:
+            ticket = self._enqueue(session_id, priority, cost)
+            deadline = None if timeout is None else ticket['enqueued'] + timeout
+            while True:
+                now = time.monotonic()
+                if self.in_use < self.workers and self._pick(now) is ticket:
+                    self._grant(ticket, now)
+                    return {'granted': True, 'priority': priority, 'waited': now - ticket['enqueued']}
+                if deadline is not None and now >= deadline:
+                    self.waiting.remove(ticket)
+                    self.counters['timed_out'] += 1
+                    # Our departure may make someone else the pick
+                    self.condition.notify_all()
+                    return {'granted': False, 'priority': priority, 'waited': now - ticket['enqueued']}
+                # Wake periodically so starvation promotion happens even without releases
+                wait = self.starvation_age / 4
+                if deadline is not None:
+                    wait = min(wait, deadline - now)
+                self.condition.wait(timeout=max(wait, 0.01))
+
+    def release(self):
+        with self.condition:
+            self.in_use -= 1
+            self.condition.notify_all()
+
+    @contextmanager
+    def slot(self, session_id: str, priority: str = 'normal', cost: float = 1.0, timeout: float = None):
+        """Hold a worker slot for the block; yields the grant (check 'granted' when using a timeout)"""
+        grant = self.acquire(session_id, priority, cost, timeout)
+        try:
+            yield grant
+        finally:
+            if grant['granted']:
+                self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.condition:
+            return dict(
+                self.counters,
+                name=self.name,
+                workers=self.workers,
+                in_use=self.in_use,
+                waiting={priority: sum(1 for ticket in self.waiting if ticket['priority'] == priority)
+                         for priority in PRIORITY_CLASSES},
+                queue_wait={priority: histogram.summary() for priority, histogram in self.queue_wait.items()}
+            )
+
+def create_stage_schedulers(config: Dict[str, Any] = None) -> Dict[str, StageScheduler]:
+    """One scheduler per pipeline stage; config maps stage name to StageScheduler kwargs"""
+    config = config or {}
+    return {stage: StageScheduler(stage, **config.get(stage, {})) for stage in STAGES}
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+
+    parser = argparse.ArgumentParser(description="Compare crisis queue waits: FIFO vs weighted-fair scheduling")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--turns', type=int, default=300)
+    parser.add_argument('--sessions', type=int, default=40)
+    parser.add_argument('--crisis-ratio', type=float, default=0.05)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    turns = []
+    for index in range(args.turns):
+        roll = rng.random()
+        priority = 'crisis' if roll < args.crisis_ratio else 'complex' if roll < 0.3 else 'normal'
+        service = {'crisis': 0.01, 'normal': 0.02, 'complex': 0.06}[priority]
+        turns.append((f"session-{rng.randrange(args.sessions)}", priority, service, index * 0.004))
+
+    def run(scheduler: StageScheduler) -> Dict[str, Any]:
+        start = time.monotonic()
+
+        def turn(session_id: str, priority: str, service: float, arrival: float):
+            time.sleep(max(0.0, start + arrival - time.monotonic()))
+            with scheduler.slot(session_id, priority):
+                time.sleep(service)
+
+        with ThreadPoolExecutor(max_workers=len(turns)) as pool:
+            list(pool.map(lambda args: turn(*args), turns))
+        return scheduler.stats()
+
+    class FifoScheduler(StageScheduler):
+        """Baseline: first come, first served"""
+
+        def _pick(self, now: float) -> Dict[str, Any]:
+            return min(self.waiting, key=lambda ticket: ticket['sequence'])
+
+    results = {'FIFO': run(FifoScheduler('fifo', args.workers)), 'Weighted-fair': run(StageScheduler('wfq', args.workers))}
+
+    print(f"{args.turns} turns from {args.sessions} sessions on {args.workers} workers")
+    for label, stats in results.items():
+        print(f"\n{label}:")
+        for priority, summary in stats['queue_wait'].items():
+            if summary:
+                print(f"   {priority:8} wait p50 {summary['median'] * 1000:7.1f}ms  p95 {summary['p95'] * 1000:7.1f}ms")
@@ -0,0 +1,194 @@
+"""
+Non-Blocking Structured Logging for OMANI-Therapist-Voice
+Request threads only enqueue records; formatting, PII redaction and I/O happen on a listener thread
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from typing import Dict
+
+# Fields that may carry what a user said or was told; logged only as their length
+REDACTED_FIELDS = ('transcript', 'user_text', 'reply', 'ai_text')
+
+# Free-text patterns scrubbed from messages and remaining string fields
+PII_PATTERNS = [
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"), '<email>'),
+    # Phone numbers, civil IDs and card numbers, in Western or Arabic-Indic digits
+    (re.compile(r"\+?[\d٠-٩][\d٠-٩ ]{5,}[\d٠-٩]"), '<number>'),
+]
+
+# Per-event keep rates for high-volume INFO events; warnings and errors are never sampled
+DEFAULT_SAMPLE_RATES = {
+    'stt.transcribed': 0.1,
+    'generation.routed': 0.1,
+    'tts.synthesized': 0.1,
+    'ack.played': 0.05,
+}
+
+# Attributes every LogRecord has; anything else came in through extra= and is a structured field
+STANDARD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+def redact_text(text: str) -> str:
+    for pattern, replacement in PII_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of records per 'event'; runs on the request thread, so it stays O(1)"""
+
+    def __init__(self, rates: Dict[str, float] = None, rng: random.Random = None):
+        super().__init__()
+        self.rates = DEFAULT_SAMPLE_RATES if rates is None else rates
+        self.rng = rng or random.Random()
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(getattr(record, 'event', None))
+        if rate is None or record.levelno >= logging.WARNING:
+            return True
+        if self.rng.random() < rate:
+            # Lets readers scale sampled counts back up
+            record.sample_rate = rate
+            return True
+        self.sampled_out += 1
+        return False
+
+class RedactionFilter(logging.Filter):
+    """Strips PII from the rendered message and structured fields; attached to the listener's handlers"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # Rendering happens here, on the listener thread, which is what keeps %-style logging lazy
+        record.msg = redact_text(record.getMessage())
+        record.args = None
+        for name in list(vars(record)):
+            if name in STANDARD_ATTRIBUTES:
+                continue
+            value = getattr(record, name)
+            if name in REDACTED_FIELDS:
+                setattr(record, name, {'redacted_chars': len(value) if isinstance(value, str) else None})
+            elif isinstance(value, str):
+                setattr(record, name, redact_text(value))
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message and any extra= fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        entry.update({name: value for name, value in vars(record).items() if name not in STANDARD_ATTRIBUTES})
+        if record.exc_info:
+            entry['exception'] = redact_text(self.formatException(record.exc_info))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Bounded enqueue that never blocks or formats; records are dropped (and counted) when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.listener = None
+        self.dropped = 0
+        # Separate from Handler.lock, which logging.shutdown holds while it calls close()
+        self.counter_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock handler formats here, on the caller's thread; the listener does it instead
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.counter_lock:
+                self.dropped += 1
+
+    def close(self):
+        # Called by logging.shutdown at exit: drain what is queued before the target handlers close
+        with self.counter_lock:
+            listener, self.listener = self.listener, None
+        if listener is not None:
+            listener.stop()
+        super().close()
+
+    def stats(self) -> Dict[str, int]:
+        sampler = next((f for f in self.filters if isinstance(f, SamplingFilter)), None)
+        return {
+            'queued': self.queue.qsize(),
+            'dropped': self.dropped,
+            'sampled_out': sampler.sampled_out if sampler else 0
+        }
+
+def configure_logging(level: int = logging.INFO, path: str = None, sample_rates: Dict[str, float] = None,
+                      queue_size: int = 10000, json_format: bool = True) -> NonBlockingQueueHandler:
+    """Route the root logger through a queue; returns the queue handler (its listener is handler.listener)"""
+    target = logging.FileHandler(path, encoding='utf-8') if path else logging.StreamHandler(sys.stderr)
+    target.setFormatter(JsonFormatter() if json_format else logging.Formatter(logging.BASIC_FORMAT))
+    target.addFilter(RedactionFilter())
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(SamplingFilter(sample_rates))
+    handler.listener = logging.handlers.QueueListener(handler.queue, target, respect_handler_level=True)
+    handler.listener.start()
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    return handler
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+    import io
+
+    parser = argparse.ArgumentParser(description="Request-thread cost of logging: synchronous vs queue-backed")
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--io-delay', type=float, default=0.0002, help="Simulated seconds per write (slow disk/pipe)")
+    args = parser.parse_args()
+
+    class SlowStream(io.StringIO):
+        def write(self, text: str) -> int:
+            time.sleep(args.io_delay)
+            return super().write(text)
+
+    transcript = "والله تعبان وايد، رقمي 99123456 وإيميلي salim@example.om"
+    logger = logging.getLogger('demo')
+
+    def hot_path() -> float:
+        start = time.perf_counter()
+        for index in range(args.events):
+            logger.info("Transcribed %d chunk(s) in %.2fs", 1, 0.8,
+                        extra={'event': 'stt.transcribed', 'transcript': transcript, 'turn': index})
+        return time.perf_counter() - start
+
+    stream = SlowStream()
+    sync_handler = logging.StreamHandler(stream)
+    sync_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    logging.getLogger().addHandler(sync_handler)
+    logging.getLogger().setLevel(logging.INFO)
+    sync_seconds = hot_path()
+
+    output = SlowStream()
+    handler = configure_logging(sample_rates={'stt.transcribed': 0.1})
+    handler.listener.handlers[0].setStream(output)
+    queued_seconds = hot_path()
+    handler.close()
+
+    print(f"{args.events} turn events, {args.io_delay * 1000:.1f}ms per write")
+    print(f"   synchronous handler: {sync_seconds / args.events * 1e6:8.1f}us per event on the request thread")
+    print(f"   queue + sampling:    {queued_seconds / args.events * 1e6:8.1f}us per event on the request thread")
+    print(f"   {handler.stats()}")
+    print(f"   sample record: {output.getvalue().splitlines()[0]}")
@@ -0,0 +1,56 @@
+"""
+Routing tests for model_router: when a turn may get a canned reply
+"""
+
+from model_router import classify_turn, template_for
+
+class StubClassifier:
+    def __init__(self, probability: float):
+        self.probability = probability
+
+    def predict_proba(self, text: str) -> float:
+        return self.probability
+
+def test_bare_greetings_and_thanks_use_templates():
+    assert classify_turn("شلونك؟ كيف الحال؟", [])[0] == 'template'
+    assert classify_turn("السلام عليكم", [])[0] == 'template'
+    assert template_for("شكراً يا دكتور") == 'thanks'
+
+def test_greeting_with_content_is_not_templated():
+    assert template_for("هلا أنا وحيد") is None
+    assert classify_turn("هلا أنا وحيد", [])[0] != 'template'
+    assert classify_turn("مرحبا أحس بضيق شديد", [])[0] != 'template'
+    assert classify_turn("شكرا، خلاص تعبت", [])[0] != 'template'
+
+def test_trigger_inside_another_word_does_not_match():
+    assert template_for("هلالي تعبان") is None
+
+def test_lexicon_signal_blocks_template(monkeypatch):
+    import model_router
+
+    class Lexicon:
+        def max_severity(self, text: str) -> int:
+            return 2
+
+    monkeypatch.setattr(model_router, 'get_crisis_lexicon', lambda: Lexicon())
+    assert classify_turn("مرحبا", [])[0] != 'template'
+
+def test_classifier_score_blocks_template():
+    assert classify_turn("مرحبا", [], StubClassifier(0.4))[0] != 'template'
+    assert classify_turn("مرحبا", [], StubClassifier(0.01))[0] == 'template'
+
+def test_admission_is_asked_only_for_provider_routes():
+    from model_router import ModelRouter
+
+    asked = []
+
+    def refuse(route: str) -> bool:
+        asked.append(route)
+        return False
+
+    router = ModelRouter({'fast': None, 'full': None})
+    assert router.generate("مرحبا", [], admit=refuse)[2] == 'template'
+    assert asked == []
+    assert router.plan_route("أحس بضيق وما أعرف ليش", []) in ('fast', 'full')
+    assert router.generate("أحس بضيق وما أعرف ليش", [], admit=refuse) == (None, None, 'shed')
+    assert asked == [router.plan_route("أحس بضيق وما أعرف ليش", [])]
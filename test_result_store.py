@@ -0,0 +1,67 @@
+"""
+Round-trip tests for result_store: columnar store, JSONL sink and offline re-aggregation
+"""
+
+import math
+
+from result_store import TurnResultStore, TurnResultSink, read_result_file
+
+def make_turn(turn: int, queue_time=0.25, ai_response_time=2.0, tts_time=0.5, outcome='ok') -> dict:
+    return {
+        'user_id': 1,
+        'user_type': 'normal',
+        'turn': turn,
+        'thinking_time': 3.0,
+        'stt_time': 1.0,
+        'ai_response_time': ai_response_time,
+        'tts_time': tts_time,
+        'queue_time': queue_time,
+        'total_turn_time': 7.0,
+        'response_time': 4.0,
+        'stt_attempts': 1,
+        'ai_attempts': 1 if ai_response_time is not None else 0,
+        'tts_attempts': 1 if tts_time is not None else 0,
+        'outcome': outcome,
+        'timestamp': 1000.0 + turn
+    }
+
+def test_queue_time_round_trips_through_store():
+    store = TurnResultStore()
+    store.append(make_turn(0, queue_time=0.25))
+    store.append(make_turn(1, queue_time=None, ai_response_time=None, tts_time=None, outcome='failed'))
+
+    assert store.row(0)['queue_time'] == 0.25
+    assert store.row(1)['queue_time'] is None
+    assert store.samples('queue_time') == [0.25]
+    assert store.histogram('queue_time').count == 1
+    assert store.group_means()['normal']['queue_time'] == 0.25
+
+def test_queue_time_survives_merge():
+    first, second = TurnResultStore(), TurnResultStore(keep_rows=False)
+    first.append(make_turn(0, queue_time=0.5))
+    second.append(make_turn(1, queue_time=1.5))
+    second.extend(first)
+
+    assert sorted(second.samples('queue_time')) == [0.5, 1.5]
+    assert math.isclose(second.histogram('queue_time').mean(), 1.0)
+
+def test_queue_time_round_trips_through_sink(tmp_path):
+    path = str(tmp_path / 'turns.jsonl')
+    with TurnResultSink(path) as sink:
+        sink.write('run_start', {'concurrent_users': 1, 'session_length': 2, 'started_at': 1000.0})
+        sink.write('turn', make_turn(0, queue_time=0.75))
+        sink.write('turn', make_turn(1, queue_time=None, ai_response_time=None, tts_time=None, outcome='failed'))
+        sink.write('run_end', {'total_test_time': 2.0})
+
+    [run] = read_result_file(path, keep_rows=True)
+    assert run['completed']
+    assert [row['queue_time'] for row in run['store']] == [0.75, None]
+
+def test_legacy_records_without_queue_time():
+    record = make_turn(0)
+    del record['queue_time']
+    store = TurnResultStore()
+    store.append(record)
+
+    assert store.row(0)['queue_time'] is None
+    assert store.histogram('queue_time').count == 0
@@ -0,0 +1,29 @@
+"""
+Inline crisis check tests: real crisis phrases fire, everyday uses of the same words do not
+"""
+
+import pytest
+
+from therapist_core import is_crisis_text
+
+@pytest.mark.parametrize('text', [
+    "أفكر في الانتحار",
+    "ودي أموت وأرتاح",
+    "ما فيني أعيش بعد اليوم",
+    "تعبت من الحياة",
+    "ما عاد فيني أكمل",
+    "حاس إني انتهيت من الحياة",
+    "ما أقدر أكمل حياتي كذا",
+])
+def test_crisis_phrases_fire_inline(text):
+    assert is_crisis_text(text) is True
+
+@pytest.mark.parametrize('text', [
+    "انتهيت من الشغل اليوم",
+    "ما أقدر أكمل دراستي",
+    "أموت من التعب",
+    "أموت من الضحك على هالمقطع",
+    "مرحبا كيف الحال",
+])
+def test_everyday_sentences_do_not_fire_inline(text):
+    assert is_crisis_text(text) is False
@@ -0,0 +1,15 @@
+"""
+Arabic Text Normalization for OMANI-Therapist-Voice
+Shared by the crisis classifier (n-gram features) and chunked transcription (overlap stitching)
+"""
+
+import re
+
+_DIACRITICS = re.compile(r'[ً-ْـ]')  # harakat and tatweel
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_CHAR_MAP = str.maketrans({'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ى': 'ي', 'ة': 'ه'})
+
+def normalize_text(text: str) -> str:
+    """Light Arabic normalization so spelling variants compare equal"""
+    text = _DIACRITICS.sub('', text).translate(_CHAR_MAP)
+    return " ".join(_PUNCTUATION.sub(' ', text).split())
@@ -0,0 +1,131 @@
+"""
+Core Therapist Pipeline for OMANI-Therapist-Voice
+Prompt assembly and response generation, independent of the Streamlit UI
+"""
+
+import logging
+from typing import Dict, List, Any, Tuple
+
+from crisis_lexicon import get_crisis_lexicon
+
+logger = logging.getLogger(__name__)
+
+CRISIS_RESPONSE = """
+        أسمع أنك تمر بوقت صعب جداً، وأريدك تعرف إني هنا معاك. سلامتك أهم شيء في الدنيا.
+        
+        أرجوك تواصل فوراً مع:
+        📞 خط الطوارئ: 999
+        📞 خط الدعم النفسي: +968-2205-5555
+        📞 خط الأمل: +968-2205-6666
+        
+        حياتك ثمينة وايد، وفي ناس كثير يقدرون يساعدونك الحين. ما تتردد تطلب المساعدة.
+        """
+
+ERROR_RESPONSE = "عذراً، حدث خطأ تقني. بس أنا هنا معاك، حاول مرة أخرى وحكيلي شنو في بالك."
+
+# Enhanced therapeutic system prompt
+SYSTEM_PROMPT = """
+    أنت معالج نفسي محترف ومتخصص في اللهجة العمانية والثقافة الخليجية. أنت تتحدث مع شخص يحتاج للدعم النفسي.
+
+    كمعالج محترف، يجب أن تكون:
+    
+    🎯 **المهارات العلاجية:**
+    - استخدم تقنيات الاستماع النشط والتعاطف
+    - اطرح أسئلة مفتوحة لفهم المشاعر بعمق
+    - استخدم تقنيات العلاج المعرفي السلوكي المناسبة ثقافياً
+    - قدم استراتيجيات عملية للتأقلم والتحسن
+    - اعكس المشاعر وأعد صياغتها لإظهار الفهم
+    
+    🏛️ **الحساسية الثقافية:**
+    - استخدم تعبيرات عمانية أصيلة (شلونك، ما عليك، بإذن الله، يلا نشوف)
+    - احترم القيم الإسلامية والعائلية العمانية
+    - ادمج الممارسات الروحية عند المناسبة (الدعاء، التوكل على الله)
+    - تفهم ديناميكيات الأسرة الخليجية والضغوط الاجتماعية
+    
+    💬 **أسلوب التواصل:**
+    - كن دافئاً ومتعاطفاً ومطمئناً
+    - استخدم نبرة هادئة وداعمة
+    - اجعل الردود قصيرة ومركزة (2-4 جمل)
+    - اطرح سؤال واحد في نهاية كل رد لتشجيع المحادثة
+    
+    ❌ **تجنب تماماً:**
+    - التشخيصات الطبية أو وصف الأدوية
+    - إعطاء نصائح مباشرة دون فهم السياق
+    - التقليل من مشاعر الشخص أو الحكم عليها
+    - الردود الطويلة أو المعقدة
+    - استبدال العلاج النفسي المهني
+    
+    🎭 **أمثلة على الردود العلاجية:**
+    - "أفهم إنك تحس بـ... هذا صعب عليك. شنو أكثر شي يخليك تحس كذا؟"
+    - "شلونك اليوم؟ أحس إن فيك شي يضايقك... تبي تحكيلي عنه؟"
+    - "ما عليك، كلنا نمر بأوقات صعبة. أنت مو لحالك في هذا الشي."
+    - "بإذن الله راح نشتغل سوا عشان تحس أحسن. شنو رأيك نجرب...؟"
+    
+    تذكر: أنت معالج محترف يساعد شخص يثق فيك. كن حاضراً معه بكل تعاطف ومهنية.
+    """
+
+PROMPT_HEADER = f"{SYSTEM_PROMPT}\n\n"
+PROMPT_FOOTER = "رد عليه كمعالج نفسي محترف باللهجة العمانية، مع طرح سؤال مناسب لمواصلة العلاج:\nالمعالج:"
+
+# Generation parameters passed to generate_content
+GENERATION_CONFIG = {
+    'temperature': 0.7,  # Balanced creativity and consistency
+    'top_p': 0.8,
+    'top_k': 40,
+    'max_output_tokens': 200,  # Keep responses concise
+}
+
+def is_crisis_text(user_input: str) -> bool:
+    """Inline crisis check run before any model call"""
+    return get_crisis_lexicon().is_inline_crisis(user_input)
+
+def build_therapist_prompt(user_input: str, conversation_history: List[Dict[str, Any]],
+                           correction: str = None) -> str:
+    """Build comprehensive prompt with conversation context"""
+    parts = [PROMPT_HEADER]
+
+    # Add recent conversation history for context
+    if conversation_history:
+        parts.append("سياق المحادثة السابقة:\n")
+        for entry in conversation_history[-3:]:  # Last 3 exchanges
+            parts.append(f"المستخدم: {entry['user']}\nالمعالج: {entry['assistant']}\n")
+        parts.append("\n")
+
+    # Add current user input
+    parts.append(f"المستخدم الآن يقول: {user_input}\n\n")
+    if correction:
+        parts.append(correction)
+    parts.append(PROMPT_FOOTER)
+    return "".join(parts)
+
+def get_gemini_response(user_input: str, conversation_history: List[Dict[str, Any]], model,
+                        guardrail=None, generation_config: Dict[str, Any] = None,
+                        deadline=None) -> Tuple[str, str]:
+    """Generates therapeutic response using Gemini model with enhanced therapist behavior."""
+    generation_config = generation_config or GENERATION_CONFIG
+
+    # Crisis detection with immediate intervention
+    if is_crisis_text(user_input):
+        logger.warning("Crisis detected")
+        return CRISIS_RESPONSE, "crisis"
+
+    try:
+        # Stream through the cultural guardrail when one is configured
+        if guardrail is not None:
+            text, report = guardrail.generate(
+                model,
+                lambda correction: build_therapist_prompt(user_input, conversation_history, correction),
+                generation_config,
+                deadline
+            )
+            logger.info("Therapeutic response generated in %d attempt(s)", report['attempts'])
+            return text, "normal"
+
+        # Generate response with therapeutic parameters
+        full_prompt = build_therapist_prompt(user_input, conversation_history)
+        response = model.generate_content(full_prompt, generation_config=generation_config)
+        logger.info("Therapeutic response generated successfully")
+        return response.text, "normal"
+    except Exception as e:
+        logger.error("Gemini error: %s", e)
+        return ERROR_RESPONSE, "error"
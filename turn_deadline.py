@@ -0,0 +1,122 @@
+"""
+Per-Turn Deadline Propagation for OMANI-Therapist-Voice
+Tracks the 20 s turn budget across STT, generation and TTS and records every degradation it forces
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TURN_BUDGET = 20.0
+
+# Rough stage costs used to plan the rest of a turn; tune them from recorded session traces
+GENERATION_FIRST_TOKEN = {'fast': 0.8, 'full': 2.0}
+GENERATION_TOKENS_PER_SECOND = {'fast': 60.0, 'full': 30.0}
+TTS_OVERHEAD = 0.4
+TTS_SECONDS_PER_CHAR = 0.0075
+# Held back for speech synthesis while generation is planned
+TTS_RESERVE = 3.0
+# Below this many affordable tokens a generated reply isn't worth starting
+MIN_OUTPUT_TOKENS = 80
+
+class TurnDeadline:
+    """Remaining budget for one turn plus the degradations applied to stay inside it"""
+
+    def __init__(self, budget: float = TURN_BUDGET, start: float = None):
+        self.budget = budget
+        self.start = time.monotonic() if start is None else start
+        self.expires_at = self.start + budget
+        self.degradations = []
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def degrade(self, stage: str, action: str, detail: str = None):
+        self.degradations.append({'stage': stage, 'action': action, 'at': self.elapsed(), 'detail': detail})
+        logger.info("Deadline degradation at %.1fs: %s/%s %s", self.elapsed(), stage, action, detail or '',
+                    extra={'event': 'deadline.degraded', 'stage': stage, 'action': action})
+
+    def actions(self) -> List[str]:
+        return [f"{item['stage']}/{item['action']}" for item in self.degradations]
+
+def estimate_generation_time(route: str, max_output_tokens: int) -> float:
+    return GENERATION_FIRST_TOKEN[route] + max_output_tokens / GENERATION_TOKENS_PER_SECOND[route]
+
+def estimate_tts_time(text: str) -> float:
+    return TTS_OVERHEAD + len(text) * TTS_SECONDS_PER_CHAR
+
+def plan_generation(deadline: TurnDeadline, route: str,
+                    generation_config: Dict[str, Any]) -> Tuple[Optional[str], Dict[str, Any]]:
+    """Route and config that fit what is left after STT; a None route means reply from a template"""
+    budget = deadline.remaining() - TTS_RESERVE
+    config = dict(generation_config)
+
+    if route == 'full' and budget < estimate_generation_time('full', config['max_output_tokens']):
+        route = 'fast'
+        deadline.degrade('generation', 'fast_route', f"{budget:.1f}s left for generation")
+
+    affordable = int((budget - GENERATION_FIRST_TOKEN[route]) * GENERATION_TOKENS_PER_SECOND[route])
+    if affordable < MIN_OUTPUT_TOKENS:
+        deadline.degrade('generation', 'templated_reply', f"{budget:.1f}s left for generation")
+        return None, config
+    if affordable < config['max_output_tokens']:
+        deadline.degrade('generation', 'shortened_output', f"{config['max_output_tokens']} -> {affordable} tokens")
+        config['max_output_tokens'] = affordable
+    return route, config
+
+def fits_tts(deadline: TurnDeadline, text: str) -> bool:
+    """Whether synthesizing the reply still lands inside the turn budget"""
+    return estimate_tts_time(text) <= deadline.remaining()
+
+class ReplyAudioCache:
+    """Recently synthesized replies by text, played instead of TTS when the deadline can't cover it"""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, text: str) -> Optional[bytes]:
+        with self.lock:
+            audio = self.entries.get(text)
+            if audio is not None:
+                self.entries.move_to_end(text)
+            return audio
+
+    def put(self, text: str, audio: bytes):
+        with self.lock:
+            self.entries[text] = audio
+            self.entries.move_to_end(text)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+# Example usage
+if __name__ == "__main__":
+    import therapist_core
+
+    print(f"Generation plans after STT, {TURN_BUDGET:.0f}s turn budget")
+    print("=" * 60)
+    reply = "هلا والله، أحس فيك. " * 12
+    for stt_seconds in (2.0, 6.0, 10.0, 13.0, 15.0, 18.5):
+        for route in ('full', 'fast'):
+            deadline = TurnDeadline(start=time.monotonic() - stt_seconds)
+            planned, config = plan_generation(deadline, route, therapist_core.GENERATION_CONFIG)
+            # TTS is checked once generation has (by estimate) used its share
+            generation_seconds = estimate_generation_time(planned, config['max_output_tokens']) if planned else 0.0
+            deadline.start -= generation_seconds
+            deadline.expires_at -= generation_seconds
+            audio = "synthesize" if fits_tts(deadline, reply) else "cached audio / text only"
+            print(f"   STT {stt_seconds:4.1f}s, {route:4} -> {planned or 'template':8} "
+                  f"max_output_tokens={config['max_output_tokens']:4d}  TTS: {audio}")
+            for item in deadline.degradations:
+                print(f"      {item['stage']}/{item['action']}: {item['detail']}")